@@ -0,0 +1,77 @@
+"""
+Measure the per-request overhead of dispatching a L{Call} to its L{Method}.
+
+Reusing the instances of C{stateless} methods only saves their
+construction, which is next to nothing for a L{Method} without an
+C{__init__}, so it's measured with methods building a L{Schema} when
+they're created, as many do.
+
+Run it with C{python benchmarks/bench_dispatch.py}.
+"""
+import timeit
+
+from txaws.server.call import Call
+from txaws.server.method import Method
+from txaws.server.registry import Registry
+from txaws.server.resource import QueryAPI
+from txaws.server.schema import Integer, Schema, Unicode
+
+
+class StatefulMethod(Method):
+
+    def invoke(self, call):
+        return "data"
+
+
+class StatelessMethod(StatefulMethod):
+    stateless = True
+
+
+class StatefulSchemaMethod(StatefulMethod):
+
+    def __init__(self):
+        self.schema = Schema(
+            Unicode("InstanceId.n"),
+            Unicode("Filter.n.Name", optional=True),
+            Integer("MaxResults", optional=True))
+
+
+class StatelessSchemaMethod(StatefulSchemaMethod):
+    stateless = True
+
+
+def make_api(actions=200, versions=5):
+    registry = Registry()
+    for i in range(actions):
+        registry.add(StatefulMethod, "Stateful%d" % i)
+        registry.add(StatelessMethod, "Stateless%d" % i)
+        registry.add(StatefulSchemaMethod, "StatefulSchema%d" % i)
+        registry.add(StatelessSchemaMethod, "StatelessSchema%d" % i)
+        for j in range(versions):
+            registry.add(StatefulMethod, "Versioned%d" % i, "1.%d" % j)
+    return QueryAPI(registry=registry)
+
+
+def dispatch(api, call):
+    api.registry.check(call.action, call.version)
+    return api.get_method(call)
+
+
+def main(number=200000):
+    api = make_api()
+    calls = [
+        ("catch-all", Call(action="Stateful100", version="1.0")),
+        ("stateless", Call(action="Stateless100", version="1.0")),
+        ("versioned", Call(action="Versioned100", version="1.3")),
+        ("schema", Call(action="StatefulSchema100", version="1.0")),
+        ("schema-stateless",
+         Call(action="StatelessSchema100", version="1.0")),
+    ]
+    for name, call in calls:
+        elapsed = timeit.timeit(
+            lambda: dispatch(api, call), number=number)
+        print("%-16s %8.3f us/call" % (name, elapsed / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measure the throughput of uploading a file to a local HTTP server which
+discards request bodies, with Twisted's L{FileBodyProducer} and with the
+producers in L{txaws.client._producers}.
+
+Run it with C{python benchmarks/bench_file_producer.py [megabytes]}.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from twisted.internet import defer, task
+from twisted.web import client, resource, server
+
+from txaws.client import _producers
+
+
+class _SinkRequest(server.Request):
+    def gotLength(self, length):
+        server.Request.gotLength(self, length)
+        self.received = 0
+
+    def handleContentChunk(self, data):
+        self.received += len(data)
+
+
+class _Sink(resource.Resource):
+    isLeaf = True
+
+    def render_POST(self, request):
+        return b"%d" % (request.received,)
+
+
+@defer.inlineCallbacks
+def upload(reactor, agent, url, path, producer_factory):
+    start = time.time()
+    with open(path, "rb") as input_file:
+        response = yield agent.request(
+            b"POST", url, None, producer_factory(input_file),
+        )
+        received = int((yield client.readBody(response)))
+    return received, time.time() - start
+
+
+@defer.inlineCallbacks
+def main(reactor, megabytes=256):
+    megabytes = int(megabytes)
+    site = server.Site(_Sink())
+    site.requestFactory = _SinkRequest
+    port = reactor.listenTCP(0, site, interface="127.0.0.1")
+    url = b"http://127.0.0.1:%d/" % (port.getHost().port,)
+    agent = client.Agent(reactor)
+
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            block = os.urandom(2 ** 20)
+            for i in range(megabytes):
+                f.write(block)
+        for name, factory in [
+                ("twisted", client.FileBodyProducer),
+                ("adaptive", _producers.FileBodyProducer),
+                ("adaptive, thread", lambda f: _producers.FileBodyProducer(
+                    f, readInThread=True)),
+                ("mmap", _producers.MmapBodyProducer),
+        ]:
+            received, elapsed = yield upload(reactor, agent, url, path,
+                                             factory)
+            assert received == megabytes * 2 ** 20
+            print("%-20s %8.1f MB/s" % (name, megabytes / elapsed))
+    finally:
+        os.remove(path)
+        yield port.stopListening()
+
+
+if __name__ == "__main__":
+    task.react(main, sys.argv[1:])
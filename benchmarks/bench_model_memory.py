@@ -0,0 +1,57 @@
+"""
+Measure the memory used by the items of a large bucket listing, with the
+slotted L{txaws.s3.model.BucketItem} and with an equivalent class that keeps
+its attributes in a C{__dict__}, as it did before.
+
+Run it with C{python benchmarks/bench_model_memory.py [items]}.
+"""
+import gc
+import sys
+import tracemalloc
+from datetime import datetime
+
+import attr
+
+from txaws.s3.model import BucketItem, ItemOwner
+
+
+_DictBucketItem = attr.make_class(
+    "BucketItem",
+    ["key", "modification_date", "etag", "size", "storage_class", "owner"],
+)
+
+
+def measure(item_factory, count):
+    owner = ItemOwner(id="8a6925ce4a7f21c32aa3", display_name="webfile")
+    modified = datetime(2009, 10, 12, 17, 50, 30)
+    gc.collect()
+    tracemalloc.start()
+    items = [
+        item_factory(
+            key="photos/2006/%d.jpg" % (i,),
+            modification_date=modified,
+            etag='"fba9dede5f27731c9771645a39863328"',
+            size=b"434234",
+            storage_class="STANDARD",
+            owner=owner,
+        )
+        for i in range(count)
+    ]
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return used
+
+
+def main(count=1000000):
+    count = int(count)
+    for name, factory in [
+            ("__dict__", _DictBucketItem),
+            ("__slots__", BucketItem),
+    ]:
+        used = measure(factory, count)
+        print("%-10s %8.1f MB" % (name, used / 2.0 ** 20))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,61 @@
+"""
+Measure the parsing of a I{ListResourceRecordSets} response for a synthetic
+zone of 10000 rrsets, next to the cost of only building its XML tree.
+
+Run it with C{python benchmarks/bench_route53_parse.py}.
+"""
+import timeit
+
+from txaws.route53.client import _parse_rrsets_page
+from txaws.util import XML
+
+RRSET = (
+    "<ResourceRecordSet><Name>{label}</Name><Type>{type}</Type>"
+    "<TTL>300</TTL><ResourceRecords>{records}</ResourceRecords>"
+    "</ResourceRecordSet>"
+)
+RECORD = "<ResourceRecord><Value>{value}</Value></ResourceRecord>"
+
+
+def make_response(rrsets=10000):
+    parts = []
+    for i in range(rrsets // 4):
+        label = "host{}.xn--bcher-kva.example.".format(i)
+        parts.append(RRSET.format(
+            label=label, type="A",
+            records=RECORD.format(value="10.0.{}.{}".format(i // 256, i % 256)),
+        ))
+        parts.append(RRSET.format(
+            label=label, type="AAAA",
+            records=RECORD.format(value="2001:db8::{:x}".format(i)),
+        ))
+        parts.append(RRSET.format(
+            label=label, type="MX",
+            records="".join(
+                RECORD.format(value="{} mx{}.example.".format(n, n))
+                for n in range(2)
+            ),
+        ))
+        parts.append(RRSET.format(
+            label="www." + label, type="CNAME",
+            records=RECORD.format(value=label),
+        ))
+    return (
+        '<?xml version="1.0"?>\n'
+        '<ListResourceRecordSetsResponse '
+        'xmlns="https://route53.amazonaws.com/doc/2013-04-01/">'
+        "<ResourceRecordSets>{}</ResourceRecordSets>"
+        "<IsTruncated>false</IsTruncated><MaxItems>10000</MaxItems>"
+        "</ListResourceRecordSetsResponse>"
+    ).format("".join(parts)).encode("utf-8")
+
+
+def main(number=5):
+    body = make_response()
+    for name, parse in [("tree only", XML), ("rrsets", _parse_rrsets_page)]:
+        elapsed = timeit.timeit(lambda: parse(body), number=number)
+        print("%-10s %8.1f ms/response" % (name, elapsed / number * 1e3))
+
+
+if __name__ == "__main__":
+    main()
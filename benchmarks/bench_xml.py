@@ -0,0 +1,56 @@
+"""
+Measure the throughput of L{txaws.util.XML} on the largest sample responses
+in L{txaws.testing.payload}, and on a describe response with a thousand
+times as many items, next to the namespace-fixing tree builder it used to
+go through.
+
+Run it with C{python benchmarks/bench_xml.py}.
+"""
+import re
+import timeit
+
+from xml.etree.ElementTree import XMLParser
+
+from txaws.testing import payload
+from txaws.util import XML, NamespaceFixXmlTreeBuilder
+
+
+def builder_XML(text):
+    parser = XMLParser(target=NamespaceFixXmlTreeBuilder())
+    parser.feed(text)
+    return parser.close()
+
+
+def make_large(text, copies=1000):
+    """
+    Repeat the reservations of a I{DescribeInstances} response.
+    """
+    items = re.search(
+        r"<reservationSet>(.*)</reservationSet>", text, re.S).group(1)
+    return text.replace(items, items * copies, 1)
+
+
+def main(number=200):
+    samples = [
+        (name, getattr(payload, name).encode("utf-8"))
+        for name in [
+            "sample_describe_security_groups_multiple_result",
+            "sample_run_instances_result",
+            "sample_describe_instances_result",
+            "sample_get_bucket_result",
+        ]
+    ]
+    samples.append((
+        "1000 x describe_instances",
+        make_large(payload.sample_describe_instances_result).encode("utf-8"),
+    ))
+    for name, body in samples:
+        n = max(1, number * 1000 // len(body))
+        print(name)
+        for label, parse in [("builder", builder_XML), ("XML", XML)]:
+            elapsed = timeit.timeit(lambda: parse(body), number=n)
+            print("  %-8s %8.1f MB/s" % (label, len(body) * n / elapsed / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import hashlib
 import hmac
 import urllib.request, urllib.parse, urllib.error
 import urllib.parse
+from collections import OrderedDict
 
 import attr
 
@@ -57,6 +58,35 @@ def getSignatureKey(key, dateStamp, regionName, serviceName):
     return kSigning
 
 
+_SIGNATURE_KEY_CACHE_SIZE = 256
+_signature_keys = OrderedDict()
+
+
+def _get_cached_signature_key(key, dateStamp, regionName, serviceName):
+    """
+    Like L{getSignatureKey}, but memoized.
+
+    A signing key only changes once a day for a given secret key, region
+    and service, so the four HMAC rounds needed to derive it can be shared
+    by all the requests signed or verified in that time.  The memo is keyed
+    on a SHA-256 digest of the secret key, so it doesn't keep the secret
+    keys themselves around, and holds the most recently used
+    C{_SIGNATURE_KEY_CACHE_SIZE} signing keys.
+    """
+    key_digest = hashlib.sha256(
+        key.encode() if type(key) == str else key).digest()
+    cache_key = (key_digest, dateStamp, regionName, serviceName)
+    try:
+        signature_key = _signature_keys.pop(cache_key)
+    except KeyError:
+        signature_key = getSignatureKey(
+            key, dateStamp, regionName, serviceName)
+        if len(_signature_keys) >= _SIGNATURE_KEY_CACHE_SIZE:
+            _signature_keys.popitem(last=False)
+    _signature_keys[cache_key] = signature_key
+    return signature_key
+
+
 def makeAMZDate(instant):
     """
     Serialize a L{datetime.datetime} according to the "amz date" format.
@@ -462,7 +492,8 @@ def _make_authorization_header(region,
     )
 
     signature = signable.signature(
-        getSignatureKey(credentials.secret_key, date_stamp, region, service))
+        _get_cached_signature_key(
+            credentials.secret_key, date_stamp, region, service))
 
     v4credential = _Credential(
         access_key=credentials.access_key,
@@ -476,3 +507,44 @@ def _make_authorization_header(region,
             "SignedHeaders=%s" % (canonical_request.signed_headers,),
             "Signature=%s" % (signature,),
         ]))
+
+
+def _parse_authorization_header(value):
+    """
+    Parse the value of an AWS version 4 C{Authorization} header, as built
+    by L{_make_authorization_header}.
+
+    @param value: The value of the C{Authorization} header.
+    @type value: L{str}
+
+    @return: A 3-tuple of the L{_Credential} the request was signed with,
+        its 'signed headers' (see L{_make_signed_headers}) and the hex
+        signature.
+    @rtype: L{tuple}
+
+    @raises ValueError: If the value is not a well-formed AWS version 4
+        authorization.
+    """
+    algorithm, _, rest = value.partition(" ")
+    if algorithm != _SignableAWS4HMAC256Token.ALGORITHM:
+        raise ValueError("Unsupported algorithm %r" % (algorithm,))
+    try:
+        fields = dict(
+            part.strip().split("=", 1) for part in rest.split(","))
+        access_key, date_stamp, region, service, terminator = (
+            fields["Credential"].rsplit("/", 4))
+        signed_headers = fields["SignedHeaders"]
+        signature = fields["Signature"]
+    except (KeyError, ValueError):
+        raise ValueError("Malformed authorization %r" % (value,))
+    if terminator != "aws4_request":
+        raise ValueError("Malformed credential scope %r" % (value,))
+    credential = _Credential(
+        access_key=access_key,
+        credential_scope=_CredentialScope(
+            date_stamp=date_stamp,
+            region=region,
+            service=service,
+        ),
+    )
+    return credential, signed_headers, signature
@@ -35,7 +35,6 @@ from twisted.web.http import OK, NO_CONTENT, PotentialDataLoss
 from twisted.web.http_headers import Headers
 from twisted.web.error import Error as TwistedWebError
 
-from txaws.util import parse
 from txaws.credentials import AWSCredentials
 from txaws.exception import AWSResponseParseError
 from txaws.service import AWSServiceEndpoint
@@ -563,20 +562,12 @@ class _Query(object):
             # Work around for https://twistedmatrix.com/trac/ticket/8984
             body_producer = FileBodyProducer(BytesIO(b""))
 
-        d = agent.request(
-            method.encode(),
-            url.encode(),
-            headers,
-            body_producer,
-        )
+        d = _request(agent, method, url, headers, body_producer)
         d.addCallback(self._handle_response)
         return d
 
     def _handle_response(self, response):
-        receiver = StreamingBodyReceiver()
-        receiver.finished = d = Deferred()
-        receiver.content_length = response.length
-        response.deliverBody(receiver)
+        d = _receive(response, StreamingBodyReceiver)
         d.addCallback(self._check_response, response)
         return d
 
@@ -586,6 +577,39 @@ class _Query(object):
         return (response, data)
 
 
+def _request(agent, method, url, headers, body_producer):
+    """
+    Issue an HTTP request, the step shared by L{_Query.submit} and
+    L{BaseQuery.get_page} once a request is signed.
+
+    @param method: The HTTP method of the request.
+    @type method: L{str}
+
+    @param url: The complete, encoded URL of the request.
+    @type url: L{str}
+
+    @return: A L{Deferred} that fires with the L{IResponse}.
+    """
+    return agent.request(method.encode(), url.encode(), headers, body_producer)
+
+
+def _receive(response, receiver_factory):
+    """
+    Deliver the body of a response to a new receiver.
+
+    @param receiver_factory: A callable returning a protocol like
+        L{StreamingBodyReceiver}, with C{finished} and C{content_length}
+        attributes.
+
+    @return: The L{Deferred} the receiver fires with the body.
+    """
+    receiver = receiver_factory()
+    receiver.finished = d = Deferred()
+    receiver.content_length = response.length
+    response.deliverBody(receiver)
+    return d
+
+
 # Something like this belongs in Twisted, perhaps.  At least, the
 # "give me an Agent and respect the OS conventions for proxy
 # configuration" logic.
@@ -622,9 +646,17 @@ class FakeClient(object):
 
 
 class BaseQuery(object):
+    """
+    A query signed by its subclass, issued through the same request and
+    response handling as L{_Query}.
+
+    @param agent: The L{IAgent} provider to issue the request with, for
+        example one sharing a persistent L{HTTPConnectionPool} with other
+        clients, or C{None} for one suitable for the endpoint.
+    """
 
     def __init__(self, action=None, creds=None, endpoint=None, reactor=None,
-        body_producer=None, receiver_factory=None):
+        body_producer=None, receiver_factory=None, agent=None):
         if not action:
             raise TypeError("The query requires an action parameter.")
         self.action = action
@@ -633,6 +665,7 @@ class BaseQuery(object):
         if reactor is None:
             from twisted.internet import reactor
         self.reactor = reactor
+        self.agent = agent
         self._client = None
         self.request_headers = None
         self.response_headers = None
@@ -641,25 +674,32 @@ class BaseQuery(object):
 
     def get_page(self, url, *args, **kwds):
         """
-        Define our own get_page method so that we can easily override the
-        factory when we need to. This was copied from the following:
-            * twisted.web.client.getPage
-            * twisted.web.client._makeGetterFactory
+        Issue a request to the given URL and collect the response body.
+
+        @param url: The complete, encoded URL of the request.
+        @param method: The HTTP method, I{GET} by default.
+        @param postdata: The body of the request, if there's no
+            C{body_producer}.
+        @param headers: A C{dict} of the headers of the request.
         """
-        contextFactory = None
-        scheme, host, port, path = parse(url)
         data = kwds.get('postdata', None)
         self._method = method = kwds.get('method', 'GET')
         self.request_headers = self._headers(kwds.get('headers', {}))
         if (self.body_producer is None) and (data is not None):
+            if isinstance(data, str):
+                data = data.encode("utf-8")
             self.body_producer = FileBodyProducer(BytesIO(data))
-        if self.endpoint.ssl_hostname_verification:
-            contextFactory = None
-        else:
-            contextFactory = WebClientContextFactory()
-        agent = _get_agent(scheme, host, self.reactor, contextFactory)
-        d = agent.request(method.encode(), url.encode(), self.request_headers,
-                          self.body_producer)
+        agent = self.agent
+        if agent is None:
+            if self.endpoint.ssl_hostname_verification:
+                contextFactory = None
+            else:
+                contextFactory = WebClientContextFactory()
+            parts = urllib.parse.urlsplit(url)
+            agent = _get_agent(
+                parts.scheme, parts.hostname, self.reactor, contextFactory)
+        d = _request(agent, method, url, self.request_headers,
+                     self.body_producer)
         d.addCallback(self._handle_response)
         return d
 
@@ -698,10 +738,7 @@ class BaseQuery(object):
         # http://twistedmatrix.com/trac/ticket/5476
         if self._method.upper() == 'HEAD' or response.code == NO_CONTENT:
             return succeed('')
-        receiver = self.receiver_factory()
-        receiver.finished = d = Deferred()
-        receiver.content_length = response.length
-        response.deliverBody(receiver)
+        d = _receive(response, self.receiver_factory)
         if response.code >= 400:
             d.addCallback(self._fail_response, response)
         return d
@@ -172,6 +172,29 @@ class BaseQueryTestCase(TestCase):
         d.addCallback(self.assertEqual, b"0123456789")
         return d
 
+    def test_get_page_with_agent(self):
+        """
+        L{BaseQuery.get_page} issues the request with the agent the query
+        was created with, encoding text post data.
+        """
+        agent = StubAgent()
+        query = BaseQuery(
+            "an action", "creds", AWSServiceEndpoint("http://endpoint"),
+            agent=agent,
+        )
+        query.get_page(
+            "http://endpoint/path?a=b", method="POST", postdata="a=b",
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        [(method, url, headers, body_producer, _)] = agent._requests
+        self.assertEqual(b"POST", method)
+        self.assertEqual(b"http://endpoint/path?a=b", url)
+        self.assertEqual(
+            [b"application/x-www-form-urlencoded"],
+            headers.getRawHeaders(b"content-type"),
+        )
+        self.assertEqual(3, body_producer.length)
+
     def test_get_request_headers_no_client(self):
 
         query = BaseQuery("an action", "creds", "http://endpoint")
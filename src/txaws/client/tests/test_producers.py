@@ -0,0 +1,273 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for L{txaws.client._producers}.
+"""
+
+from hashlib import sha256
+from io import BytesIO
+
+from zope.interface.verify import verifyObject
+
+from twisted.internet.task import Clock, Cooperator
+from twisted.trial.unittest import TestCase
+from twisted.web.iweb import UNKNOWN_LENGTH, IBodyProducer
+
+from txaws.client._producers import FileBodyProducer, MmapBodyProducer
+
+
+class _Consumer(object):
+    """
+    A consumer which records the chunks written to it, and pauses the
+    producer when told to.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.producer = None
+        self.pause_after = None
+
+    def write(self, data):
+        self.chunks.append(data)
+        if self.pause_after is not None and len(data) >= self.pause_after:
+            self.producer.pauseProducing()
+
+
+class FileBodyProducerTests(TestCase):
+    """
+    Tests for L{FileBodyProducer}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        # One read per tick of the clock.
+        self.cooperator = Cooperator(
+            terminationPredicateFactory=lambda: lambda: True,
+            scheduler=lambda work: self.clock.callLater(1, work),
+        )
+        self.consumer = _Consumer()
+
+    def producer(self, input_file, **kwargs):
+        producer = FileBodyProducer(
+            input_file, cooperator=self.cooperator, **kwargs
+        )
+        self.consumer.producer = producer
+        return producer
+
+    def test_interface(self):
+        """
+        L{FileBodyProducer} provides L{IBodyProducer}.
+        """
+        self.assertTrue(
+            verifyObject(IBodyProducer, FileBodyProducer(BytesIO(b"")))
+        )
+
+    def test_length(self):
+        """
+        The length is the number of bytes left in the file, or
+        L{UNKNOWN_LENGTH} if the file can't seek.
+        """
+        input_file = BytesIO(b"hello, world")
+        input_file.seek(7)
+        self.assertEqual(5, FileBodyProducer(input_file).length)
+        self.assertEqual(7, input_file.tell())
+        self.assertEqual(UNKNOWN_LENGTH, FileBodyProducer(object()).length)
+
+    def test_growing_reads(self):
+        """
+        The reads double in size while the consumer keeps up, up to the
+        maximum size, and the file is closed once read.
+        """
+        data = b"x" * 100
+        input_file = BytesIO(data)
+        d = self.producer(
+            input_file, readSize=4, maxReadSize=32,
+        ).startProducing(self.consumer)
+        while not d.called:
+            self.clock.advance(1)
+        self.assertEqual(
+            [4, 8, 16, 32, 32, 8],
+            [len(chunk) for chunk in self.consumer.chunks],
+        )
+        self.assertEqual(data, b"".join(self.consumer.chunks))
+        self.assertTrue(input_file.closed)
+
+    def test_shrinking_reads(self):
+        """
+        The reads halve in size each time the consumer pauses the producer.
+        """
+        producer = self.producer(
+            BytesIO(b"x" * 100), readSize=4, maxReadSize=64,
+        )
+        self.consumer.pause_after = 16
+        d = producer.startProducing(self.consumer)
+        for i in range(3):
+            self.clock.advance(1)
+        self.assertEqual(
+            [4, 8, 16], [len(chunk) for chunk in self.consumer.chunks],
+        )
+        self.assertEqual(8, producer._readSize)
+        self.consumer.pause_after = None
+        producer.resumeProducing()
+        while not d.called:
+            self.clock.advance(1)
+        self.assertEqual(
+            [4, 8, 16, 8, 16, 32, 16],
+            [len(chunk) for chunk in self.consumer.chunks],
+        )
+
+    def test_stop_producing(self):
+        """
+        Stopping the producer closes the file, stops the writes and leaves
+        the L{Deferred} of C{startProducing} unfired.
+        """
+        input_file = BytesIO(b"x" * 100)
+        producer = self.producer(input_file, readSize=4)
+        d = producer.startProducing(self.consumer)
+        self.clock.advance(1)
+        producer.stopProducing()
+        self.clock.advance(1)
+        self.assertEqual([b"xxxx"], self.consumer.chunks)
+        self.assertTrue(input_file.closed)
+        self.assertNoResult(d)
+
+    def test_read_in_thread(self):
+        """
+        With C{readInThread}, the file is read in a thread.
+        """
+        path = self.mktemp()
+        data = b"".join(b"%d\n" % i for i in range(100000))
+        with open(path, "wb") as f:
+            f.write(data)
+        input_file = open(path, "rb")
+        producer = FileBodyProducer(
+            input_file, maxReadSize=2 ** 17, readInThread=True,
+        )
+
+        d = producer.startProducing(self.consumer)
+
+        def produced(ignored):
+            self.assertEqual(data, b"".join(self.consumer.chunks))
+            self.assertTrue(input_file.closed)
+        d.addCallback(produced)
+        return d
+
+    def test_stop_producing_in_thread(self):
+        """
+        Stopping a producer reading in a thread closes the file once the
+        read in progress is done.
+        """
+        path = self.mktemp()
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+        input_file = open(path, "rb")
+        producer = self.producer(input_file, readSize=4, readInThread=True)
+        d = producer.startProducing(self.consumer)
+        self.clock.advance(1)
+        reading = producer._reading
+        self.assertIsNot(None, reading)
+        producer.stopProducing()
+        self.assertFalse(input_file.closed)
+        self.assertNoResult(d)
+
+        def read(ignored):
+            self.assertTrue(input_file.closed)
+            self.assertEqual([], self.consumer.chunks)
+        return reading.addCallback(read)
+
+
+class MmapBodyProducerTests(TestCase):
+    """
+    Tests for L{MmapBodyProducer}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.cooperator = Cooperator(
+            terminationPredicateFactory=lambda: lambda: True,
+            scheduler=lambda work: self.clock.callLater(1, work),
+        )
+        self.consumer = _Consumer()
+        self.data = bytes(bytearray(range(256))) * 1024
+        self.path = self.mktemp()
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+    def producer(self, **kwargs):
+        with open(self.path, "rb") as input_file:
+            return MmapBodyProducer(
+                input_file, cooperator=self.cooperator, **kwargs
+            )
+
+    def produce(self, producer):
+        d = producer.startProducing(self.consumer)
+        while not d.called:
+            self.clock.advance(1)
+        return b"".join(self.consumer.chunks)
+
+    def test_interface(self):
+        """
+        L{MmapBodyProducer} provides L{IBodyProducer}.
+        """
+        self.assertTrue(verifyObject(IBodyProducer, self.producer()))
+
+    def test_whole_file(self):
+        """
+        By default the whole file is written, a chunk at a time, and the
+        mapping is released once done.
+        """
+        producer = self.producer(chunkSize=100000)
+        self.assertEqual(len(self.data), producer.length)
+        self.assertEqual(self.data, self.produce(producer))
+        self.assertEqual(
+            [100000, 100000, 62144],
+            [len(chunk) for chunk in self.consumer.chunks],
+        )
+        self.assertIs(None, producer._map)
+
+    def test_range(self):
+        """
+        A range of bytes of the file, which needn't start on a page
+        boundary, can be written instead.
+        """
+        producer = self.producer(offset=70001, length=5000)
+        self.assertEqual(5000, producer.length)
+        self.assertEqual(self.data[70001:75001], self.produce(producer))
+
+    def test_empty(self):
+        """
+        An empty range writes nothing.
+        """
+        producer = self.producer(offset=len(self.data))
+        self.assertEqual(0, producer.length)
+        self.assertEqual(sha256(b"").hexdigest(), producer.sha256_hexdigest())
+        self.assertEqual(b"", self.produce(producer))
+
+    def test_bad_range(self):
+        """
+        A negative offset or length is rejected.
+        """
+        self.assertRaises(ValueError, self.producer, offset=-1)
+        self.assertRaises(ValueError, self.producer, length=-1)
+
+    def test_sha256_hexdigest(self):
+        """
+        L{MmapBodyProducer.sha256_hexdigest} gives the hex digest of the
+        SHA256 hash of the bytes written.
+        """
+        producer = self.producer(offset=10, length=100000)
+        self.assertEqual(
+            sha256(self.data[10:100010]).hexdigest(),
+            producer.sha256_hexdigest(),
+        )
+
+    def test_stop_producing(self):
+        """
+        Stopping the producer stops the writes, releases the mapping and
+        leaves the L{Deferred} of C{startProducing} unfired.
+        """
+        producer = self.producer(chunkSize=1000)
+        d = producer.startProducing(self.consumer)
+        self.clock.advance(1)
+        producer.stopProducing()
+        self.clock.advance(1)
+        self.assertEqual([self.data[:1000]], self.consumer.chunks)
+        self.assertIs(None, producer._map)
+        self.assertNoResult(d)
@@ -6,7 +6,7 @@
 """EC2 client support."""
 
 from base64 import b64decode, b64encode
-from datetime import datetime
+from functools import partial
 from urllib.parse import quote
 
 from dateutil.parser import parse as parse_timestamp
@@ -15,7 +15,7 @@ from txaws import version
 from txaws.client.base import BaseClient, BaseQuery, error_wrapper
 from txaws.ec2 import model
 from txaws.ec2.exception import EC2Error
-from txaws.util import iso8601time, XML
+from txaws.util import iso8601time, parse_iso8601, XML
 
 
 __all__ = ["EC2Client", "Query", "Parser"]
@@ -26,12 +26,19 @@ def ec2_error_wrapper(error):
 
 
 class EC2Client(BaseClient):
-    """A client for EC2."""
+    """A client for EC2.
+
+    @param agent: The L{IAgent} provider to issue all the queries with, for
+        example one with a persistent L{HTTPConnectionPool}, or C{None} for
+        a new one per query.
+    """
 
     def __init__(self, creds=None, endpoint=None, query_factory=None,
-                 parser=None):
+                 parser=None, agent=None):
         if query_factory is None:
             query_factory = Query
+        if agent is not None:
+            query_factory = partial(query_factory, agent=agent)
         if parser is None:
             parser = Parser()
         super(EC2Client, self).__init__(creds, endpoint, query_factory, parser)
@@ -800,8 +807,7 @@ class Parser(object):
             availability_zone = volume_data.findtext("availabilityZone")
             status = volume_data.findtext("status")
             create_time = volume_data.findtext("createTime")
-            create_time = datetime.strptime(
-                create_time[:19], "%Y-%m-%dT%H:%M:%S")
+            create_time = parse_iso8601(create_time, naive=True)
             volume = model.Volume(
                 volume_id, size, status, create_time, availability_zone,
                 snapshot_id)
@@ -811,8 +817,7 @@ class Parser(object):
                 device = attachment_data.findtext("device")
                 status = attachment_data.findtext("status")
                 attach_time = attachment_data.findtext("attachTime")
-                attach_time = datetime.strptime(
-                    attach_time[:19], "%Y-%m-%dT%H:%M:%S")
+                attach_time = parse_iso8601(attach_time, naive=True)
                 attachment = model.Attachment(
                     instance_id, device, status, attach_time)
                 volume.attachments.append(attachment)
@@ -832,8 +837,7 @@ class Parser(object):
         availability_zone = root.findtext("availabilityZone")
         status = root.findtext("status")
         create_time = root.findtext("createTime")
-        create_time = datetime.strptime(
-            create_time[:19], "%Y-%m-%dT%H:%M:%S")
+        create_time = parse_iso8601(create_time, naive=True)
         volume = model.Volume(
             volume_id, size, status, create_time, availability_zone,
             snapshot_id)
@@ -856,8 +860,7 @@ class Parser(object):
             volume_id = snapshot_data.findtext("volumeId")
             status = snapshot_data.findtext("status")
             start_time = snapshot_data.findtext("startTime")
-            start_time = datetime.strptime(
-                start_time[:19], "%Y-%m-%dT%H:%M:%S")
+            start_time = parse_iso8601(start_time, naive=True)
             progress = snapshot_data.findtext("progress")[:-1]
             progress = float(progress or "0") / 100.
             snapshot = model.Snapshot(
@@ -879,8 +882,7 @@ class Parser(object):
         volume_id = root.findtext("volumeId")
         status = root.findtext("status")
         start_time = root.findtext("startTime")
-        start_time = datetime.strptime(
-            start_time[:19], "%Y-%m-%dT%H:%M:%S")
+        start_time = parse_iso8601(start_time, naive=True)
         progress = root.findtext("progress")[:-1]
         progress = float(progress or "0") / 100.
         return model.Snapshot(
@@ -898,8 +900,7 @@ class Parser(object):
         root = XML(xml_bytes)
         status = root.findtext("status")
         attach_time = root.findtext("attachTime")
-        attach_time = datetime.strptime(
-            attach_time[:19], "%Y-%m-%dT%H:%M:%S")
+        attach_time = parse_iso8601(attach_time, naive=True)
         return {"status": status, "attach_time": attach_time}
 
     def describe_keypairs(self, xml_bytes):
@@ -17,6 +17,9 @@ class Reservation(object):
     @attrib owner_id: AWS Access Key ID of the user who owns the reservation.
     @attrib groups: A list of security groups.
     """
+
+    __slots__ = ("reservation_id", "owner_id", "groups")
+
     def __init__(self, reservation_id, owner_id, groups=None):
         self.reservation_id = reservation_id
         self.owner_id = owner_id
@@ -49,6 +52,14 @@ class Instance(object):
     @attrib kernel_id: Optional. Kernel associated with this instance.
     @attrib ramdisk_id: Optional. RAM disk associated with this instance.
     """
+
+    __slots__ = (
+        "instance_id", "instance_state", "instance_type", "image_id",
+        "private_dns_name", "dns_name", "private_ip_address", "ip_address",
+        "key_name", "ami_launch_index", "launch_time", "placement",
+        "product_codes", "kernel_id", "ramdisk_id", "reservation",
+    )
+
     def __init__(self, instance_id, instance_state, instance_type="",
                  image_id="", private_dns_name="", dns_name="",
                  private_ip_address="", ip_address="", key_name="",
@@ -104,6 +115,12 @@ class SecurityGroup(object):
     @ivar allowed_ips: The sequence of L{IPPermission} instances for this
         security group.
     """
+
+    __slots__ = (
+        "id", "name", "description", "owner_id", "allowed_groups",
+        "allowed_ips",
+    )
+
     def __init__(self, id, name, description, owner_id="", groups=None, ips=None):
         self.id = id
         self.name = name
@@ -116,6 +133,8 @@ class SecurityGroup(object):
 class UserIDGroupPair(object):
     """A user ID/group name pair associated with a L{SecurityGroup}."""
 
+    __slots__ = ("user_id", "group_name")
+
     def __init__(self, user_id, group_name):
         self.user_id = user_id
         self.group_name = group_name
@@ -124,6 +143,8 @@ class UserIDGroupPair(object):
 class IPPermission(object):
     """An IP permission associated with a L{SecurityGroup}."""
 
+    __slots__ = ("ip_protocol", "from_port", "to_port", "cidr_ip")
+
     def __init__(self, ip_protocol, from_port, to_port, cidr_ip):
         self.ip_protocol = ip_protocol
         self.from_port = from_port
@@ -134,6 +155,11 @@ class IPPermission(object):
 class Volume(object):
     """An EBS volume instance."""
 
+    __slots__ = (
+        "id", "size", "status", "create_time", "availability_zone",
+        "snapshot_id", "attachments",
+    )
+
     def __init__(self, id, size, status, create_time, availability_zone,
                  snapshot_id):
         self.id = id
@@ -148,6 +174,8 @@ class Volume(object):
 class Attachment(object):
     """An attachment of a L{Volume}."""
 
+    __slots__ = ("instance_id", "device", "status", "attach_time")
+
     def __init__(self, instance_id, device, status, attach_time):
         self.instance_id = instance_id
         self.device = device
@@ -158,6 +186,8 @@ class Attachment(object):
 class Snapshot(object):
     """A snapshot of a L{Volume}."""
 
+    __slots__ = ("id", "volume_id", "status", "start_time", "progress")
+
     def __init__(self, id, volume_id, status, start_time, progress):
         self.id = id
         self.volume_id = volume_id
@@ -169,6 +199,8 @@ class Snapshot(object):
 class Keypair(object):
     """A convenience object for holding keypair data."""
 
+    __slots__ = ("name", "fingerprint", "material")
+
     def __init__(self, name, fingerprint, material=None):
         self.name = name
         self.fingerprint = fingerprint
@@ -178,6 +210,8 @@ class Keypair(object):
 class AvailabilityZone(object):
     """A convenience object for holding availability zone data."""
 
+    __slots__ = ("name", "state")
+
     def __init__(self, name, state):
         self.name = name
         self.state = state
@@ -8,8 +8,10 @@ import os
 
 from dateutil.zoneinfo import gettz
 
+from zope.interface import implementer
+
 from twisted.internet import reactor
-from twisted.internet.defer import succeed, fail
+from twisted.internet.defer import Deferred, succeed, fail
 from twisted.internet.error import ConnectionRefusedError
 from twisted.protocols.policies import WrappingFactory
 from twisted.python.failure import Failure
@@ -17,6 +19,7 @@ from twisted.python.filepath import FilePath
 from twisted.trial.unittest import TestCase
 from twisted.web import server, static, util
 from twisted.web.error import Error as TwistedWebError
+from twisted.web.iweb import IAgent
 
 from txaws.util import iso8601time
 from txaws.credentials import ENV_ACCESS_KEY, ENV_SECRET_KEY, AWSCredentials
@@ -101,6 +104,26 @@ class EC2ClientTestCase(TestCase):
         ec2 = client.EC2Client(creds=creds, endpoint=endpoint)
         return ec2.describe_instances()
 
+    def test_agent(self):
+        """
+        The queries of an L{EC2Client} created with an agent are issued
+        with it.
+        """
+        requests = []
+
+        @implementer(IAgent)
+        class Agent(object):
+            def request(self, method, uri, headers=None, bodyProducer=None):
+                requests.append((method, uri))
+                return Deferred()
+
+        creds = AWSCredentials("foo", "bar")
+        ec2 = client.EC2Client(creds=creds, agent=Agent())
+        ec2.describe_instances()
+        [(method, uri)] = requests
+        self.assertEqual(b"GET", method)
+        self.assertIn(b"Action=DescribeInstances", uri)
+
     def test_init_no_creds_non_available_errors(self):
         self.assertRaises(CredentialsNotFoundError, client.EC2Client)
 
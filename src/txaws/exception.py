@@ -1,24 +1,102 @@
 # Copyright (c) 2009 Canonical Ltd <duncan.mcgreggor@canonical.com>
 # Licenced under the txaws licence available at /LICENSE in the txaws source.
 
+import re
+from xml.etree.ElementTree import ParseError
+
 from twisted.web.error import Error
 
 from txaws.util import XML
 
 
+# The element most AWS error responses have, found without parsing them.
+_CODE = re.compile(r"<Code>([^<]*)</Code>")
+_CODE_BYTES = re.compile(_CODE.pattern.encode("ascii"))
+_MESSAGE = re.compile(r"<Message>([^<]*)</Message>")
+_MESSAGE_BYTES = re.compile(_MESSAGE.pattern.encode("ascii"))
+
+# Characters which would be escaped in the XML of an error.
+_ESCAPED = re.compile(r"[&<>\"']")
+
+
 class AWSError(Error):
     """
     A base class for txAWS errors.
+
+    Responses with a I{Code} element, as AWS errors have, are only parsed
+    the first time C{errors}, C{request_id} or C{host_id} are needed, and
+    L{has_error} can often answer without parsing at all, so that errors
+    which are expected and dropped or retried stay cheap.  Other responses
+    are parsed right away, so that an HTML or malformed response fails the
+    construction as before.
     """
     def __init__(self, xml_bytes, status, message=None, response=None):
         super(AWSError, self).__init__(status, message, response)
         if not xml_bytes:
             raise ValueError("XML cannot be empty.")
         self.original = xml_bytes
-        self.errors = []
-        self.request_id = ""
-        self.host_id = ""
-        self.parse()
+        self._errors = None
+        self._request_id = ""
+        self._host_id = ""
+        if self._search(_CODE, _CODE_BYTES) is None:
+            self.parse()
+
+    @property
+    def errors(self):
+        self._parse_once()
+        return self._errors
+
+    @errors.setter
+    def errors(self, value):
+        self._errors = value
+
+    @property
+    def request_id(self):
+        self._parse_once()
+        return self._request_id
+
+    @request_id.setter
+    def request_id(self, value):
+        self._request_id = value
+
+    @property
+    def host_id(self):
+        self._parse_once()
+        return self._host_id
+
+    @host_id.setter
+    def host_id(self, value):
+        self._host_id = value
+
+    def _search(self, text_pattern, bytes_pattern):
+        if isinstance(self.original, bytes):
+            return bytes_pattern.search(self.original)
+        return text_pattern.search(self.original)
+
+    def _parse_once(self):
+        """
+        Parse the response unless it already was.
+
+        If it turns out not to be XML after all, the error is made of the
+        I{Code} and I{Message} elements found in it.
+        """
+        if self._errors is not None:
+            return
+        try:
+            self.parse()
+        except (ParseError, AWSResponseParseError):
+            self._errors = []
+            data = {}
+            for key, text_pattern, bytes_pattern in [
+                    ("Code", _CODE, _CODE_BYTES),
+                    ("Message", _MESSAGE, _MESSAGE_BYTES)]:
+                match = self._search(text_pattern, bytes_pattern)
+                if match is not None:
+                    value = match.group(1)
+                    if isinstance(value, bytes):
+                        value = value.decode("utf-8", "replace")
+                    data[key] = value
+            self._errors.append(data)
 
     def __str__(self):
         return self._get_error_message_string()
@@ -85,6 +163,9 @@ class AWSError(Error):
         if not xml_bytes:
             xml_bytes = self.original
         self.original = xml_bytes
+        self._errors = []
+        self._request_id = ""
+        self._host_id = ""
         tree = XML(xml_bytes.strip())
         self._check_for_html(tree)
         self._set_request_id(tree)
@@ -98,6 +179,13 @@ class AWSError(Error):
             self._set_400_error(tree)
 
     def has_error(self, errorString):
+        if self._errors is None and not _ESCAPED.search(errorString):
+            # A value which isn't anywhere in the response can't be in it.
+            needle = errorString
+            if isinstance(self.original, bytes):
+                needle = needle.encode("utf-8")
+            if needle not in self.original:
+                return False
         for error in self.errors:
             if errorString in error.values():
                 return True
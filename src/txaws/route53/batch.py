@@ -0,0 +1,313 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Coalescing of many small Route53 rrset changes into few change batches.
+"""
+
+__all__ = [
+    "Route53ChangeBatcher",
+]
+
+from collections import OrderedDict
+
+import attr
+
+from twisted.internet.defer import (
+    Deferred, DeferredLock, gatherResults, succeed,
+)
+from twisted.python.failure import Failure
+from twisted.python.reflect import namedAny
+
+from .model import RRSetKey, create_rrset, delete_rrset, upsert_rrset
+
+
+@attr.s
+class _PendingChange(object):
+    """
+    A change waiting to be submitted, along with the L{Deferred}s of all the
+    requested changes it stands for.
+    """
+    change = attr.ib()
+    waiting = attr.ib(default=attr.Factory(list))
+
+
+def _cost(change):
+    """
+    Compute how much of the per-request limits of I{ChangeResourceRecordSets}
+    a change uses.
+
+    @return: A two-tuple of the number of I{ResourceRecord} elements and the
+        number of characters of their I{Value}s.  I{UPSERT}s count twice.
+    """
+    records = change.rrset.records
+    factor = 2 if change.action == "UPSERT" else 1
+    return (
+        factor * len(records),
+        factor * sum(len(record.to_text()) for record in records),
+    )
+
+
+@attr.s
+class _Batch(object):
+    """
+    The changes accumulated for one hosted zone, keyed by L{RRSetKey} in the
+    order they were first requested.
+    """
+    changes = attr.ib(default=attr.Factory(OrderedDict))
+    records = attr.ib(default=0)
+    characters = attr.ib(default=0)
+    timer = attr.ib(default=None)
+
+    def add(self, pending):
+        key = RRSetKey(pending.change.rrset.label, pending.change.rrset.type)
+        self.changes.setdefault(key, []).append(pending)
+        self._account(pending.change, 1)
+
+    def replace(self, pending, change):
+        self._account(pending.change, -1)
+        pending.change = change
+        self._account(change, 1)
+
+    def remove(self, key, pending):
+        self._account(pending.change, -1)
+        entries = self.changes[key]
+        entries.remove(pending)
+        if not entries:
+            del self.changes[key]
+
+    def _account(self, change, sign):
+        records, characters = _cost(change)
+        self.records += sign * records
+        self.characters += sign * characters
+
+    def __iter__(self):
+        for entries in self.changes.values():
+            for pending in entries:
+                yield pending
+
+
+@attr.s
+class Route53ChangeBatcher(object):
+    """
+    Accumulate rrset changes per hosted zone and submit them with as few
+    I{ChangeResourceRecordSets} requests as possible.
+
+    Changes requested for the same rrset before their batch is submitted are
+    combined when the outcome is well-defined: a I{CREATE} followed by a
+    I{DELETE} of the same rrset cancels out, and a I{CREATE} or I{UPSERT}
+    followed by an I{UPSERT} collapses into the first action with the last
+    rrset.  A I{DELETE} followed by a I{CREATE} is kept in the same batch.
+    Any other sequence closes the current batch so the changes are applied
+    in the order they were requested.
+
+    A batch is submitted C{delay} seconds after its first change, when it
+    can't take another change without going over the Route53 limits on
+    resource records or value characters per request, or on L{flush}.
+    Batches for the same zone are submitted one at a time, in order.
+
+    @ivar client: The Route53 client to submit the changes with.
+
+    @ivar delay: The number of seconds to wait for more changes before
+        submitting a batch.
+    @type delay: L{float}
+
+    @ivar max_records: The maximum number of I{ResourceRecord} elements per
+        request, counting I{UPSERT}s twice.
+    @type max_records: L{int}
+
+    @ivar max_characters: The maximum number of characters of I{Value}
+        elements per request, counting I{UPSERT}s twice.
+    @type max_characters: L{int}
+
+    @ivar reactor: The L{IReactorTime} provider to schedule submissions with.
+    """
+    client = attr.ib()
+    delay = attr.ib(default=1.0)
+    max_records = attr.ib(default=1000)
+    max_characters = attr.ib(default=32000)
+    reactor = attr.ib(
+        default=attr.Factory(lambda: namedAny("twisted.internet.reactor")),
+    )
+
+    _batches = attr.ib(default=attr.Factory(dict), init=False)
+    _locks = attr.ib(default=attr.Factory(dict), init=False)
+
+    def create_rrset(self, zone_id, rrset):
+        """
+        Request the creation of an rrset.
+
+        @return: A L{Deferred} that fires with the
+            L{txaws.route53.model.ChangeInfo} of the batch holding the change
+            once it has been accepted, or with a L{Failure} if it was
+            rejected.
+        """
+        return self.change(zone_id, create_rrset(rrset))
+
+    def upsert_rrset(self, zone_id, rrset):
+        """
+        Request the creation or replacement of an rrset.
+
+        @see: L{create_rrset}
+        """
+        return self.change(zone_id, upsert_rrset(rrset))
+
+    def delete_rrset(self, zone_id, rrset):
+        """
+        Request the deletion of an rrset.
+
+        @see: L{create_rrset}
+        """
+        return self.change(zone_id, delete_rrset(rrset))
+
+    def change(self, zone_id, change):
+        """
+        Request a change to the rrsets of a hosted zone.
+
+        @type zone_id: L{unicode}
+
+        @param change: An L{txaws.route53.interface.IRRSetChange} provider.
+
+        @return: A L{Deferred} that fires with the
+            L{txaws.route53.model.ChangeInfo} of the batch holding the change
+            once it has been accepted, with L{None} if the change was
+            cancelled out by a later one, or with a L{Failure} if the batch
+            holding it was rejected.
+        """
+        waiting = Deferred()
+        self._add(zone_id, _PendingChange(change, [waiting]))
+        return waiting
+
+    def _add(self, zone_id, pending):
+        """
+        Add a change to the pending batch of a zone, combining it with the
+        changes already there or starting a new batch as needed.
+        """
+        batch = self._batches.get(zone_id)
+        if batch is not None:
+            if not self._combine(batch, pending):
+                self._submit(zone_id)
+                batch = None
+            elif pending.change is None:
+                return
+            elif not self._fits(batch, _cost(pending.change)):
+                self._submit(zone_id)
+                batch = None
+        if batch is None:
+            batch = self._batches[zone_id] = _Batch()
+            batch.timer = self.reactor.callLater(
+                self.delay, self._submit, zone_id,
+            )
+        batch.add(pending)
+
+    def _fits(self, batch, cost):
+        """
+        Check whether a batch can take a change of the given cost without
+        going over the per-request limits.
+        """
+        records, characters = cost
+        return (
+            batch.records + records <= self.max_records and
+            batch.characters + characters <= self.max_characters
+        )
+
+    def _combine(self, batch, pending):
+        """
+        Try to combine a change with the pending changes for the same rrset.
+
+        @return: C{False} if the change cannot be part of C{batch}, C{True}
+            otherwise.  In the latter case C{pending.change} is set to
+            L{None} if the change was merged into an existing one or
+            cancelled out.
+        """
+        new = pending.change
+        key = RRSetKey(new.rrset.label, new.rrset.type)
+        entries = batch.changes.get(key)
+        if not entries:
+            return True
+        last = entries[-1]
+        actions = (last.change.action, new.action)
+        if actions == ("CREATE", "DELETE") and last.change.rrset == new.rrset:
+            batch.remove(key, last)
+            for waiting in last.waiting + pending.waiting:
+                waiting.callback(None)
+            pending.change = None
+            return True
+        if actions in (("CREATE", "UPSERT"), ("UPSERT", "UPSERT")):
+            merged = attr.evolve(last.change, rrset=new.rrset)
+            old_records, old_characters = _cost(last.change)
+            new_records, new_characters = _cost(merged)
+            if not self._fits(batch, (new_records - old_records,
+                                      new_characters - old_characters)):
+                return False
+            batch.replace(last, merged)
+            last.waiting.extend(pending.waiting)
+            pending.change = None
+            return True
+        return actions == ("DELETE", "CREATE") and len(entries) == 1
+
+    def flush(self, zone_id=None):
+        """
+        Submit the pending changes without waiting for the end of the delay.
+
+        @param zone_id: The hosted zone to submit the changes of, or L{None}
+            for all of them.
+
+        @return: A L{Deferred} that fires when all the batches submitted so
+            far have been applied or rejected.
+        """
+        if zone_id is None:
+            # The zones with pending batches, or batches in progress.
+            zone_ids = set(self._batches) | set(self._locks)
+        else:
+            zone_ids = [zone_id]
+        return gatherResults(
+            [self._submit(zone_id) for zone_id in zone_ids],
+            consumeErrors=True,
+        ).addCallback(lambda ignored: None)
+
+    def _submit(self, zone_id):
+        """
+        Submit the pending batch of a zone once the batches submitted before
+        it are done.
+        """
+        batch = self._batches.pop(zone_id, None)
+        if batch is not None and batch.timer.active():
+            batch.timer.cancel()
+        pending = list(batch or ())
+        if not pending and zone_id not in self._locks:
+            # Nothing pending nor in progress.
+            return succeed(None)
+        lock = self._locks.setdefault(zone_id, DeferredLock())
+
+        def unlock(result):
+            # Only keep the locks of zones with batches in progress.
+            if not lock.locked and not lock.waiting:
+                if self._locks.get(zone_id) is lock:
+                    del self._locks[zone_id]
+            return result
+
+        if not pending:
+            # Still wait for the batches already submitted.
+            return lock.run(succeed, None).addBoth(unlock)
+
+        def submit():
+            return self.client.change_resource_record_sets(
+                zone_id, [p.change for p in pending],
+            )
+
+        def notify(result):
+            for p in pending:
+                for waiting in p.waiting:
+                    if isinstance(result, Failure):
+                        waiting.errback(result)
+                    else:
+                        waiting.callback(result)
+            if isinstance(result, Failure):
+                # The failure has been handed to the callers.
+                return None
+            return result
+
+        d = lock.run(submit)
+        d.addBoth(unlock)
+        d.addBoth(notify)
+        return d
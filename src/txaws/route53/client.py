@@ -7,19 +7,23 @@ Client wrapper for Amazon's Route53 (domain service).
 
 
 __all__ = [
-    "get_route53_client",
+    "get_route53_client", "RRSetStream",
 ]
 
 from io import BytesIO
 from hashlib import sha256
+from functools import lru_cache
 from operator import itemgetter
+from xml.etree.ElementTree import XMLPullParser
 
 import attr
 
+from dateutil.parser import parse as parse_timestamp
+
 from twisted.python.log import msg
 from twisted.web.http import OK, CREATED
 from twisted.web.client import FileBodyProducer
-from twisted.internet.defer import succeed
+from twisted.internet.defer import DeferredLock, inlineCallbacks, succeed
 from twisted.internet import task
 
 from txaws.exception import AWSError
@@ -29,7 +33,7 @@ from txaws.util import XML
 
 from ._util import maybe_bytes_to_unicode, to_xml, tags
 from .model import (
-    HostedZone, RRSetType, RRSetKey, RRSet, AliasRRSet, Name, SOA, NS, A, CNAME,
+    HostedZone, ChangeInfo, RRSetKey, RRSet, AliasRRSet, Name, SOA, NS, A, CNAME,
     AAAA, MX, NAPTR, PTR, SPF, SRV, TXT, UnknownRecordType,
 )
 
@@ -114,6 +118,13 @@ class _Route53Client(object):
     endpoint = attr.ib()
     cooperator = attr.ib()
 
+    _waiter = attr.ib(
+        default=attr.Factory(
+            lambda self: _change_waiter(self), takes_self=True,
+        ),
+        init=False, eq=False, repr=False,
+    )
+
     def _details(self, op):
         content_sha256 = sha256(op.body).hexdigest()
         body_producer = FileBodyProducer(
@@ -139,12 +150,12 @@ class _Route53Client(object):
         d = q.submit(self.agent)
         d.addErrback(route53_error_wrapper)
         d.addCallback(itemgetter(1))
-        d.addCallback(XML)
         return d
 
     def _op(self, op):
         details = self._details(op)
         d = self._submit(details=details, ok_status=op.ok_status)
+        d.addCallback(op.parse)
         d.addCallback(op.extract_result)
         return d
 
@@ -207,6 +218,10 @@ class _Route53Client(object):
         @type zone_id: L{unicode}
 
         @param changes: An iterable of L{txaws.route53.interface.IRRSetChange} providers.
+
+        @return: A L{Deferred} that fires with the L{ChangeInfo} of the
+            change batch once it has been accepted.  It is usually
+            I{PENDING} at that point, see L{wait_for_change}.
         """
         d = _route53_op(
             method="POST",
@@ -219,10 +234,46 @@ class _Route53Client(object):
                     ))
                 )
             ),
+            extract_result=self._handle_change_info_response,
         )
         d.addCallback(self._op)
         return d
 
+    def _handle_change_info_response(self, document):
+        return changeinfo_from_element(document.find("./ChangeInfo"))
+
+    def get_change(self, change_id):
+        """
+        http://docs.aws.amazon.com/Route53/latest/APIReference/API_GetChange.html
+
+        @type change_id: L{unicode}
+
+        @return: A L{Deferred} that fires with the current L{ChangeInfo} of
+            the change.
+        """
+        d = _route53_op(
+            method="GET",
+            path=["2013-04-01", "change", change_id],
+            extract_result=self._handle_change_info_response,
+        )
+        d.addCallback(self._op)
+        return d
+
+    def wait_for_change(self, change_id):
+        """
+        Wait for a change to be applied to all the Route53 DNS servers.
+
+        The outstanding waits of a client share a single
+        L{txaws.route53.waiter.Route53ChangeWaiter}, which polls
+        L{get_change} for all of them from one loop with adaptive backoff.
+
+        @type change_id: L{unicode}
+
+        @return: A L{Deferred} that fires with the I{INSYNC} L{ChangeInfo}
+            of the change.
+        """
+        return self._waiter.wait(change_id)
+
     def list_resource_record_sets(self, zone_id, maxitems=None, name=None, type=None):
         """
         http://docs.aws.amazon.com/Route53/latest/APIReference/API_ListResourceRecordSets.html
@@ -247,79 +298,52 @@ class _Route53Client(object):
             method="GET",
             path=["2013-04-01", "hostedzone", zone_id, "rrset"],
             query=args,
+            parse=_parse_rrsets_page,
             extract_result=self._handle_list_resource_record_sets_response
         )
         d.addCallback(self._op)
         return d
 
-    def _handle_list_resource_record_sets_response(self, document):
-        result = {}
-        rrsets = document.iterfind("./ResourceRecordSets/ResourceRecordSet")
-        for rrset in rrsets:
-            label = Name(maybe_bytes_to_unicode(rrset.find("Name").text).encode("ascii").decode("idna"))
-            type = maybe_bytes_to_unicode(rrset.find("Type").text)
-
-            for kind in RRSetType.iterconstants():
-                value = self._get_rrset(kind, label, type, rrset)
-                if value is not None:
-                    key = RRSetKey(label, type)
-                    result[key] = value
-                    break
-            else:
-                # We didn't find anything we recognize.
-                msg(
-                    format=(
-                        "list_resource_record_sets() dropping unsupported "
-                        "ResourceRecordSet type in result "
-                        "(children=%(children)s)"
-                    ),
-                    children=list(rrset),
-                )
-        return result
+    def iter_resource_record_sets(self, zone_id, maxitems=None, name=None, type=None):
+        """
+        Iterate over all the rrsets of a zone, following the continuation
+        markers of truncated I{ListResourceRecordSets} responses.
 
-    def _get_rrset(self, kind, label, type, rrset):
-        return getattr(self, "_get_rrset_" + kind.name)(label, type, rrset)
+        @see: L{list_resource_record_sets}
 
+        @param maxitems: The number of rrsets to request per page.
 
-    def _get_rrset_RESOURCE(self, label, type, rrset):
-        # http://docs.aws.amazon.com/Route53/latest/APIReference/API_ResourceRecord.html
-        resourcerecords = rrset.find("./ResourceRecords")
-        if resourcerecords is None:
-            return None
-        records = resourcerecords.iterfind("./ResourceRecord")
-        # The docs say TTL is optional but I think that means rrsets that
-        # contain something other than ResourceRecord may not have it.
-        # Hopefully it's always present for ResourceRecord-tyle
-        # ResourceRecordSets?
-        ttl = int(rrset.find("TTL").text)
-        return RRSet(
-            label=label,
-            type=type,
-            ttl=ttl,
-            records={
-                RECORD_TYPES.get(
-                    type, UnknownRecordType,
-                ).basic_from_element(element)
-                for element
-                in records
-            },
+        @return: An L{RRSetStream} yielding the rrsets of the zone a page at
+            a time.
+        """
+        def get_page(name, type, identifier):
+            args = []
+            if maxitems:
+                args.append(("maxitems", "{}".format(maxitems)))
+            if name:
+                args.append(("name", name))
+            if type:
+                args.append(("type", type))
+            if identifier:
+                args.append(("identifier", identifier))
+            d = _route53_op(
+                method="GET",
+                path=["2013-04-01", "hostedzone", zone_id, "rrset"],
+                query=args,
+                parse=_parse_rrsets_page,
+                extract_result=lambda page: page,
+            )
+            d.addCallback(self._op)
+            return d
+
+        return RRSetStream(
+            get_page,
+            (str(name) if name else None, type, None),
         )
 
-
-    def _get_rrset_ALIAS(self, label, type, rrset):
-        # http://docs.aws.amazon.com/Route53/latest/APIReference/API_AliasTarget.html
-        aliastarget = rrset.find("./AliasTarget")
-        if aliastarget is None:
-            return None
-        return AliasRRSet(
-            label=label,
-            type=type,
-            dns_name=Name(maybe_bytes_to_unicode(aliastarget.find("DNSName").text)),
-            evaluate_target_health={
-                "true": True, "false": False,
-            }.get(aliastarget.find("EvaluateTargetHealth").text),
-            hosted_zone_id=maybe_bytes_to_unicode(aliastarget.find("HostedZoneId").text),
-        )
+    def _handle_list_resource_record_sets_response(self, page):
+        rrsets, marker = page
+        return dict(rrsets)
 
 
     def delete_hosted_zone(self, zone_id):
@@ -337,6 +361,95 @@ class _Route53Client(object):
         d.addCallback(self._op)
         return d
 
+    def export_zone(self, zone_id, output):
+        """
+        Write all the rrsets of a zone to a file in BIND zone file format.
+
+        @see: L{txaws.route53.zonefile.export_zone}
+        """
+        from txaws.route53.zonefile import export_zone
+        return export_zone(self, zone_id, output)
+
+    def import_zone(self, zone_id, zone_file, **kw):
+        """
+        Create the rrsets read from a BIND zone file in a zone.
+
+        @see: L{txaws.route53.zonefile.import_zone}
+        """
+        from txaws.route53.zonefile import import_zone
+        kw.setdefault("cooperator", self.cooperator)
+        return import_zone(self, zone_id, zone_file, **kw)
+
+class RRSetStream(object):
+    """
+    Iterate over the rrsets of a hosted zone a page at a time.
+
+    As soon as a page is handed out the following one is requested, so it's
+    usually available by the time it's asked for, while no more than one
+    page is ever buffered ahead of the consumer.
+
+    @ivar _get_page: A callable accepting the name, type and identifier to
+        start listing from and returning a L{Deferred} firing with a
+        two-tuple of a L{list} of C{(RRSetKey, rrset)} pairs and the
+        arguments to get the following page with, or L{None} if it's the
+        last one.
+    """
+    def __init__(self, get_page, start):
+        self._get_page = get_page
+        self._marker = start
+        self._next = None
+        self._lock = DeferredLock()
+
+    def next_page(self):
+        """
+        Get the next page of rrsets.
+
+        @return: A L{Deferred} that fires with a L{list} of C{(RRSetKey,
+            rrset)} pairs, which is empty once all the rrsets of the zone
+            have been returned.
+        """
+        return self._lock.run(self._next_page)
+
+    def _next_page(self):
+        if self._next is None:
+            if self._marker is None:
+                return succeed([])
+            self._next = self._fetch(self._marker)
+        d, self._next = self._next, None
+        d.addCallback(self._prefetch)
+        return d
+
+    @inlineCallbacks
+    def _fetch(self, marker):
+        while True:
+            rrsets, self._marker = yield self._get_page(*marker)
+            if rrsets or self._marker is None:
+                return rrsets
+            # All the rrsets of this page were dropped, keep going.
+            marker = self._marker
+
+    def _prefetch(self, rrsets):
+        if self._marker is not None:
+            self._next = self._fetch(self._marker)
+        return rrsets
+
+    @inlineCallbacks
+    def consume(self, visitor):
+        """
+        Call C{visitor} with the L{RRSetKey} and the rrset of each of the
+        remaining rrsets, in order.
+
+        @return: A L{Deferred} that fires with L{None} once all the rrsets
+            have been visited.
+        """
+        while True:
+            rrsets = yield self.next_page()
+            if not rrsets:
+                return
+            for key, rrset in rrsets:
+                visitor(key, rrset)
+
+
 def _route53_op(body=None, **kw):
     """
     Construct an L{_Operation} representing a I{Route53} service API call.
@@ -372,6 +485,9 @@ class _Operation(object):
         successes for this operation.
     @type ok_status: L{tuple} of L{int}
 
+    @ivar parse: A one-argument callable which is passed the response body
+        and parses it into the document passed to C{extract_result}.
+
     @ivar extract_result: A one-argument callable which is passed the parsed
         response document and can extract results and restructure them to be
         returned to application code.
@@ -382,9 +498,173 @@ class _Operation(object):
     query = attr.ib(default=attr.Factory(list))
     body = attr.ib(default=b"")
     ok_status = attr.ib(default=(OK,))
+    parse = attr.ib(default=XML)
     extract_result = attr.ib(default=lambda document: None)
 
 
+@lru_cache(maxsize=4096)
+def _label_from_ace(label):
+    """
+    Decode one label of a domain name from its ASCII-compatible encoding.
+    """
+    if not label.startswith("xn--"):
+        return label
+    return label.encode("ascii").decode("idna")
+
+
+@lru_cache(maxsize=4096)
+def _name_from_ace(text):
+    """
+    Construct a L{Name} from the ASCII-compatible encoding of a domain name
+    found in a response.
+
+    Names and labels usually repeat across the rrsets of a zone (one rrset
+    per type at the same name, the zone's own labels, ...) so both are
+    memoized, and the IDNA codec is only used for labels which need it.
+    """
+    if not text.isascii():
+        raise UnicodeError("Non-ASCII name in response", text)
+    if "xn--" not in text:
+        return Name(text)
+    return Name(".".join(_label_from_ace(label) for label in text.split(".")))
+
+
+def _local_name(tag):
+    """
+    Strip the namespace from an ElementTree tag.
+    """
+    return tag.rpartition("}")[2]
+
+
+_PAGE_FIELDS = {
+    "IsTruncated", "NextRecordName", "NextRecordType", "NextRecordIdentifier",
+}
+
+
+def _parse_rrsets_page(body, chunk_size=2 ** 16):
+    """
+    Parse a I{ListResourceRecordSets} response.
+
+    The body is already fully buffered and the rrsets are all collected
+    into a L{list}.  What's saved is the XML tree: the body is fed to the
+    parser in chunks and each I{ResourceRecordSet} element is detached from
+    the tree once it's been read, so the elements of no more than a chunk's
+    worth of rrsets exist at once.
+
+    @param body: The response body.
+    @type body: L{bytes}
+
+    @param chunk_size: The number of bytes to feed the parser with between
+        collecting the rrsets it completed.
+    @type chunk_size: L{int}
+
+    @return: A two-tuple of a L{list} of C{(RRSetKey, rrset)} pairs in
+        response order and the name, type and identifier to list the
+        following page from, or L{None} if the response isn't truncated.
+    """
+    rrsets = []
+    fields = {}
+    parser = XMLPullParser(events=("start", "end"))
+    # The ResourceRecordSets element, which the rrsets are detached from.
+    parents = []
+
+    def collect():
+        for event, element in parser.read_events():
+            tag = _local_name(element.tag)
+            if event == "start":
+                if tag == "ResourceRecordSets":
+                    parents.append(element)
+            elif tag == "ResourceRecordSet":
+                for child in element.iter():
+                    child.tag = _local_name(child.tag)
+                rrset = rrset_from_element(element)
+                if rrset is not None:
+                    rrsets.append(rrset)
+                if parents:
+                    parents[-1].remove(element)
+            elif tag in _PAGE_FIELDS:
+                fields[tag] = element.text
+
+    for offset in range(0, len(body), chunk_size):
+        parser.feed(body[offset:offset + chunk_size])
+        collect()
+    parser.close()
+    collect()
+
+    if fields.get("IsTruncated") != "true":
+        return rrsets, None
+    return rrsets, (
+        fields.get("NextRecordName"),
+        fields.get("NextRecordType"),
+        fields.get("NextRecordIdentifier"),
+    )
+
+
+def rrset_from_element(rrset):
+    """
+    Construct an L{RRSet} or L{AliasRRSet} from a I{ResourceRecordSet} XML
+    element.
+
+    @return: A two-tuple of the L{RRSetKey} and the rrset, or L{None} if the
+        element describes neither kind of rrset.
+    """
+    label = type = ttl = records = aliastarget = None
+    for child in rrset:
+        tag = child.tag
+        if tag == "Name":
+            label = _name_from_ace(maybe_bytes_to_unicode(child.text))
+        elif tag == "Type":
+            type = maybe_bytes_to_unicode(child.text)
+        elif tag == "TTL":
+            ttl = child.text
+        elif tag == "ResourceRecords":
+            records = child
+        elif tag == "AliasTarget":
+            aliastarget = child
+
+    if records is not None:
+        # http://docs.aws.amazon.com/Route53/latest/APIReference/API_ResourceRecord.html
+        loader = RECORD_TYPES.get(type, UnknownRecordType)
+        # The docs say TTL is optional but I think that means rrsets that
+        # contain something other than ResourceRecord may not have it.
+        # Hopefully it's always present for ResourceRecord-tyle
+        # ResourceRecordSets?
+        value = RRSet(
+            label=label,
+            type=type,
+            ttl=int(ttl),
+            records={
+                loader.basic_from_element(element)
+                for element
+                in records
+                if element.tag == "ResourceRecord"
+            },
+        )
+    elif aliastarget is not None:
+        # http://docs.aws.amazon.com/Route53/latest/APIReference/API_AliasTarget.html
+        value = AliasRRSet(
+            label=label,
+            type=type,
+            dns_name=Name(maybe_bytes_to_unicode(aliastarget.find("DNSName").text)),
+            evaluate_target_health={
+                "true": True, "false": False,
+            }.get(aliastarget.find("EvaluateTargetHealth").text),
+            hosted_zone_id=maybe_bytes_to_unicode(aliastarget.find("HostedZoneId").text),
+        )
+    else:
+        # We didn't find anything we recognize.
+        msg(
+            format=(
+                "list_resource_record_sets() dropping unsupported "
+                "ResourceRecordSet type in result "
+                "(children=%(children)s)"
+            ),
+            children=list(rrset),
+        )
+        return None
+    return RRSetKey(label, type), value
+
+
 def hostedzone_from_element(zone):
     """
     Construct a L{HostedZone} instance from a I{HostedZone} XML element.
@@ -397,6 +677,25 @@ def hostedzone_from_element(zone):
     )
 
 
+def changeinfo_from_element(info):
+    """
+    Construct a L{ChangeInfo} instance from a I{ChangeInfo} XML element.
+    """
+    return ChangeInfo(
+        identifier=maybe_bytes_to_unicode(info.find("Id").text).replace("/change/", ""),
+        status=maybe_bytes_to_unicode(info.find("Status").text),
+        submitted_at=parse_timestamp(info.find("SubmittedAt").text),
+    )
+
+
+def _change_waiter(client):
+    """
+    Create the L{Route53ChangeWaiter} shared by the waits of a client.
+    """
+    from txaws.route53.waiter import Route53ChangeWaiter
+    return Route53ChangeWaiter(client)
+
+
 def to_element(change):
     """
     @param change: An L{txaws.route53.interface.IRRSetChange} provider.
@@ -0,0 +1,169 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+A local copy of the rrsets of a Route53 hosted zone, kept up to date with
+incremental changes.
+"""
+
+__all__ = [
+    "Route53ZoneMirror",
+]
+
+import attr
+
+from twisted.internet.defer import DeferredLock, gatherResults, succeed
+from twisted.python.reflect import namedAny
+
+from .batch import Route53ChangeBatcher
+from .model import RRSet, RRSetKey, create_rrset, delete_rrset, upsert_rrset
+
+
+@attr.s
+class Route53ZoneMirror(object):
+    """
+    Mirror the rrsets of a hosted zone locally, so that reconciling it with a
+    desired state only costs requests for the rrsets which differ.
+
+    The whole zone is only listed the first time it's needed, once the
+    mirror is older than C{max_age}, and after a change was rejected because
+    the mirror didn't match the zone anymore.
+
+    The SOA rrset, the NS rrset at the apex of the zone and alias rrsets are
+    never changed by L{sync}.
+
+    @ivar client: The Route53 client to list and change the zone with.
+
+    @ivar zone_id: The identifier of the hosted zone to mirror.
+    @type zone_id: L{unicode}
+
+    @ivar max_age: The number of seconds after which the mirror is refreshed
+        with a full listing of the zone.
+    @type max_age: L{float}
+
+    @ivar reactor: The L{IReactorTime} provider used to age the mirror and
+        to schedule change batches.
+    """
+    client = attr.ib()
+    zone_id = attr.ib()
+    max_age = attr.ib(default=300)
+    reactor = attr.ib(
+        default=attr.Factory(lambda: namedAny("twisted.internet.reactor")),
+    )
+
+    _rrsets = attr.ib(default=None, init=False)
+    _fetched = attr.ib(default=None, init=False)
+    _lock = attr.ib(default=attr.Factory(DeferredLock), init=False)
+
+    def get_rrsets(self):
+        """
+        Get the mirrored rrsets, listing the zone first if needed.
+
+        @return: A L{Deferred} that fires with a L{dict} mapping L{RRSetKey}
+            to L{RRSet} or L{AliasRRSet}.
+        """
+        d = self._lock.run(self._current)
+        d.addCallback(dict)
+        return d
+
+    def refresh(self):
+        """
+        Replace the mirror with a full listing of the zone.
+
+        @return: A L{Deferred} that fires with a L{dict} mapping L{RRSetKey}
+            to L{RRSet} or L{AliasRRSet}.
+        """
+        d = self._lock.run(self._refresh)
+        d.addCallback(dict)
+        return d
+
+    def sync(self, desired):
+        """
+        Change the zone so its rrsets are those given.
+
+        Only the difference between C{desired} and the mirror is submitted,
+        and the mirror is updated as soon as the changes are submitted.
+
+        @param desired: The rrsets the zone should have.
+        @type desired: An iterable of L{RRSet}
+
+        @return: A L{Deferred} that fires with the L{list} of
+            L{txaws.route53.interface.IRRSetChange} providers which were
+            applied, or with the L{Failure} of the first rejected change
+            batch, in which case the mirror is listed again on next use.
+        """
+        desired = {
+            RRSetKey(rrset.label, rrset.type): rrset for rrset in desired
+        }
+        return self._lock.run(
+            lambda: self._current().addCallback(self._apply, desired)
+        )
+
+    def _current(self):
+        if (self._rrsets is None or
+                self.reactor.seconds() - self._fetched >= self.max_age):
+            return self._refresh()
+        return succeed(self._rrsets)
+
+    def _refresh(self):
+        rrsets = {}
+        d = self.client.iter_resource_record_sets(self.zone_id).consume(
+            rrsets.__setitem__,
+        )
+
+        def listed(ignored):
+            self._rrsets = rrsets
+            self._fetched = self.reactor.seconds()
+            return rrsets
+        d.addCallback(listed)
+        return d
+
+    def _apply(self, current, desired):
+        changes = list(self._diff(current, desired))
+        if not changes:
+            return succeed(changes)
+
+        batcher = Route53ChangeBatcher(self.client, reactor=self.reactor)
+        results = [batcher.change(self.zone_id, change) for change in changes]
+        for change in changes:
+            key = RRSetKey(change.rrset.label, change.rrset.type)
+            if change.action == "DELETE":
+                del current[key]
+            else:
+                current[key] = change.rrset
+        batcher.flush()
+
+        def rejected(reason):
+            # The zone doesn't look like we thought it does.
+            self._rrsets = None
+            return reason.value.subFailure
+
+        d = gatherResults(results, consumeErrors=True)
+        d.addCallbacks(lambda ignored: changes, rejected)
+        return d
+
+    def _diff(self, current, desired):
+        """
+        Generate the changes turning the C{current} rrsets into the
+        C{desired} ones.
+        """
+        apex = None
+        for key in current:
+            if key.type == "SOA":
+                apex = key.label
+
+        def managed(key, rrset):
+            if not isinstance(rrset, RRSet):
+                return False
+            if key.type == "SOA":
+                return False
+            return not (key.type == "NS" and key.label == apex)
+
+        for key, rrset in desired.items():
+            existing = current.get(key)
+            if existing is None:
+                yield create_rrset(rrset)
+            elif existing != rrset and managed(key, existing):
+                yield upsert_rrset(rrset)
+        for key, rrset in current.items():
+            if key not in desired and managed(key, rrset):
+                yield delete_rrset(rrset)
@@ -6,9 +6,10 @@ Simple model objects related to Route53 interactions.
 
 __all__ = [
     "Name", "SOA", "NS", "A", "CNAME",
-    "HostedZone",
+    "HostedZone", "ChangeInfo",
 ]
 
+from datetime import datetime
 from ipaddress import IPv4Address, IPv6Address
 
 from zope.interface import implementer, provider
@@ -447,3 +448,25 @@ class HostedZone(object):
     identifier = attr.ib(validator=validators.instance_of(str))
     rrset_count = attr.ib(validator=validators.instance_of(int))
     reference = attr.ib(validator=validators.instance_of(str))
+
+
+
+@attr.s(frozen=True)
+class ChangeInfo(object):
+    """
+    http://docs.aws.amazon.com/Route53/latest/APIReference/API_ChangeInfo.html
+
+    @ivar identifier: The identifier of the change, without the I{/change/}
+        prefix.
+    @type identifier: L{unicode}
+
+    @ivar status: I{PENDING} until the change has been applied to all the
+        Route53 DNS servers, then I{INSYNC}.
+    @type status: L{unicode}
+
+    @ivar submitted_at: When the change was submitted.
+    @type submitted_at: L{datetime}
+    """
+    identifier = attr.ib(validator=validators.instance_of(str))
+    status = attr.ib(validator=validators.instance_of(str))
+    submitted_at = attr.ib(validator=validators.instance_of(datetime))
@@ -0,0 +1,225 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for ``txaws.route53.batch``.
+"""
+
+from ipaddress import IPv4Address
+
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+from twisted.python.failure import Failure
+from twisted.trial.unittest import TestCase
+
+from txaws.route53.batch import Route53ChangeBatcher
+from txaws.route53.model import (
+    A, Name, RRSet, create_rrset, delete_rrset, upsert_rrset,
+)
+
+
+class RecordingClient(object):
+    """
+    A Route53 client double recording the change batches submitted to it.
+    """
+    def __init__(self):
+        self.submitted = []
+
+    def change_resource_record_sets(self, zone_id, changes):
+        d = Deferred()
+        self.submitted.append((zone_id, changes, d))
+        return d
+
+
+def rrset(label, *addresses):
+    return RRSet(
+        label=Name(label),
+        type="A",
+        ttl=60,
+        records={A(IPv4Address(address)) for address in addresses},
+    )
+
+
+class Route53ChangeBatcherTestCase(TestCase):
+    """
+    Tests for L{Route53ChangeBatcher}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.client = RecordingClient()
+        self.batcher = Route53ChangeBatcher(
+            self.client, delay=1.0, reactor=self.clock,
+        )
+
+    def test_delay(self):
+        """
+        Changes for a zone are submitted together once the delay has
+        elapsed, and their L{Deferred}s fire with the result of the
+        submission.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        b = rrset("b.example.invalid.", "10.0.0.2")
+        d1 = self.batcher.create_rrset("zone", a)
+        d2 = self.batcher.upsert_rrset("zone", b)
+        self.clock.advance(0.5)
+        self.assertEqual([], self.client.submitted)
+        self.clock.advance(0.5)
+        [(zone_id, changes, d)] = self.client.submitted
+        self.assertEqual("zone", zone_id)
+        self.assertEqual([create_rrset(a), upsert_rrset(b)], changes)
+        self.assertNoResult(d1)
+        info = object()
+        d.callback(info)
+        self.assertIs(info, self.successResultOf(d1))
+        self.assertIs(info, self.successResultOf(d2))
+
+    def test_zones(self):
+        """
+        Changes for different zones are submitted in different batches.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        self.batcher.create_rrset("zone1", a)
+        self.batcher.create_rrset("zone2", a)
+        self.clock.advance(1)
+        self.assertEqual(
+            {"zone1", "zone2"},
+            {zone_id for (zone_id, _, _) in self.client.submitted},
+        )
+
+    def test_create_delete_cancel(self):
+        """
+        Creating and then deleting the same rrset cancels both changes.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        d1 = self.batcher.create_rrset("zone", a)
+        d2 = self.batcher.delete_rrset("zone", a)
+        self.assertIs(None, self.successResultOf(d1))
+        self.assertIs(None, self.successResultOf(d2))
+        self.successResultOf(self.batcher.flush())
+        self.assertEqual([], self.client.submitted)
+
+    def test_upsert_merge(self):
+        """
+        An I{UPSERT} following a I{CREATE} or an I{UPSERT} of the same rrset
+        is merged into it.
+        """
+        a1 = rrset("a.example.invalid.", "10.0.0.1")
+        a2 = rrset("a.example.invalid.", "10.0.0.2")
+        a3 = rrset("a.example.invalid.", "10.0.0.3")
+        d1 = self.batcher.create_rrset("zone", a1)
+        d2 = self.batcher.upsert_rrset("zone", a2)
+        d3 = self.batcher.upsert_rrset("other", a1)
+        d4 = self.batcher.upsert_rrset("other", a3)
+        self.batcher.flush()
+        changes = {
+            zone_id: changes for (zone_id, changes, _) in self.client.submitted
+        }
+        self.assertEqual(
+            {"zone": [create_rrset(a2)], "other": [upsert_rrset(a3)]},
+            changes,
+        )
+        for (_, _, d) in self.client.submitted:
+            d.callback(None)
+        for d in (d1, d2, d3, d4):
+            self.assertIs(None, self.successResultOf(d))
+
+    def test_delete_create(self):
+        """
+        A I{DELETE} followed by a I{CREATE} of the same rrset are kept in the
+        same batch, in order.
+        """
+        a1 = rrset("a.example.invalid.", "10.0.0.1")
+        a2 = rrset("a.example.invalid.", "10.0.0.2")
+        self.batcher.delete_rrset("zone", a1)
+        self.batcher.create_rrset("zone", a2)
+        self.batcher.flush()
+        [(_, changes, _)] = self.client.submitted
+        self.assertEqual([delete_rrset(a1), create_rrset(a2)], changes)
+
+    def test_conflict(self):
+        """
+        A change which can't be combined with the pending one for the same
+        rrset closes the current batch, and the next one is only submitted
+        after it's done.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        self.batcher.upsert_rrset("zone", a)
+        self.batcher.delete_rrset("zone", a)
+        [(_, changes, d)] = self.client.submitted
+        self.assertEqual([upsert_rrset(a)], changes)
+        flushed = self.batcher.flush()
+        self.assertEqual(1, len(self.client.submitted))
+        d.callback(None)
+        self.assertEqual(2, len(self.client.submitted))
+        self.assertEqual([delete_rrset(a)], self.client.submitted[1][1])
+        self.assertNoResult(flushed)
+        self.client.submitted[1][2].callback(None)
+        self.successResultOf(flushed)
+
+    def test_max_records(self):
+        """
+        A change which would take the batch over C{max_records} is put in a
+        new batch, counting I{UPSERT}s twice.
+        """
+        self.batcher.max_records = 4
+        a = rrset("a.example.invalid.", "10.0.0.1", "10.0.0.2")
+        b = rrset("b.example.invalid.", "10.0.0.3")
+        c = rrset("c.example.invalid.", "10.0.0.4")
+        self.batcher.upsert_rrset("zone", a)
+        self.assertEqual([], self.client.submitted)
+        self.batcher.create_rrset("zone", b)
+        [(_, changes, d)] = self.client.submitted
+        self.assertEqual([upsert_rrset(a)], changes)
+        self.batcher.create_rrset("zone", c)
+        d.callback(None)
+        self.batcher.flush()
+        self.assertEqual(
+            [create_rrset(b), create_rrset(c)], self.client.submitted[1][1])
+
+    def test_max_characters(self):
+        """
+        A change which would take the batch over C{max_characters} is put in
+        a new batch.
+        """
+        self.batcher.max_characters = len("10.0.0.1") * 2
+        for n in range(3):
+            self.batcher.create_rrset(
+                "zone", rrset("{}.example.invalid.".format(n), "10.0.0.1"))
+        self.assertEqual(1, len(self.client.submitted))
+        self.assertEqual(2, len(self.client.submitted[0][1]))
+
+    def test_failure(self):
+        """
+        If a batch is rejected, the L{Deferred}s of all of its changes fail.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        b = rrset("b.example.invalid.", "10.0.0.2")
+        d1 = self.batcher.create_rrset("zone", a)
+        d2 = self.batcher.create_rrset("zone", b)
+        self.batcher.flush()
+        [(_, _, d)] = self.client.submitted
+        d.errback(Failure(ValueError("rejected")))
+        self.failureResultOf(d1, ValueError)
+        self.failureResultOf(d2, ValueError)
+
+    def test_locks_dropped(self):
+        """
+        Zones are only tracked while they have batches in progress, and
+        L{Route53ChangeBatcher.flush} waits for the batches in progress.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        self.batcher.create_rrset("zone1", a)
+        self.batcher.create_rrset("zone2", a)
+        self.batcher.flush("zone1")
+        self.batcher.flush("zone2")
+        self.assertEqual({"zone1", "zone2"}, set(self.batcher._locks))
+        [(_, _, d1), (_, _, d2)] = self.client.submitted
+        d1.callback(None)
+        self.assertEqual({"zone2"}, set(self.batcher._locks))
+        flushed = self.batcher.flush()
+        self.assertNoResult(flushed)
+        d2.callback(None)
+        self.assertIs(None, self.successResultOf(flushed))
+        self.assertEqual({}, self.batcher._locks)
+        self.successResultOf(self.batcher.flush("zone3"))
+        self.assertEqual({}, self.batcher._locks)
+        self.assertEqual(2, len(self.client.submitted))
@@ -0,0 +1,128 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for ``txaws.route53.mirror``.
+"""
+
+from ipaddress import IPv4Address
+
+from twisted.internet.task import Clock
+from twisted.trial.unittest import TestCase
+
+from txaws.testing.service import FakeAWSServiceRegion
+from txaws.route53.client import Route53Error
+from txaws.route53.mirror import Route53ZoneMirror
+from txaws.route53.model import (
+    A, Name, RRSet, RRSetKey, create_rrset, delete_rrset, upsert_rrset,
+)
+
+
+def rrset(label, address):
+    return RRSet(
+        label=Name(label),
+        type="A",
+        ttl=60,
+        records={A(IPv4Address(address))},
+    )
+
+
+class CountingClient(object):
+    """
+    Wrap a Route53 client, counting the rrset listings done through it.
+    """
+    def __init__(self, client):
+        self._client = client
+        self.listings = 0
+
+    def iter_resource_record_sets(self, zone_id):
+        self.listings += 1
+        return self._client.iter_resource_record_sets(zone_id)
+
+    def change_resource_record_sets(self, zone_id, changes):
+        return self._client.change_resource_record_sets(zone_id, changes)
+
+
+class Route53ZoneMirrorTestCase(TestCase):
+    """
+    Tests for L{Route53ZoneMirror}.
+    """
+    def setUp(self):
+        aws = FakeAWSServiceRegion(access_key="abc", secret_key="def")
+        self.route53 = aws.get_route53_client()
+        zone = self.successResultOf(
+            self.route53.create_hosted_zone("ref", "example.invalid."))
+        self.zone_id = zone.identifier
+        self.client = CountingClient(self.route53)
+        self.clock = Clock()
+        self.mirror = Route53ZoneMirror(
+            self.client, self.zone_id, max_age=60, reactor=self.clock,
+        )
+
+    def zone(self):
+        return self.successResultOf(
+            self.route53.list_resource_record_sets(self.zone_id))
+
+    def test_sync(self):
+        """
+        L{Route53ZoneMirror.sync} creates, replaces and deletes rrsets to
+        make the zone match the desired state, leaving the SOA and apex NS
+        rrsets alone.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        b = rrset("b.example.invalid.", "10.0.0.2")
+        self.successResultOf(self.mirror.sync([a, b]))
+        b2 = rrset("b.example.invalid.", "10.0.0.3")
+        c = rrset("c.example.invalid.", "10.0.0.4")
+        changes = self.successResultOf(self.mirror.sync([b2, c]))
+        self.assertEqual(
+            [upsert_rrset(b2), create_rrset(c), delete_rrset(a)],
+            changes,
+        )
+        zone = self.zone()
+        self.assertEqual(
+            {"SOA", "NS", "A"}, {key.type for key in zone},
+        )
+        self.assertEqual(
+            {RRSetKey(b2.label, "A"): b2, RRSetKey(c.label, "A"): c},
+            {key: value for key, value in zone.items() if key.type == "A"},
+        )
+        self.assertEqual(zone, self.successResultOf(self.mirror.get_rrsets()))
+
+    def test_sync_incremental(self):
+        """
+        Once the zone has been listed, L{Route53ZoneMirror.sync} submits only
+        the changes without listing it again, and submits nothing if the
+        zone already matches.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        self.successResultOf(self.mirror.sync([a]))
+        self.assertEqual([], self.successResultOf(self.mirror.sync([a])))
+        self.assertEqual(1, self.client.listings)
+
+    def test_max_age(self):
+        """
+        The zone is listed again once the mirror is older than C{max_age}.
+        """
+        self.successResultOf(self.mirror.get_rrsets())
+        self.clock.advance(59)
+        self.successResultOf(self.mirror.get_rrsets())
+        self.assertEqual(1, self.client.listings)
+        self.clock.advance(1)
+        self.successResultOf(self.mirror.get_rrsets())
+        self.assertEqual(2, self.client.listings)
+
+    def test_conflict(self):
+        """
+        If the zone was changed behind the mirror's back and a change is
+        rejected, the failure is returned and the zone is listed again on
+        the following sync.
+        """
+        a = rrset("a.example.invalid.", "10.0.0.1")
+        self.successResultOf(self.mirror.sync([a]))
+        a2 = rrset("a.example.invalid.", "10.0.0.2")
+        self.successResultOf(self.route53.change_resource_record_sets(
+            self.zone_id, [upsert_rrset(a2)]))
+        self.failureResultOf(self.mirror.sync([]), Route53Error)
+        self.successResultOf(self.mirror.sync([]))
+        self.assertEqual(2, self.client.listings)
+        self.assertNotIn(RRSetKey(a.label, "A"), self.zone())
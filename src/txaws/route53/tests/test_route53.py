@@ -4,8 +4,11 @@
 Tests for ``txaws.route53``.
 """
 
+from datetime import datetime
 from ipaddress import IPv4Address, IPv6Address
 
+from dateutil.tz import tzutc
+
 from twisted.internet.task import Cooperator
 from twisted.trial.unittest import TestCase
 from twisted.web.http import OK, BAD_REQUEST
@@ -17,7 +20,7 @@ from txaws.testing.integration import get_live_service
 from txaws.testing.route53_tests import route53_integration_tests
 
 from txaws.route53.model import (
-    HostedZone, RRSetKey, RRSet, AliasRRSet,
+    HostedZone, RRSetKey, RRSet, AliasRRSet, ChangeInfo,
     create_rrset, delete_rrset, upsert_rrset,
 )
 from txaws.route53.client import (
@@ -137,9 +140,9 @@ class sample_change_resource_record_sets_result(object):
 <ChangeResourceRecordSetsResponse>
    <ChangeInfo>
       <Comment>string</Comment>
-      <Id>string</Id>
-      <Status>string</Status>
-      <SubmittedAt>timestamp</SubmittedAt>
+      <Id>/change/C2682N5HXP0BZ4</Id>
+      <Status>PENDING</Status>
+      <SubmittedAt>2017-03-08T17:53:02.587Z</SubmittedAt>
    </ChangeInfo>
 </ChangeResourceRecordSetsResponse>
 """
@@ -283,7 +286,8 @@ class ListResourceRecordSetsTestCase(TestCase):
         self.assertEqual(rrsets, expected)
 
 
-    def _simple_record_test(self, record_type, record):
+    def _simple_record_test(self, record_type, record,
+                            label=Name("foo"), wire_label=None):
         zone_id = b"ABCDEF1234"
         template = """\
 <?xml version="1.0"?>
@@ -302,10 +306,11 @@ class ListResourceRecordSetsTestCase(TestCase):
   <MaxItems>100</MaxItems>
 </ListResourceRecordSetsResponse>
 """
-        label = Name("foo")
+        if wire_label is None:
+            wire_label = str(label)
         client = self._client_for_rrsets(
             zone_id, template.format(
-                label=label,
+                label=wire_label,
                 type=record_type,
                 ttl=60, record=record.to_text(),
             ).encode("utf-8")
@@ -329,6 +334,18 @@ class ListResourceRecordSetsTestCase(TestCase):
         )
 
 
+    def test_idna_label(self):
+        """
+        Labels in their ASCII-compatible encoding are decoded.
+        """
+        self._simple_record_test(
+            "A",
+            A(IPv4Address("192.0.2.1")),
+            label=Name("b\N{LATIN SMALL LETTER U WITH DIAERESIS}cher.example."),
+            wire_label="xn--bcher-kva.example.",
+        )
+
+
     def test_aaaa(self):
         self._simple_record_test(
             "AAAA",
@@ -520,6 +537,122 @@ class ListResourceRecordSetsTestCase(TestCase):
 
 
 
+class sample_paged_resource_record_sets_result(object):
+    first = RRSet(
+        label=Name("a.example.invalid."),
+        type="A",
+        ttl=60,
+        records={A(IPv4Address("10.0.0.1"))},
+    )
+    second = RRSet(
+        label=Name("b.example.invalid."),
+        type="A",
+        ttl=60,
+        records={A(IPv4Address("10.0.0.2"))},
+    )
+
+    page_template = """\
+<?xml version="1.0"?>
+<ListResourceRecordSetsResponse xmlns="https://route53.amazonaws.com/doc/2013-04-01/"><ResourceRecordSets><ResourceRecordSet><Name>{rrset.label}</Name><Type>{rrset.type}</Type><TTL>{rrset.ttl}</TTL><ResourceRecords><ResourceRecord><Value>{address}</Value></ResourceRecord></ResourceRecords></ResourceRecordSet></ResourceRecordSets>{marker}<MaxItems>1</MaxItems></ListResourceRecordSetsResponse>
+"""
+    first_xml = page_template.format(
+        rrset=first,
+        address="10.0.0.1",
+        marker=(
+            "<IsTruncated>true</IsTruncated>"
+            "<NextRecordName>{}</NextRecordName>"
+            "<NextRecordType>A</NextRecordType>"
+        ).format(second.label),
+    ).encode("utf-8")
+    second_xml = page_template.format(
+        rrset=second,
+        address="10.0.0.2",
+        marker="<IsTruncated>false</IsTruncated>",
+    ).encode("utf-8")
+
+
+class PagedRRSets(Resource):
+    isLeaf = True
+
+    def __init__(self, pages):
+        Resource.__init__(self)
+        self.pages = pages
+        self.requested = []
+
+    def render_GET(self, request):
+        start = (
+            request.args.get(b"name", [None])[0],
+            request.args.get(b"type", [None])[0],
+        )
+        self.requested.append(start)
+        return self.pages[start]
+
+
+class IterResourceRecordSetsTestCase(TestCase):
+    """
+    Tests for C{iter_resource_record_sets}.
+    """
+    def setUp(self):
+        sample = sample_paged_resource_record_sets_result
+        self.rrsets = PagedRRSets({
+            (None, None): sample.first_xml,
+            (str(sample.second.label).encode("ascii"), b"A"): sample.second_xml,
+        })
+        agent = RequestTraversalAgent(static_resource({
+            b"2013-04-01": {
+                b"hostedzone": {
+                    b"ABCDEF1234": {
+                        b"rrset": self.rrsets,
+                    },
+                },
+            },
+        }))
+        aws = AWSServiceRegion(access_key="abc", secret_key="def")
+        self.client = get_route53_client(agent, aws, uncooperator())
+
+    def test_pages(self):
+        """
+        C{iter_resource_record_sets} returns an L{RRSetStream} which follows
+        the I{NextRecordName} and I{NextRecordType} markers until the
+        response isn't truncated anymore.
+        """
+        sample = sample_paged_resource_record_sets_result
+        stream = self.client.iter_resource_record_sets("ABCDEF1234", maxitems=1)
+        self.assertEqual(
+            [(RRSetKey(sample.first.label, "A"), sample.first)],
+            self.successResultOf(stream.next_page()),
+        )
+        self.assertEqual(
+            [(RRSetKey(sample.second.label, "A"), sample.second)],
+            self.successResultOf(stream.next_page()),
+        )
+        self.assertEqual([], self.successResultOf(stream.next_page()))
+        self.assertEqual(2, len(self.rrsets.requested))
+
+    def test_prefetch(self):
+        """
+        The following page is requested as soon as a page is received.
+        """
+        stream = self.client.iter_resource_record_sets("ABCDEF1234")
+        self.successResultOf(stream.next_page())
+        self.assertEqual(
+            [(None, None), (b"b.example.invalid.", b"A")],
+            self.rrsets.requested,
+        )
+
+    def test_consume(self):
+        """
+        L{RRSetStream.consume} calls the visitor with every rrset of all the
+        pages.
+        """
+        sample = sample_paged_resource_record_sets_result
+        visited = []
+        stream = self.client.iter_resource_record_sets("ABCDEF1234")
+        self.successResultOf(
+            stream.consume(lambda key, rrset: visited.append(rrset)))
+        self.assertEqual([sample.first, sample.second], visited)
+
+
 class ChangeResourceRecordSetsTestCase(TestCase):
     """
     Tests for C{change_resource_record_sets}.
@@ -572,7 +705,7 @@ class ChangeResourceRecordSetsTestCase(TestCase):
         }))
         aws = AWSServiceRegion(access_key="abc", secret_key="def")
         client = get_route53_client(agent, aws, uncooperator())
-        self.successResultOf(client.change_resource_record_sets(
+        info = self.successResultOf(client.change_resource_record_sets(
             zone_id=zone_id,
             changes=[
                 create_rrset(sample_change_resource_record_sets_result.rrset),
@@ -580,6 +713,16 @@ class ChangeResourceRecordSetsTestCase(TestCase):
                 upsert_rrset(sample_change_resource_record_sets_result.rrset),
             ],
         ))
+        self.assertEqual(
+            ChangeInfo(
+                identifier="C2682N5HXP0BZ4",
+                status="PENDING",
+                submitted_at=datetime(
+                    2017, 3, 8, 17, 53, 2, 587000, tzinfo=tzutc(),
+                ),
+            ),
+            info,
+        )
         # Ack, what a pathetic assertion.
         change_template = "<Change><Action>{action}</Action><ResourceRecordSet><Name>example.invalid.</Name><Type>NS</Type><TTL>86400</TTL><ResourceRecords><ResourceRecord><Value>ns1.example.invalid.</Value></ResourceRecord><ResourceRecord><Value>ns2.example.invalid.</Value></ResourceRecord></ResourceRecords></ResourceRecordSet></Change>"
         changes = [
@@ -594,6 +737,40 @@ class ChangeResourceRecordSetsTestCase(TestCase):
 
 
 
+class GetChangeTestCase(TestCase):
+    """
+    Tests for C{get_change}.
+    """
+    def test_get_change(self):
+        agent = RequestTraversalAgent(static_resource({
+            b"2013-04-01": {
+                b"change": {
+                    b"C2682N5HXP0BZ4": Data(
+                        b"""\
+<?xml version="1.0" encoding="UTF-8"?>
+<GetChangeResponse xmlns="https://route53.amazonaws.com/doc/2013-04-01/"><ChangeInfo><Id>/change/C2682N5HXP0BZ4</Id><Status>INSYNC</Status><SubmittedAt>2017-03-10T01:36:41.958Z</SubmittedAt></ChangeInfo></GetChangeResponse>
+""",
+                        "text/xml",
+                    ),
+                },
+            },
+        }))
+        aws = AWSServiceRegion(access_key="abc", secret_key="def")
+        client = get_route53_client(agent, aws, uncooperator())
+        info = self.successResultOf(client.get_change("C2682N5HXP0BZ4"))
+        self.assertEqual(
+            ChangeInfo(
+                identifier="C2682N5HXP0BZ4",
+                status="INSYNC",
+                submitted_at=datetime(
+                    2017, 3, 10, 1, 36, 41, 958000, tzinfo=tzutc(),
+                ),
+            ),
+            info,
+        )
+
+
+
 def get_live_client(case):
     return get_live_service(case).get_route53_client()
 
@@ -0,0 +1,167 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for ``txaws.route53.waiter``.
+"""
+
+from datetime import datetime
+
+from twisted.internet.defer import fail, succeed
+from twisted.internet.task import Clock
+from twisted.trial.unittest import TestCase
+from twisted.web.http import BAD_REQUEST, NOT_FOUND
+
+from txaws.route53.client import Route53Error
+from txaws.route53.model import ChangeInfo
+from txaws.route53.waiter import Route53ChangeWaiter
+
+
+def change_info(change_id, status):
+    return ChangeInfo(
+        identifier=change_id,
+        status=status,
+        submitted_at=datetime(2017, 3, 10),
+    )
+
+
+def error(status, code):
+    return Route53Error(
+        """<?xml version="1.0"?>
+<ErrorResponse><Error><Type>Sender</Type><Code>{}</Code><Message>m</Message></Error></ErrorResponse>
+""".format(code).encode("utf-8"),
+        status,
+    )
+
+
+class ChangesClient(object):
+    """
+    A Route53 client double whose changes are in the status it's told, and
+    which records the I{GetChange} requests made to it.
+    """
+    def __init__(self):
+        self.statuses = {}
+        self.requests = []
+
+    def get_change(self, change_id):
+        self.requests.append(change_id)
+        status = self.statuses[change_id]
+        if isinstance(status, Exception):
+            return fail(status)
+        return succeed(change_info(change_id, status))
+
+
+class Route53ChangeWaiterTestCase(TestCase):
+    """
+    Tests for L{Route53ChangeWaiter}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.client = ChangesClient()
+        self.waiter = Route53ChangeWaiter(
+            self.client, min_delay=1, max_delay=8, backoff=2,
+            reactor=self.clock,
+        )
+
+    def test_insync(self):
+        """
+        The L{Deferred} returned by L{Route53ChangeWaiter.wait} fires with
+        the L{ChangeInfo} of the change once it is I{INSYNC}.
+        """
+        self.client.statuses["C1"] = "PENDING"
+        d = self.waiter.wait("C1")
+        self.clock.advance(1)
+        self.assertNoResult(d)
+        self.client.statuses["C1"] = "INSYNC"
+        self.clock.advance(2)
+        self.assertEqual(change_info("C1", "INSYNC"), self.successResultOf(d))
+        self.assertEqual(["C1", "C1"], self.client.requests)
+        self.assertEqual([], self.clock.getDelayedCalls())
+
+    def test_shared(self):
+        """
+        Waits for many changes share a single polling loop, and waits for the
+        same change share its I{GetChange} requests.
+        """
+        self.client.statuses.update(C1="PENDING", C2="PENDING")
+        waits = [self.waiter.wait(change_id) for change_id in "C1 C2 C1".split()]
+        self.assertEqual(1, len(self.clock.getDelayedCalls()))
+        self.clock.advance(1)
+        self.assertEqual(["C1", "C2"], self.client.requests)
+        self.client.statuses.update(C1="INSYNC", C2="INSYNC")
+        self.clock.advance(2)
+        for d in waits:
+            self.assertEqual("INSYNC", self.successResultOf(d).status)
+
+    def test_backoff(self):
+        """
+        The delay between polls doubles while no change gets in sync, up to
+        C{max_delay}, and halves once one does.
+        """
+        self.client.statuses.update(C1="PENDING", C2="PENDING")
+        self.waiter.wait("C1")
+        self.waiter.wait("C2")
+        delays = []
+        for i in range(5):
+            [call] = self.clock.getDelayedCalls()
+            delays.append(call.getTime() - self.clock.seconds())
+            self.clock.advance(delays[-1])
+        self.assertEqual([1, 2, 4, 8, 8], delays)
+        self.client.statuses["C1"] = "INSYNC"
+        self.clock.advance(8)
+        [call] = self.clock.getDelayedCalls()
+        self.assertEqual(4, call.getTime() - self.clock.seconds())
+
+    def test_throttled(self):
+        """
+        Throttling errors are retried later with a longer delay.
+        """
+        self.client.statuses["C1"] = error(BAD_REQUEST, "Throttling")
+        d = self.waiter.wait("C1")
+        self.clock.advance(1)
+        self.assertNoResult(d)
+        self.client.statuses["C1"] = "INSYNC"
+        self.clock.advance(2)
+        self.assertEqual("INSYNC", self.successResultOf(d).status)
+
+    def test_error(self):
+        """
+        Other errors are passed on to the waits for the change.
+        """
+        self.client.statuses["C1"] = error(NOT_FOUND, "NoSuchChange")
+        d = self.waiter.wait("C1")
+        self.clock.advance(1)
+        self.failureResultOf(d, Route53Error)
+        self.assertEqual([], self.clock.getDelayedCalls())
+
+    def test_unexpected_result(self):
+        """
+        If the result of polling a change can't be handled, the waits for
+        that change fail, and the other changes are still polled.
+        """
+        get_change = self.client.get_change
+
+        def broken_get_change(change_id):
+            if change_id == "C1":
+                return succeed(None)
+            return get_change(change_id)
+        self.client.get_change = broken_get_change
+        self.client.statuses["C2"] = "PENDING"
+        d1 = self.waiter.wait("C1")
+        d2 = self.waiter.wait("C2")
+        self.clock.advance(1)
+        self.failureResultOf(d1, AttributeError)
+        self.assertNoResult(d2)
+        self.client.statuses["C2"] = "INSYNC"
+        self.clock.advance(2)
+        self.assertEqual("INSYNC", self.successResultOf(d2).status)
+        self.assertEqual([], self.clock.getDelayedCalls())
+
+    def test_cancel(self):
+        """
+        Cancelling the last wait stops polling.
+        """
+        self.client.statuses["C1"] = "PENDING"
+        d = self.waiter.wait("C1")
+        d.cancel()
+        self.failureResultOf(d)
+        self.assertEqual([], self.clock.getDelayedCalls())
@@ -0,0 +1,270 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for ``txaws.route53.zonefile``.
+"""
+
+from ipaddress import IPv4Address
+
+from twisted.internet.defer import Deferred, fail, succeed
+from twisted.internet.task import Clock, Cooperator
+from twisted.trial.unittest import TestCase
+
+from txaws.route53.model import (
+    A, MX, NS, TXT, Name, RRSet, UnknownRecordType,
+)
+from txaws.route53.zonefile import ZoneFileError, import_zone, read_zone_file
+
+
+def read(text, origin=None):
+    return list(read_zone_file(text.splitlines(True), origin))
+
+
+class ReadZoneFileTestCase(TestCase):
+    """
+    Tests for L{read_zone_file}.
+    """
+    def test_records(self):
+        """
+        Consecutive records with the same owner and type make one rrset,
+        names are qualified with the origin, and the owner, TTL and class
+        may be left out.
+        """
+        rrsets = read(
+            "$ORIGIN example.invalid.\n"
+            "$TTL 1h\n"
+            "@ IN NS ns1\n"
+            "\tIN NS ns2.example.net.\n"
+            "www 60 A 10.0.0.1\n"
+            "    IN 60 A 10.0.0.2\n"
+            "mail MX 10 @\n"
+        )
+        self.assertEqual([
+            RRSet(Name("example.invalid."), "NS", 3600, {
+                NS(Name("ns1.example.invalid.")),
+                NS(Name("ns2.example.net.")),
+            }),
+            RRSet(Name("www.example.invalid."), "A", 60, {
+                A(IPv4Address("10.0.0.1")), A(IPv4Address("10.0.0.2")),
+            }),
+            RRSet(Name("mail.example.invalid."), "MX", 3600, {
+                MX(Name("example.invalid."), 10),
+            }),
+        ], rrsets)
+
+    def test_syntax(self):
+        """
+        Comments are dropped, except within quoted strings, and entries
+        continue across lines within parentheses.
+        """
+        rrsets = read(
+            "; leading comment\n"
+            "\n"
+            'txt 60 IN TXT ( "a ; b" ; comment\n'
+            '               "c" )\n',
+            origin=Name("example.invalid."),
+        )
+        self.assertEqual(
+            [RRSet(Name("txt.example.invalid."), "TXT", 60, {
+                TXT(["a ; b", "c"]),
+            })],
+            rrsets,
+        )
+
+    def test_idna(self):
+        """
+        Owner names are decoded from their ASCII-compatible encoding.
+        """
+        [rrset] = read("xn--bcher-kva.example. 60 IN A 10.0.0.1\n")
+        self.assertEqual(
+            Name("b\N{LATIN SMALL LETTER U WITH DIAERESIS}cher.example."),
+            rrset.label,
+        )
+
+    def test_unknown_type(self):
+        """
+        Records of types without a loader are read as
+        L{UnknownRecordType}.
+        """
+        [rrset] = read('caa.example. 60 IN CAA 0 issue "example.net"\n')
+        self.assertEqual(
+            {UnknownRecordType('0 issue "example.net"')}, rrset.records,
+        )
+
+    def test_errors(self):
+        """
+        L{ZoneFileError} is raised for zone files which can't be read.
+        """
+        for text in [
+                "www 60 IN A 10.0.0.1\n",
+                "www.example. IN A 10.0.0.1\n",
+                "$INCLUDE other.zone\n",
+                "www.example. 60 IN A 10.0.0.1 (\n",
+                "www.example. 60 IN A not-an-address\n",
+                "www.example. 1x IN A 10.0.0.1\n",
+                "a.example. 60 IN A 10.0.0.1\n"
+                "b.example. 60 IN A 10.0.0.1\n"
+                "a.example. 60 IN A 10.0.0.2\n",
+        ]:
+            self.assertRaises(ZoneFileError, read, text)
+
+
+    def test_unsupported_class(self):
+        """
+        L{ZoneFileError} is raised for records of classes other than I{IN},
+        rather than reading the class as the record type.
+        """
+        for record_class in ["CH", "hs", "ANY", "CLASS3"]:
+            e = self.assertRaises(
+                ZoneFileError, read,
+                "www.example. 60 {} A 10.0.0.1\n".format(record_class),
+            )
+            self.assertEqual(
+                "line 1: unsupported class {}".format(record_class), str(e),
+            )
+
+    def test_last_ttl(self):
+        """
+        Without a I{$TTL} directive, records without a TTL take the last one
+        given.
+        """
+        rrsets = read(
+            "a.example. 60 IN A 10.0.0.1\n"
+            "b.example. IN A 10.0.0.2\n"
+            "c.example. 30 IN A 10.0.0.3\n"
+            "d.example. IN A 10.0.0.4\n"
+        )
+        self.assertEqual(
+            [60, 60, 30, 30], list(rrset.ttl for rrset in rrsets),
+        )
+
+    def test_bad_encoding(self):
+        """
+        L{ZoneFileError} is raised, with the line number, for lines which
+        aren't UTF-8.
+        """
+        e = self.assertRaises(
+            ZoneFileError, list, read_zone_file([
+                b"a.example. 60 IN A 10.0.0.1\n",
+                b"\xff.example. 60 IN A 10.0.0.2\n",
+            ]),
+        )
+        self.assertTrue(str(e).startswith("line 2: "))
+
+    def test_bad_idna(self):
+        """
+        L{ZoneFileError} is raised, with the line number, for owner names
+        which aren't valid ASCII-compatible encodings.
+        """
+        e = self.assertRaises(
+            ZoneFileError, read, "xn--a.example. 60 IN A 10.0.0.1\n",
+        )
+        self.assertTrue(str(e).startswith("line 1: bad owner name "))
+
+
+class RecordingClient(object):
+    """
+    A Route53 client double recording the change batches submitted to it.
+    """
+    def __init__(self, result=None):
+        self.batches = []
+        self.result = result
+
+    def change_resource_record_sets(self, zone_id, changes):
+        self.batches.append(changes)
+        if self.result is None:
+            return succeed(None)
+        return self.result(changes)
+
+
+ZONE = "".join(
+    "host{0}.example. 60 IN A 10.0.0.{0}\n".format(n) for n in range(5)
+)
+
+
+class ImportZoneTestCase(TestCase):
+    """
+    Tests for L{import_zone}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.cooperator = Cooperator(
+            scheduler=lambda work: self.clock.callLater(0, work),
+        )
+
+    def run_cooperator(self):
+        while self.clock.getDelayedCalls():
+            self.clock.advance(0)
+    def test_packing(self):
+        """
+        Changes are packed into as few batches as the limits allow, and the
+        SOA and apex NS rrsets are skipped.
+        """
+        client = RecordingClient()
+        d = import_zone(
+            client, "zone",
+            [
+                "example. 60 IN SOA ns.example. hostmaster.example. 1 2 3 4 5\n",
+                "example. 60 IN NS ns.example.\n",
+                "sub.example. 60 IN NS ns.example.\n",
+            ] + ZONE.splitlines(True),
+            max_records=2, cooperator=self.cooperator,
+        )
+        self.run_cooperator()
+        self.assertEqual(6, self.successResultOf(d))
+        self.assertEqual(
+            [2, 2, 2], [len(changes) for changes in client.batches],
+        )
+        self.assertEqual(
+            Name("sub.example."), client.batches[0][0].rrset.label,
+        )
+
+    def test_concurrency(self):
+        """
+        No more than C{concurrency} batches are submitted at once.
+        """
+        pending = []
+
+        def result(changes):
+            d = Deferred()
+            pending.append(d)
+            return d
+        client = RecordingClient(result)
+        d = import_zone(
+            client, "zone", ZONE.splitlines(True),
+            max_records=1, concurrency=2, cooperator=self.cooperator,
+        )
+        self.run_cooperator()
+        self.assertEqual(2, len(client.batches))
+        while pending:
+            pending.pop(0).callback(None)
+            self.run_cooperator()
+            self.assertTrue(len(pending) <= 2)
+        self.assertEqual(5, self.successResultOf(d))
+        self.assertEqual(5, len(client.batches))
+
+    def test_rejected(self):
+        """
+        If a batch is rejected, no more are submitted and the L{Deferred}
+        fails with the rejection.
+        """
+        client = RecordingClient(lambda changes: fail(ZeroDivisionError()))
+        d = import_zone(
+            client, "zone", ZONE.splitlines(True),
+            max_records=1, concurrency=1, cooperator=self.cooperator,
+        )
+        self.run_cooperator()
+        self.failureResultOf(d, ZeroDivisionError)
+        self.assertEqual(1, len(client.batches))
+
+    def test_malformed(self):
+        """
+        If the zone file is malformed, the L{Deferred} fails with
+        L{ZoneFileError}.
+        """
+        d = import_zone(
+            RecordingClient(), "zone", ["www IN A 10.0.0.1\n"],
+            cooperator=self.cooperator,
+        )
+        self.run_cooperator()
+        self.failureResultOf(d, ZoneFileError)
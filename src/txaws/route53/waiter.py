@@ -0,0 +1,162 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Waiting for Route53 changes to propagate.
+"""
+
+__all__ = [
+    "Route53ChangeWaiter",
+]
+
+from collections import OrderedDict
+
+import attr
+
+from twisted.internet.defer import Deferred, DeferredSemaphore, gatherResults
+from twisted.python.failure import Failure
+from twisted.python.reflect import namedAny
+
+from .client import Route53Error
+
+# The errors which only mean that GetChange should be tried again later.
+_RETRY_CODES = {"Throttling", "PriorRequestNotComplete"}
+
+_DONE = "done"
+_PENDING = "pending"
+_RETRY = "retry"
+
+
+@attr.s
+class Route53ChangeWaiter(object):
+    """
+    Wait for Route53 changes to be I{INSYNC}, polling I{GetChange} for all of
+    the outstanding changes from a single loop.
+
+    Each round polls every change waited for, no more than C{concurrency} at
+    a time.  The delay until the next round is divided by C{backoff} after a
+    round in which a change was found to be I{INSYNC}, and multiplied by it
+    after a round in which none was, or in which Route53 asked to slow
+    down, staying between C{min_delay} and C{max_delay}.
+
+    @ivar client: The Route53 client to get the changes with.
+
+    @ivar min_delay: The smallest number of seconds between two rounds, and
+        the delay before the first one.
+    @type min_delay: L{float}
+
+    @ivar max_delay: The largest number of seconds between two rounds.
+    @type max_delay: L{float}
+
+    @ivar backoff: The factor the delay changes by between rounds.
+    @type backoff: L{float}
+
+    @ivar concurrency: The maximum number of I{GetChange} requests in
+        progress at once.
+    @type concurrency: L{int}
+
+    @ivar reactor: The L{IReactorTime} provider to schedule rounds with.
+    """
+    client = attr.ib()
+    min_delay = attr.ib(default=2.0)
+    max_delay = attr.ib(default=60.0)
+    backoff = attr.ib(default=2.0)
+    concurrency = attr.ib(default=8)
+    reactor = attr.ib(
+        default=attr.Factory(lambda: namedAny("twisted.internet.reactor")),
+    )
+
+    _waiting = attr.ib(default=attr.Factory(OrderedDict), init=False)
+    _delay = attr.ib(default=None, init=False)
+    _call = attr.ib(default=None, init=False)
+    _polling = attr.ib(default=False, init=False)
+
+    def wait(self, change_id):
+        """
+        Wait for a change to be applied to all the Route53 DNS servers.
+
+        @param change_id: The identifier of the change.
+        @type change_id: L{unicode}
+
+        @return: A L{Deferred} that fires with the I{INSYNC}
+            L{txaws.route53.model.ChangeInfo} of the change, or with a
+            L{Failure} if it can't be retrieved.  Cancelling it stops
+            waiting for the change.
+        """
+        def cancel(d):
+            waiting = self._waiting.get(change_id, [])
+            if d in waiting:
+                waiting.remove(d)
+                if not waiting:
+                    del self._waiting[change_id]
+            if not self._waiting and self._call is not None:
+                self._call.cancel()
+                self._call = None
+
+        d = Deferred(cancel)
+        self._waiting.setdefault(change_id, []).append(d)
+        if self._call is None and not self._polling:
+            self._delay = self.min_delay
+            self._schedule()
+        return d
+
+    def _schedule(self):
+        self._call = self.reactor.callLater(self._delay, self._poll)
+
+    def _poll(self):
+        self._call = None
+        self._polling = True
+        semaphore = DeferredSemaphore(self.concurrency)
+        polls = list(
+            semaphore.run(self.client.get_change, change_id).addBoth(
+                self._polled, change_id,
+            ).addErrback(
+                self._poll_failed, change_id,
+            )
+            for change_id in list(self._waiting)
+        )
+        gatherResults(polls).addCallback(self._polled_all)
+
+    def _polled(self, result, change_id):
+        if isinstance(result, Failure):
+            if _should_retry(result):
+                return _RETRY
+        elif result.status != "INSYNC":
+            return _PENDING
+        for d in self._waiting.pop(change_id, []):
+            if isinstance(result, Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+        return _DONE
+
+    def _poll_failed(self, reason, change_id):
+        # The outcome of the poll couldn't be handled, so there's no telling
+        # when the change will be done: stop waiting for it.
+        for d in self._waiting.pop(change_id, []):
+            d.errback(reason)
+        return _DONE
+
+    def _polled_all(self, outcomes):
+        self._polling = False
+        if not self._waiting:
+            return
+        if _DONE in outcomes and _RETRY not in outcomes:
+            self._delay = max(self.min_delay, self._delay / self.backoff)
+        else:
+            self._delay = min(self.max_delay, self._delay * self.backoff)
+        self._schedule()
+
+
+def _should_retry(reason):
+    """
+    Decide whether a failure to get a change is worth trying again.
+
+    Throttling and server errors are, as are failures which didn't come from
+    Route53 at all, such as connection failures.
+    """
+    if not reason.check(Route53Error):
+        return True
+    error = reason.value
+    if int(error.status) >= 500:
+        return True
+    return any(error.has_error(code) for code in _RETRY_CODES)
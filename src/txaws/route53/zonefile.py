@@ -0,0 +1,426 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Conversion between Route53 hosted zones and BIND zone files.
+
+@see: U{https://tools.ietf.org/html/rfc1035#section-5}
+"""
+
+__all__ = [
+    "ZoneFileError", "export_zone", "import_zone", "read_zone_file",
+]
+
+import re
+from xml.etree.ElementTree import Element, SubElement
+
+from twisted.internet import task
+from twisted.internet.defer import gatherResults
+
+from .batch import _cost
+from .client import RECORD_TYPES, _name_from_ace
+from .model import AliasRRSet, RRSet, UnknownRecordType, create_rrset
+
+
+class ZoneFileError(ValueError):
+    """
+    A zone file could not be read.
+    """
+
+
+def export_zone(client, zone_id, output):
+    """
+    Write all the rrsets of a hosted zone to a file in BIND zone file format,
+    a page of rrsets at a time.
+
+    Names are written fully qualified and in their ASCII-compatible encoding.
+    Alias rrsets have no zone file representation and are written as
+    comments.
+
+    @param client: The Route53 client to list the zone with.
+
+    @type zone_id: L{unicode}
+
+    @param output: A file-like object opened in text mode to write the zone
+        to.
+
+    @return: A L{Deferred} that fires with the number of rrsets written.
+    """
+    written = []
+
+    def write(key, rrset):
+        owner = _name_to_ace(rrset.label)
+        if isinstance(rrset, AliasRRSet):
+            output.write("; {} ALIAS {} {} {}\n".format(
+                owner, rrset.type, rrset.dns_name, rrset.hosted_zone_id,
+            ))
+        else:
+            output.write("".join(
+                "{} {} IN {} {}\n".format(
+                    owner, rrset.ttl, rrset.type, record.to_text(),
+                )
+                for record in sorted(rrset.records)
+            ))
+        written.append(key)
+
+    d = client.iter_resource_record_sets(zone_id).consume(write)
+    d.addCallback(lambda ignored: len(written))
+    return d
+
+
+def import_zone(client, zone_id, zone_file, origin=None, concurrency=4,
+                max_records=1000, max_characters=32000, cooperator=task):
+    """
+    Create the rrsets read from a BIND zone file in a hosted zone.
+
+    The zone file is read as the changes are submitted, packed into as few
+    I{ChangeResourceRecordSets} requests as the Route53 limits allow.  The
+    SOA rrset and the NS rrset at the same name are not imported since the
+    hosted zone has its own.
+
+    If the zone file is malformed or a change batch is rejected, the
+    batches already submitted are not undone.
+
+    @param client: The Route53 client to change the zone with.
+
+    @type zone_id: L{unicode}
+
+    @param zone_file: An iterable of the lines of the zone file, as
+        L{unicode} or UTF-8 encoded L{bytes}.
+
+    @param origin: The name relative names are relative to until a
+        I{$ORIGIN} directive says otherwise.
+    @type origin: L{Name} or L{None}
+
+    @param concurrency: The maximum number of change batches submitted at
+        once.
+    @type concurrency: L{int}
+
+    @param max_records: The maximum number of I{ResourceRecord} elements per
+        change batch.
+    @type max_records: L{int}
+
+    @param max_characters: The maximum number of characters of I{Value}
+        elements per change batch.
+    @type max_characters: L{int}
+
+    @param cooperator: The scheduler to read the zone file with.
+    @type cooperator: L{twisted.internet.task.Cooperator}
+
+    @return: A L{Deferred} that fires with the number of rrsets created, or
+        with a L{Failure} from reading the zone file or from the first
+        rejected change batch.
+    """
+    created = []
+    rejected = []
+
+    def submit():
+        batches = _pack(
+            _changes(read_zone_file(zone_file, origin)),
+            max_records, max_characters,
+        )
+        for changes in batches:
+            if rejected:
+                return
+            d = client.change_resource_record_sets(zone_id, changes)
+            d.addCallbacks(
+                lambda ignored, n=len(changes): created.append(n),
+                rejected.append,
+            )
+            yield d
+
+    # All the workers pull from the same generator.
+    work = submit()
+    d = gatherResults(
+        [
+            cooperator.cooperate(work).whenDone()
+            for i in range(concurrency)
+        ],
+        consumeErrors=True,
+    )
+
+    def done(ignored):
+        if rejected:
+            return rejected[0]
+        return sum(created)
+    d.addCallbacks(done, lambda reason: reason.value.subFailure)
+    return d
+
+
+def _changes(rrsets):
+    """
+    Turn the rrsets read from a zone file into the changes creating them.
+    """
+    apex = None
+    for rrset in rrsets:
+        if rrset.type == "SOA":
+            apex = rrset.label
+        elif not (rrset.type == "NS" and rrset.label == apex):
+            yield create_rrset(rrset)
+
+
+def _pack(changes, max_records, max_characters):
+    """
+    Group changes into the fewest lists that fit within the per-request
+    limits, preserving their order.
+    """
+    batch = []
+    records = characters = 0
+    for change in changes:
+        change_records, change_characters = _cost(change)
+        if batch and (records + change_records > max_records or
+                      characters + change_characters > max_characters):
+            yield batch
+            batch = []
+            records = characters = 0
+        batch.append(change)
+        records += change_records
+        characters += change_characters
+    if batch:
+        yield batch
+
+
+def read_zone_file(zone_file, origin=None):
+    """
+    Read the rrsets of a BIND zone file.
+
+    The records of an rrset must be consecutive.  The I{$ORIGIN} and
+    I{$TTL} directives are supported but I{$INCLUDE} and I{$GENERATE} are
+    not.  Only the I{IN} class is supported.  Records without a TTL take
+    the one of the I{$TTL} directive or, without one, the last TTL given.
+
+    @param zone_file: An iterable of the lines of the zone file, as
+        L{unicode} or UTF-8 encoded L{bytes}.
+
+    @param origin: The name relative names are relative to until a
+        I{$ORIGIN} directive says otherwise.
+    @type origin: L{Name} or L{None}
+
+    @raise ZoneFileError: If the zone file can't be read.
+
+    @return: A generator of L{RRSet}, reading the zone file as it goes.
+    """
+    origin = None if origin is None else str(origin)
+    default_ttl = None
+    last_ttl = None
+    owner = None
+    # The owner, type, TTL and records of the rrset being read.
+    pending = None
+    done = set()
+    for lineno, indented, tokens in _logical_lines(zone_file):
+        directive = tokens[0].upper()
+        if directive == "$ORIGIN" and not indented:
+            origin = _absolute(tokens[1], origin, lineno)
+            continue
+        if directive == "$TTL" and not indented:
+            default_ttl = _ttl(tokens[1], lineno)
+            continue
+        if directive.startswith("$") and not indented:
+            raise ZoneFileError(
+                "line {}: unsupported directive {}".format(lineno, tokens[0])
+            )
+
+        if not indented:
+            owner = _owner(_absolute(tokens.pop(0), origin, lineno), lineno)
+        elif owner is None:
+            raise ZoneFileError("line {}: no owner name".format(lineno))
+
+        # The TTL and the class come in either order and are optional.
+        ttl = None
+        while tokens:
+            if tokens[0].upper() == "IN":
+                tokens.pop(0)
+            elif _CLASS.match(tokens[0]):
+                raise ZoneFileError(
+                    "line {}: unsupported class {}".format(lineno, tokens[0])
+                )
+            elif ttl is None and tokens[0][:1].isdigit():
+                ttl = last_ttl = _ttl(tokens.pop(0), lineno)
+            else:
+                break
+        if not tokens:
+            raise ZoneFileError("line {}: no record type".format(lineno))
+        type = tokens.pop(0).upper()
+        record = _record(type, tokens, origin, lineno)
+
+        if pending is not None and pending[:2] == (owner, type):
+            # All the records of an rrset share the TTL of the first one.
+            pending[3].add(record)
+            continue
+        if pending is not None:
+            yield _rrset(*pending)
+        if (owner, type) in done:
+            raise ZoneFileError(
+                "line {}: records of {} {} are not consecutive".format(
+                    lineno, owner, type,
+                )
+            )
+        done.add((owner, type))
+        if ttl is None:
+            ttl = default_ttl
+        if ttl is None:
+            ttl = last_ttl
+        if ttl is None:
+            raise ZoneFileError("line {}: no TTL".format(lineno))
+        pending = (owner, type, ttl, {record})
+    if pending is not None:
+        yield _rrset(*pending)
+
+
+# The classes other than IN, which Route53 doesn't serve.
+_CLASS = re.compile(r"^(CH|HS|CS|ANY|NONE|CLASS[0-9]+)$", re.IGNORECASE)
+
+
+def _rrset(label, type, ttl, records):
+    return RRSet(label=label, type=type, ttl=ttl, records=records)
+
+
+# The positions of the domain names in the record data of each type, which
+# may be relative to the origin.
+_RDATA_NAMES = {
+    "CNAME": (0,),
+    "MX": (1,),
+    "NAPTR": (5,),
+    "NS": (0,),
+    "PTR": (0,),
+    "SOA": (0, 1),
+    "SRV": (3,),
+}
+
+
+def _record(type, tokens, origin, lineno):
+    """
+    Construct a resource record from the tokens of its record data with
+    the loader in L{RECORD_TYPES} for its type.
+    """
+    tokens = list(tokens)
+    for position in _RDATA_NAMES.get(type, ()):
+        if position < len(tokens):
+            tokens[position] = _absolute(tokens[position], origin, lineno)
+    # The loaders read the AWS representation of a record.
+    element = Element("ResourceRecord")
+    SubElement(element, "Value").text = " ".join(tokens)
+    try:
+        return RECORD_TYPES.get(
+            type, UnknownRecordType,
+        ).basic_from_element(element)
+    except Exception as e:
+        raise ZoneFileError(
+            "line {}: bad {} record: {}".format(lineno, type, e)
+        )
+
+
+def _owner(name, lineno):
+    """
+    Construct the L{Name} of an owner from its ASCII-compatible encoding.
+    """
+    try:
+        return _name_from_ace(name)
+    except UnicodeError as e:
+        raise ZoneFileError(
+            "line {}: bad owner name {}: {}".format(lineno, name, e)
+        )
+
+
+def _absolute(name, origin, lineno):
+    """
+    Qualify a domain name from a zone file with the origin.
+    """
+    if name == "@":
+        name = origin
+    elif not name.endswith("."):
+        name = None if origin is None else name + "." + origin.lstrip(".")
+    if name is None:
+        raise ZoneFileError("line {}: no origin".format(lineno))
+    return name
+
+
+_TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _ttl(text, lineno):
+    """
+    Parse a TTL, in seconds or in the BIND units notation (eg I{1h30m}).
+    """
+    if text.isdigit():
+        return int(text)
+    total = 0
+    digits = ""
+    for ch in text.lower():
+        if ch.isdigit():
+            digits += ch
+        elif ch in _TTL_UNITS and digits:
+            total += int(digits) * _TTL_UNITS[ch]
+            digits = ""
+        else:
+            raise ZoneFileError("line {}: bad TTL {}".format(lineno, text))
+    if digits:
+        raise ZoneFileError("line {}: bad TTL {}".format(lineno, text))
+    return total
+
+
+def _logical_lines(zone_file):
+    """
+    Split a zone file into entries, joining the lines between parentheses
+    and dropping comments and blank lines.
+
+    @return: A generator of three-tuples of the number of the line an entry
+        starts on, whether that line starts with blank space, and the
+        L{list} of the tokens of the entry.  Quoted strings are single
+        tokens and keep their quotes and escapes.
+    """
+    tokens = []
+    depth = 0
+    start = indented = None
+    for lineno, line in enumerate(zone_file, 1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise ZoneFileError("line {}: {}".format(lineno, e))
+        if depth == 0:
+            start = lineno
+            indented = line[:1] in (" ", "\t")
+        token = None
+        quoted = escaped = False
+        for ch in line.rstrip("\r\n"):
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif quoted:
+                quoted = ch != '"'
+            elif ch == '"':
+                quoted = True
+            elif ch == ";":
+                break
+            elif ch in "()" or ch.isspace():
+                if token is not None:
+                    tokens.append(token)
+                    token = None
+                if ch == "(":
+                    depth += 1
+                elif ch == ")":
+                    depth -= 1
+                continue
+            token = ch if token is None else token + ch
+        if quoted:
+            raise ZoneFileError("line {}: unterminated string".format(lineno))
+        if token is not None:
+            tokens.append(token)
+        if depth < 0:
+            raise ZoneFileError("line {}: unbalanced ')'".format(lineno))
+        if depth == 0 and tokens:
+            yield start, indented, tokens
+            tokens = []
+    if depth:
+        raise ZoneFileError("line {}: unbalanced '('".format(start))
+
+
+def _name_to_ace(name):
+    """
+    Give the ASCII-compatible encoding of a L{Name}.
+    """
+    text = str(name)
+    if text.isascii():
+        return text
+    return text.encode("idna").decode("ascii")
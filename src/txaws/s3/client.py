@@ -30,7 +30,7 @@ from twisted.internet import task
 import hashlib
 from hashlib import sha256
 from urllib.parse import urlencode, unquote
-from dateutil.parser import parse as parseTime
+from xml.sax.saxutils import escape
 
 from txaws.client.base import (
     _URLContext, BaseClient, BaseQuery, error_wrapper,
@@ -38,14 +38,15 @@ from txaws.client.base import (
 )
 from txaws.s3.acls import AccessControlPolicy
 from txaws.s3.model import (
-    Bucket, BucketItem, BucketListing, ItemOwner, LifecycleConfiguration,
+    Bucket, BucketColumns, BucketItem, BucketListing, DeleteObjectError,
+    DeleteObjectsResult, ItemOwner, LifecycleConfiguration,
     LifecycleConfigurationRule, NotificationConfiguration, RequestPayment,
     VersioningConfiguration, WebsiteConfiguration, MultipartInitiationResponse,
     MultipartCompletionResponse)
 from txaws import _auth_v4
 from txaws.s3.exception import S3Error
 from txaws.service import AWSServiceEndpoint, REGION_US_EAST_1, S3_ENDPOINT
-from txaws.util import XML
+from txaws.util import XML, calculate_md5, parse_iso8601
 
 
 def _to_dict(headers):
@@ -96,10 +97,12 @@ class S3Client(BaseClient):
         # against replay attacks with different content.
         #
         # If the body was specified as a producer, we can't really do
-        # this. :( The producer may generate large amounts of data
-        # which we can't hold in memory and it may not be replayable.
+        # this in general. :( The producer may generate large amounts of
+        # data which we can't hold in memory and it may not be replayable.
         # AWS requires the signature in the header so there's no way
         # to both hash/sign and avoid buffering everything in memory.
+        # Producers which can hash their content cheaply, like
+        # MmapBodyProducer, say so with a sha256_hexdigest method.
         #
         # The saving grace is that we'll only issue requests over TLS
         # after verifying the AWS certificate and requests with a date
@@ -113,6 +116,8 @@ class S3Client(BaseClient):
             # Just as important is to include the empty content hash
             # for all no-body requests.
             content_sha256 = sha256(b"").hexdigest()
+        elif getattr(body_producer, "sha256_hexdigest", None) is not None:
+            content_sha256 = body_producer.sha256_hexdigest()
         else:
             # Tell AWS we're not trying to sign the payload.
             content_sha256 = None
@@ -163,7 +168,7 @@ class S3Client(BaseClient):
         for bucket_data in root.find("Buckets"):
             name = bucket_data.findtext("Name")
             date_text = bucket_data.findtext("CreationDate")
-            date_time = parseTime(date_text)
+            date_time = parse_iso8601(date_text)
             bucket = Bucket(name, date_time)
             buckets.append(bucket)
         return buckets
@@ -192,7 +197,8 @@ class S3Client(BaseClient):
         query = self._query_factory(details)
         return self._submit(query)
 
-    def get_bucket(self, bucket, marker=None, max_keys=None, prefix=None):
+    def get_bucket(self, bucket, marker=None, max_keys=None, prefix=None,
+                   columns=False, delimiter=None):
         """
         Get a list of all the objects in a bucket.
 
@@ -213,6 +219,17 @@ class S3Client(BaseClient):
             beginning with this value should be returned.
         @type prefix: L{bytes} or L{NoneType}
 
+        @param columns: If true, give the contents of the listing as a
+            L{BucketColumns} of the keys, sizes, modification times and
+            ETags instead of a L{list} of L{BucketItem}, which is much
+            cheaper for large scans.
+        @type columns: L{bool}
+
+        @param delimiter: If given, roll up the keys which contain it after
+            the prefix into the common prefixes of the listing, up to and
+            including its first occurrence.
+        @type delimiter: L{unicode} or L{NoneType}
+
         @return: A L{Deferred} that fires with a L{BucketListing}
             describing the result.
 
@@ -225,6 +242,51 @@ class S3Client(BaseClient):
             args.append(("max-keys", "%d" % (max_keys,)))
         if prefix is not None:
             args.append(("prefix", prefix))
+        if delimiter is not None:
+            args.append(("delimiter", delimiter))
+        return self._list_objects(bucket, args, columns)
+
+    def list_objects_v2(self, bucket, prefix=None, delimiter=None,
+                        continuation_token=None, start_after=None,
+                        max_keys=None, columns=False):
+        """
+        Get a page of the objects in a bucket with version 2 of the
+        I{ListObjects} API, which pages with opaque continuation tokens.
+
+        @param bucket: The name of the bucket from which to retrieve objects.
+        @type bucket: L{unicode}
+
+        @param continuation_token: If given, the
+            C{next_continuation_token} of the previous page, to get the next
+            one.
+        @type continuation_token: L{unicode} or L{NoneType}
+
+        @param start_after: If given, only give the objects with keys which
+            sort after it.
+        @type start_after: L{unicode} or L{NoneType}
+
+        @see: L{get_bucket} for the other parameters.
+
+        @return: A L{Deferred} that fires with a L{BucketListing}
+            describing the result, whose C{next_continuation_token} is set
+            if it's truncated.
+
+        @see: U{https://docs.aws.amazon.com/AmazonS3/latest/API/API_ListObjectsV2.html}
+        """
+        args = [("list-type", "2")]
+        if continuation_token is not None:
+            args.append(("continuation-token", continuation_token))
+        if start_after is not None:
+            args.append(("start-after", start_after))
+        if max_keys is not None:
+            args.append(("max-keys", "%d" % (max_keys,)))
+        if prefix is not None:
+            args.append(("prefix", prefix))
+        if delimiter is not None:
+            args.append(("delimiter", delimiter))
+        return self._list_objects(bucket, args, columns)
+
+    def _list_objects(self, bucket, args, columns):
         if args:
             object_name = "?" + urlencode(args)
         else:
@@ -234,23 +296,20 @@ class S3Client(BaseClient):
             url_context=self._url_context(bucket=bucket, object_name=object_name),
         )
         d = self._submit(self._query_factory(details))
-        d.addCallback(self._parse_get_bucket)
+        if columns:
+            d.addCallback(self._parse_get_bucket_columns)
+        else:
+            d.addCallback(self._parse_get_bucket)
         return d
 
     def _parse_get_bucket(self, xxx_todo_changeme3):
         (response, xml_bytes) = xxx_todo_changeme3
         root = XML(xml_bytes)
-        name = root.findtext("Name")
-        prefix = root.findtext("Prefix")
-        marker = root.findtext("Marker")
-        max_keys = root.findtext("MaxKeys")
-        is_truncated = root.findtext("IsTruncated")
         contents = []
-
         for content_data in root.findall("Contents"):
             key = content_data.findtext("Key")
             date_text = content_data.findtext("LastModified")
-            modification_date = parseTime(date_text)
+            modification_date = parse_iso8601(date_text)
             etag = content_data.findtext("ETag")
             size = content_data.findtext("Size")
             storage_class = content_data.findtext("StorageClass")
@@ -260,13 +319,40 @@ class S3Client(BaseClient):
             content_item = BucketItem(key, modification_date, etag,
                                       size.encode(), storage_class, owner)
             contents.append(content_item)
+        return self._bucket_listing(root, contents)
 
+    def _parse_get_bucket_columns(self, response_and_xml_bytes):
+        (response, xml_bytes) = response_and_xml_bytes
+        root = XML(xml_bytes)
+        contents = BucketColumns()
+        for content_data in root.findall("Contents"):
+            modification_date = parse_iso8601(
+                content_data.findtext("LastModified"),
+            )
+            contents.append(
+                content_data.findtext("Key"),
+                int(modification_date.timestamp()),
+                content_data.findtext("ETag"),
+                int(content_data.findtext("Size")),
+            )
+        return self._bucket_listing(root, contents)
+
+    def _bucket_listing(self, root, contents):
+        """
+        Make a L{BucketListing} of the contents of a bucket, with the rest of
+        the details from the root element of the response.
+        """
         common_prefixes = []
         for prefix_data in root.findall("CommonPrefixes"):
-            common_prefixes.append(prefix_data.text)
-
-        return BucketListing(name, prefix, marker, max_keys, is_truncated,
-                             contents, common_prefixes)
+            common_prefixes.append(prefix_data.findtext("Prefix"))
+
+        return BucketListing(
+            root.findtext("Name"), root.findtext("Prefix"),
+            root.findtext("Marker"), root.findtext("MaxKeys"),
+            root.findtext("IsTruncated"), contents, common_prefixes,
+            next_marker=root.findtext("NextMarker"),
+            next_continuation_token=root.findtext("NextContinuationToken"),
+        )
 
     def get_bucket_location(self, bucket):
         """
@@ -443,6 +529,11 @@ class S3Client(BaseClient):
         @param content_type: The type of data being written.
         @param metadata: A C{dict} used to build C{x-amz-meta-*} headers.
         @param amz_headers: A C{dict} used to build C{x-amz-*} headers.
+        @param body_producer: An C{IBodyProducer} of the data to write,
+            instead of C{data}.  The payload is only signed if it has a
+            C{sha256_hexdigest} method giving the hex digest of the SHA256
+            hash of the data, like
+            L{txaws.client._producers.MmapBodyProducer}.
         @return: A C{Deferred} that will fire with the result of request.
         """
         details = self._details(
@@ -526,6 +617,66 @@ class S3Client(BaseClient):
         d = self._submit(self._query_factory(details))
         return d
 
+    def delete_objects(self, bucket, object_names, quiet=False):
+        """
+        Delete up to 1000 objects from a bucket with one request.
+
+        @param bucket: The name of the bucket.
+        @type bucket: L{unicode}
+
+        @param object_names: The names of the objects to delete.
+        @type object_names: A L{list} of L{unicode}
+
+        @param quiet: If true, ask S3 to only report the objects it failed
+            to delete, which makes for a much shorter response.
+        @type quiet: L{bool}
+
+        @return: A L{Deferred} that fires with a L{DeleteObjectsResult}.
+
+        @see: U{https://docs.aws.amazon.com/AmazonS3/latest/API/API_DeleteObjects.html}
+        """
+        if len(object_names) > 1000:
+            raise ValueError(
+                "Cannot delete more than 1000 objects at once, got %d" % (
+                    len(object_names),
+                ),
+            )
+        data = self._build_delete_objects_xml(object_names, quiet)
+        details = self._details(
+            method="POST",
+            url_context=self._url_context(bucket=bucket, object_name="?delete"),
+            headers=Headers({"content-md5": [calculate_md5(data).decode()]}),
+            body=data,
+        )
+        d = self._submit(self._query_factory(details))
+        d.addCallback(self._parse_delete_objects)
+        return d
+
+    def _build_delete_objects_xml(self, object_names, quiet):
+        xml = ['<Delete>']
+        if quiet:
+            xml.append('<Quiet>true</Quiet>')
+        for object_name in object_names:
+            xml.append('<Object><Key>%s</Key></Object>' % (escape(object_name),))
+        xml.append('</Delete>')
+        return '\n'.join(xml)
+
+    def _parse_delete_objects(self, response_and_xml_bytes):
+        (response, xml_bytes) = response_and_xml_bytes
+        root = XML(xml_bytes)
+        return DeleteObjectsResult(
+            deleted=list(
+                deleted.findtext("Key") for deleted in root.findall("Deleted")
+            ),
+            errors=list(
+                DeleteObjectError(
+                    error.findtext("Key"), error.findtext("Code"),
+                    error.findtext("Message"),
+                )
+                for error in root.findall("Error")
+            ),
+        )
+
     def put_object_acl(self, bucket, object_name, access_control_policy):
         """
         Set access control policy on an object.
@@ -635,7 +786,7 @@ class S3Client(BaseClient):
         @param content_type: The Content-Type
         @param metadata: Additional metadata
         @param body_producer: an C{IBodyProducer} (optional, requires data if
-            not specified)
+            not specified), signed as for L{put_object}
         @return: the C{Deferred} from underlying query.submit() call
         """
         parms = 'partNumber=%s&uploadId=%s' % (str(part_number), upload_id)
@@ -646,6 +797,7 @@ class S3Client(BaseClient):
             headers=self._headers(content_type),
             metadata=metadata,
             body=data,
+            body_producer=body_producer,
         )
         d = self._submit(self._query_factory(details))
         d.addCallback(lambda response_data: _to_dict(response_data[0].responseHeaders))
@@ -0,0 +1,98 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Deleting many S3 objects with few requests.
+"""
+
+__all__ = [
+    "BulkDeleter",
+]
+
+from itertools import islice
+
+import attr
+
+from twisted.internet import task
+from twisted.internet.defer import FirstError, gatherResults
+
+
+@attr.s
+class BulkDeleter(object):
+    """
+    Delete the objects named by an iterable, such as the keys of a bucket
+    listing, with multi-object delete requests of up to C{batch_size} keys
+    each, no more than C{concurrency} of them in progress at a time.
+
+    The keys are consumed as the requests are made, so they can come from
+    a generator which never holds all of them.
+
+    @ivar client: The L{txaws.s3.client.S3Client} to delete the objects
+        with.
+
+    @ivar batch_size: The number of keys to delete with each request.  S3
+        takes no more than 1000.
+    @type batch_size: L{int}
+
+    @ivar concurrency: The maximum number of requests in progress at once.
+    @type concurrency: L{int}
+
+    @ivar cooperator: The L{twisted.internet.task.Cooperator}, or module
+        with a C{coiterate} function, to schedule the requests with.
+    """
+    client = attr.ib()
+    batch_size = attr.ib(default=1000)
+    concurrency = attr.ib(default=4)
+    cooperator = attr.ib(default=task)
+
+    def delete(self, bucket, object_names):
+        """
+        Delete objects from a bucket.
+
+        @param bucket: The name of the bucket.
+        @type bucket: L{unicode}
+
+        @param object_names: An iterable of the names of the objects to
+            delete.
+
+        @return: A L{Deferred} that fires with a L{list} of the
+            L{txaws.s3.model.DeleteObjectError}s of the objects which
+            couldn't be deleted, once all the others have been.  If a
+            request fails, no more are made, and the L{Deferred} fires with
+            the L{Failure} once the requests already in progress are done.
+        """
+        errors = []
+        failures = []
+        batches = self._delete_batches(
+            bucket, iter(object_names), errors, failures,
+        )
+        d = gatherResults([
+            self.cooperator.coiterate(batches)
+            for i in range(self.concurrency)
+        ], consumeErrors=True)
+
+        def deleted(ignored):
+            if failures:
+                return failures[0]
+            return errors
+
+        def failed(reason):
+            reason.trap(FirstError)
+            return reason.value.subFailure
+        d.addCallbacks(deleted, failed)
+        return d
+
+    def _delete_batches(self, bucket, object_names, errors, failures):
+        """
+        Make a request for each batch of keys, shared between the
+        C{concurrency} cooperative tasks which iterate over it, until a
+        request fails.
+        """
+        while not failures:
+            batch = list(islice(object_names, self.batch_size))
+            if not batch:
+                return
+            d = self.client.delete_objects(bucket, batch, quiet=True)
+            d.addCallbacks(
+                lambda result: errors.extend(result.errors), failures.append,
+            )
+            yield d
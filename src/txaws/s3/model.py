@@ -4,6 +4,7 @@
 # Copyright (C) 2012 New Dream Network (DreamHost)
 # Licenced under the txaws licence available at /LICENSE in the txaws source.
 
+from array import array
 from datetime import datetime
 
 import attr
@@ -12,7 +13,7 @@ from attr import validators
 from txaws.util import XML
 
 
-@attr.s
+@attr.s(slots=True)
 class Bucket(object):
     """
     An Amazon S3 storage bucket.
@@ -21,7 +22,7 @@ class Bucket(object):
     creation_date = attr.ib()
 
 
-@attr.s
+@attr.s(slots=True)
 class ItemOwner(object):
     """
     The owner of a content item.
@@ -30,7 +31,7 @@ class ItemOwner(object):
     display_name = attr.ib()
 
 
-@attr.s
+@attr.s(slots=True)
 class BucketItem(object):
     """
     The contents of an Amazon S3 bucket.
@@ -46,10 +47,117 @@ class BucketItem(object):
     )
 
 
-@attr.s
+def _offsets():
+    return array("q", [0])
+
+
+@attr.s(slots=True)
+class BucketColumns(object):
+    """
+    The key, size, modification time and ETag of each item of a bucket
+    listing, stored column by column rather than as one L{BucketItem} per
+    key, for scans over many keys.
+
+    @ivar keys: The UTF-8 encoded keys, joined.
+    @type keys: L{bytearray}
+
+    @ivar key_offsets: The offsets in C{keys} at which each key starts,
+        followed by the length of C{keys}.
+    @type key_offsets: L{array.array} of C{"q"}
+
+    @ivar etags: The ASCII encoded ETags, joined.
+    @type etags: L{bytearray}
+
+    @ivar etag_offsets: The offsets in C{etags} at which each ETag starts,
+        followed by the length of C{etags}.
+    @type etag_offsets: L{array.array} of C{"q"}
+
+    @ivar sizes: The size of each item, in bytes.
+    @type sizes: L{array.array} of C{"q"}
+
+    @ivar modification_times: The modification time of each item, in
+        seconds since the epoch.
+    @type modification_times: L{array.array} of C{"q"}
+    """
+    keys = attr.ib(default=attr.Factory(bytearray))
+    key_offsets = attr.ib(default=attr.Factory(_offsets))
+    etags = attr.ib(default=attr.Factory(bytearray))
+    etag_offsets = attr.ib(default=attr.Factory(_offsets))
+    sizes = attr.ib(default=attr.Factory(lambda: array("q")))
+    modification_times = attr.ib(default=attr.Factory(lambda: array("q")))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def append(self, key, modification_time, etag, size):
+        """
+        Add an item.
+
+        @type key: L{unicode}
+        @type modification_time: L{int}
+        @type etag: L{unicode}
+        @type size: L{int}
+        """
+        self.keys += key.encode("utf-8")
+        self.key_offsets.append(len(self.keys))
+        self.etags += etag.encode("ascii")
+        self.etag_offsets.append(len(self.etags))
+        self.sizes.append(size)
+        self.modification_times.append(modification_time)
+
+    def extend(self, other):
+        """
+        Add all the items of another L{BucketColumns}, such as the next page
+        of a listing.
+        """
+        for buffer, offsets, others, other_offsets in [
+                (self.keys, self.key_offsets, other.keys, other.key_offsets),
+                (self.etags, self.etag_offsets,
+                 other.etags, other.etag_offsets),
+        ]:
+            base = len(buffer)
+            buffer += others
+            offsets.extend(base + offset for offset in other_offsets[1:])
+        self.sizes.extend(other.sizes)
+        self.modification_times.extend(other.modification_times)
+
+    def key(self, index):
+        """
+        @return: The key of an item.
+        @rtype: L{unicode}
+        """
+        start, end = self.key_offsets[index], self.key_offsets[index + 1]
+        return self.keys[start:end].decode("utf-8")
+
+    def etag(self, index):
+        """
+        @return: The ETag of an item.
+        @rtype: L{unicode}
+        """
+        start, end = self.etag_offsets[index], self.etag_offsets[index + 1]
+        return self.etags[start:end].decode("ascii")
+
+    def iter_keys(self):
+        """
+        @return: An iterator over the keys of all the items, in order.
+        """
+        for index in range(len(self)):
+            yield self.key(index)
+
+
+@attr.s(slots=True)
 class BucketListing(object):
     """
     A mapping for the data in a bucket listing.
+
+    C{contents} is a L{list} of L{BucketItem}, or a L{BucketColumns} if the
+    listing was requested in columns.
+
+    @ivar next_marker: The marker to get the next page of a truncated
+        listing requested with a delimiter, if S3 gave one.
+
+    @ivar next_continuation_token: The continuation token to get the next
+        page of a truncated I{ListObjectsV2} listing.
     """
     name = attr.ib()
     prefix = attr.ib()
@@ -58,6 +166,38 @@ class BucketListing(object):
     is_truncated = attr.ib()
     contents = attr.ib(default=None)
     common_prefixes = attr.ib(default=None)
+    next_marker = attr.ib(default=None)
+    next_continuation_token = attr.ib(default=None)
+
+
+@attr.s(slots=True)
+class DeleteObjectError(object):
+    """
+    An object which a multi-object delete failed to delete.
+
+    @ivar key: The key of the object.
+    @ivar code: The S3 error code, such as C{"AccessDenied"}.
+    @ivar message: The description of the error.
+    """
+    key = attr.ib()
+    code = attr.ib()
+    message = attr.ib()
+
+
+@attr.s(slots=True)
+class DeleteObjectsResult(object):
+    """
+    The outcome of a multi-object delete.
+
+    @ivar deleted: The keys of the objects deleted, which S3 only reports
+        outside of quiet mode.
+    @type deleted: L{list} of L{unicode}
+
+    @ivar errors: The objects which couldn't be deleted.
+    @type errors: L{list} of L{DeleteObjectError}
+    """
+    deleted = attr.ib(default=attr.Factory(list))
+    errors = attr.ib(default=attr.Factory(list))
 
 
 class LifecycleConfiguration(object):
@@ -11,10 +11,12 @@ from twisted.web.http_headers import Headers
 
 from txaws.credentials import AWSCredentials
 from txaws.client.base import RequestDetails
+from txaws.client._producers import MmapBodyProducer
 from txaws.s3 import client
 from txaws.s3.acls import AccessControlPolicy
 from txaws.s3.model import (RequestPayment, MultipartInitiationResponse,
-                            MultipartCompletionResponse)
+                            MultipartCompletionResponse, DeleteObjectError,
+                            DeleteObjectsResult)
 from txaws.testing.producers import StringBodyProducer
 from txaws.testing.s3_tests import s3_integration_tests
 from txaws.service import AWSServiceEndpoint, REGION_US_EAST_1
@@ -272,6 +274,32 @@ class S3ClientTestCase(TestCase):
         d.addCallback(check_results)
         return d
 
+    def test_get_bucket_columns(self):
+        """
+        With C{columns}, L{S3Client.get_bucket} gives the contents of the
+        bucket as a L{BucketColumns}.
+        """
+        query_factory = mock_query_factory(payload.sample_get_bucket_result)
+
+        def check_results(listing):
+            self.assertEqual(listing.name, "mybucket")
+            self.assertEqual(listing.is_truncated, "false")
+            contents = listing.contents
+            self.assertEqual(["Nelson", "Neo"], list(contents.iter_keys()))
+            self.assertEqual([5, 4], list(contents.sizes))
+            self.assertEqual(
+                [1136116800, 1136116800], list(contents.modification_times),
+            )
+            self.assertEqual(
+                '"828ef3fdfa96f00ad9f27c383fc9ac7f"', contents.etag(1),
+            )
+
+        creds = AWSCredentials("foo", "bar")
+        s3 = client.S3Client(creds, query_factory=query_factory)
+        d = s3.get_bucket("mybucket", columns=True)
+        d.addCallback(check_results)
+        return d
+
     def test_get_bucket_pagination(self):
         """
         L{S3Client.get_bucket} accepts C{marker} and C{max_keys} arguments
@@ -310,6 +338,68 @@ class S3ClientTestCase(TestCase):
         d.addCallback(check_query_args)
         return d
 
+    def test_get_bucket_delimiter(self):
+        """
+        L{S3Client.get_bucket} accepts a C{delimiter} argument to ask the
+        server to roll keys up into common prefixes.
+        """
+        query_factory = mock_query_factory(payload.sample_get_bucket_result)
+        def check_query_args(passthrough):
+            self.assertEqual(
+                "http:///mybucket/?prefix=photos%2F&delimiter=%2F",
+                query_factory.details.url_context.get_encoded_url(),
+            )
+            return passthrough
+
+        creds = AWSCredentials("foo", "bar")
+        s3 = client.S3Client(creds, query_factory=query_factory)
+        d = s3.get_bucket("mybucket", prefix="photos/", delimiter="/")
+        d.addCallback(check_query_args)
+        return d
+
+    def test_list_objects_v2(self):
+        """
+        L{S3Client.list_objects_v2} lists the objects in a bucket with
+        I{ListObjectsV2}, and gives the common prefixes and the token to get
+        the next page with.
+        """
+        query_factory = mock_query_factory(
+            payload.sample_list_objects_v2_result,
+        )
+
+        def check_query_args(listing):
+            self.assertEqual(
+                "http:///mybucket/?list-type=2&continuation-token=abc%3D"
+                "&max-keys=3&prefix=photos%2F&delimiter=%2F",
+                query_factory.details.url_context.get_encoded_url(),
+            )
+            return listing
+
+        def check_results(listing):
+            self.assertEqual("photos/", listing.prefix)
+            self.assertEqual("true", listing.is_truncated)
+            self.assertEqual(
+                "1ueGcxLPRx1Tr/XYExHnhbYLgveDs2J/wm36Hy4vbOwM=",
+                listing.next_continuation_token,
+            )
+            self.assertEqual(
+                ["photos/index.html"],
+                list(item.key for item in listing.contents),
+            )
+            self.assertEqual(
+                ["photos/2006/", "photos/2007/"], listing.common_prefixes,
+            )
+
+        creds = AWSCredentials("foo", "bar")
+        s3 = client.S3Client(creds, query_factory=query_factory)
+        d = s3.list_objects_v2(
+            "mybucket", prefix="photos/", delimiter="/",
+            continuation_token="abc=", max_keys=3,
+        )
+        d.addCallback(check_query_args)
+        d.addCallback(check_results)
+        return d
+
     def test_get_bucket_location(self):
         """
         L{S3Client.get_bucket_location} creates a L{Query} to get a bucket's
@@ -872,6 +962,31 @@ class S3ClientTestCase(TestCase):
         d.addCallback(check_query_args)
         return d
 
+    def test_put_object_with_hashing_body_producer(self):
+        """
+        The payload is signed when the body producer can hash it, like
+        L{MmapBodyProducer}.
+        """
+        query_factory = mock_query_factory(None)
+        path = self.mktemp()
+        with open(path, "wb") as f:
+            f.write(b"some data")
+        with open(path, "rb") as f:
+            producer = MmapBodyProducer(f)
+
+        def check_query_args(passthrough):
+            self.assertIs(producer, query_factory.details.body_producer)
+            self.assertEqual(
+                sha256(b"some data").hexdigest(),
+                query_factory.details.content_sha256,
+            )
+
+        creds = AWSCredentials("foo", "bar")
+        s3 = client.S3Client(creds, query_factory=query_factory)
+        d = s3.put_object("mybucket", "objectname", body_producer=producer)
+        d.addCallback(check_query_args)
+        return d
+
     def test_copy_object(self):
         """
         L{S3Client.copy_object} creates a L{Query} to copy an object from one
@@ -976,6 +1091,66 @@ class S3ClientTestCase(TestCase):
         d.addCallback(check_query_args)
         return d
 
+    def test_delete_objects(self):
+        """
+        L{S3Client.delete_objects} deletes several objects with one
+        I{POST} to the bucket's I{delete} subresource, whose body is signed
+        with a I{Content-MD5} header too, and gives the keys deleted and the
+        errors.
+        """
+        query_factory = mock_query_factory(payload.sample_delete_objects_result)
+
+        def check_query_args(passthrough):
+            details = query_factory.details
+            self.assertEqual("POST", details.method)
+            self.assertEqual(
+                "http:///mybucket/?delete",
+                details.url_context.get_encoded_url(),
+            )
+            body = (
+                "<Delete>\n<Quiet>true</Quiet>\n"
+                "<Object><Key>sample1.txt</Key></Object>\n"
+                "<Object><Key>a&amp;&lt;b&gt;</Key></Object>\n"
+                "</Delete>"
+            )
+            self.assertEqual(
+                [calculate_md5(body).decode()],
+                details.headers.getRawHeaders("content-md5"),
+            )
+            self.assertEqual(
+                sha256(body.encode()).hexdigest(), details.content_sha256,
+            )
+            return passthrough
+
+        def check_result(result):
+            self.assertEqual(
+                DeleteObjectsResult(
+                    deleted=["sample1.txt"],
+                    errors=[DeleteObjectError(
+                        "sample2.txt", "AccessDenied", "Access Denied",
+                    )],
+                ),
+                result,
+            )
+
+        creds = AWSCredentials("foo", "bar")
+        s3 = client.S3Client(creds, query_factory=query_factory)
+        d = s3.delete_objects(
+            "mybucket", ["sample1.txt", "a&<b>"], quiet=True,
+        )
+        d.addCallback(check_query_args)
+        d.addCallback(check_result)
+        return d
+
+    def test_delete_objects_too_many(self):
+        """
+        L{S3Client.delete_objects} rejects more than 1000 keys at once.
+        """
+        s3 = client.S3Client(AWSCredentials("foo", "bar"))
+        self.assertRaises(
+            ValueError, s3.delete_objects, "mybucket", ["a"] * 1001,
+        )
+
     def test_put_object_acl(self):
         query_factory = mock_query_factory(payload.sample_access_control_policy_result)
         def check_query_args(passthrough):
@@ -1097,6 +1272,33 @@ class S3ClientTestCase(TestCase):
         d.addCallback(check_query_args)
         return d
 
+    def test_upload_part_with_body_producer(self):
+        """
+        L{S3Client.upload_part} uploads the data of a body producer.
+        """
+        query_factory = mock_query_factory(None)
+        path = self.mktemp()
+        with open(path, "wb") as f:
+            f.write(b"part one, part two")
+        with open(path, "rb") as f:
+            producer = MmapBodyProducer(f, offset=10, length=8)
+
+        def check_query_args(passthrough):
+            self.assertIs(producer, query_factory.details.body_producer)
+            self.assertEqual(
+                sha256(b"part two").hexdigest(),
+                query_factory.details.content_sha256,
+            )
+
+        creds = AWSCredentials("foo", "bar")
+        s3 = client.S3Client(creds, query_factory=query_factory)
+        d = s3.upload_part(
+            "example-bucket", "example-object", "testid", 2,
+            body_producer=producer,
+        )
+        d.addCallback(check_query_args)
+        return d
+
     def test_complete_multipart_upload(self):
         query_factory = mock_query_factory(payload.sample_s3_complete_multipart_upload_result)
         def check_query_args(passthrough):
@@ -0,0 +1,146 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for L{txaws.s3.deleter}.
+"""
+
+import gc
+
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.task import Clock, Cooperator
+from twisted.trial.unittest import TestCase
+
+from txaws.s3.deleter import BulkDeleter
+from txaws.s3.exception import S3Error
+from txaws.s3.model import DeleteObjectError, DeleteObjectsResult
+
+
+class DeletingClient(object):
+    """
+    An S3 client double which records the multi-object deletes made to it,
+    and holds them until told how they went, or fails to delete the keys
+    it's told to.
+    """
+    def __init__(self, hold=False):
+        self.hold = hold
+        self.requests = []
+        self.held = []
+        self.undeletable = set()
+
+    def delete_objects(self, bucket, object_names, quiet=False):
+        if len(object_names) > 1000:
+            raise ValueError("Cannot delete more than 1000 objects at once")
+        self.requests.append((bucket, object_names, quiet))
+        if self.hold:
+            d = Deferred()
+            self.held.append(d)
+            return d
+        return succeed(DeleteObjectsResult(errors=list(
+            DeleteObjectError(name, "AccessDenied", "Access Denied")
+            for name in object_names
+            if name in self.undeletable
+        )))
+
+
+class BulkDeleterTestCase(TestCase):
+    """
+    Tests for L{BulkDeleter}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.cooperator = Cooperator(
+            scheduler=lambda work: self.clock.callLater(0, work),
+        )
+        self.client = DeletingClient()
+
+    def deleter(self, **kwargs):
+        return BulkDeleter(self.client, cooperator=self.cooperator, **kwargs)
+
+    def test_batches(self):
+        """
+        L{BulkDeleter.delete} deletes the objects in quiet multi-object
+        deletes of C{batch_size} keys, and fires with the errors reported
+        for them.
+        """
+        self.client.undeletable = {"k3", "k6"}
+        d = self.deleter(batch_size=3).delete(
+            "bucket", ("k%d" % (i,) for i in range(8)),
+        )
+        self.clock.advance(0)
+        self.assertEqual(
+            [
+                ("bucket", ["k0", "k1", "k2"], True),
+                ("bucket", ["k3", "k4", "k5"], True),
+                ("bucket", ["k6", "k7"], True),
+            ],
+            self.client.requests,
+        )
+        self.assertEqual(
+            [
+                DeleteObjectError("k3", "AccessDenied", "Access Denied"),
+                DeleteObjectError("k6", "AccessDenied", "Access Denied"),
+            ],
+            self.successResultOf(d),
+        )
+
+    def test_concurrency(self):
+        """
+        No more than C{concurrency} requests are in progress at once, and
+        the keys are only consumed as the requests are made.
+        """
+        self.client.hold = True
+        taken = []
+
+        def names():
+            for name in ["a", "b", "c", "d", "e"]:
+                taken.append(name)
+                yield name
+        d = self.deleter(batch_size=2, concurrency=2).delete("bucket", names())
+        self.clock.advance(0)
+        self.assertEqual(2, len(self.client.held))
+        self.assertEqual(["a", "b", "c", "d"], taken)
+        self.client.held.pop(0).callback(DeleteObjectsResult())
+        self.client.held.pop(0).callback(DeleteObjectsResult())
+        self.clock.advance(0)
+        self.assertNoResult(d)
+        self.assertEqual(1, len(self.client.held))
+        self.client.held.pop(0).callback(DeleteObjectsResult())
+        self.clock.advance(0)
+        self.assertEqual([], self.successResultOf(d))
+        self.assertEqual(
+            [["a", "b"], ["c", "d"], ["e"]],
+            list(batch for (bucket, batch, quiet) in self.client.requests),
+        )
+
+    def test_failure(self):
+        """
+        If a request fails, no more are made, and the L{Deferred} of
+        L{BulkDeleter.delete} fails once the requests in progress are done.
+        """
+        self.client.hold = True
+        d = self.deleter(batch_size=1, concurrency=2).delete(
+            "bucket", ["a", "b", "c"],
+        )
+        self.clock.advance(0)
+        error = S3Error("<slowdown/>", 503)
+        self.client.held.pop(0).errback(error)
+        self.clock.advance(0)
+        self.assertNoResult(d)
+        self.client.held.pop(0).callback(DeleteObjectsResult())
+        self.clock.advance(0)
+        self.assertEqual(2, len(self.client.requests))
+        self.assertIs(error, self.failureResultOf(d, S3Error).value)
+
+    def test_error(self):
+        """
+        If making a request raises an exception, the L{Deferred} of
+        L{BulkDeleter.delete} fails with it, and no unhandled error is
+        logged.
+        """
+        d = self.deleter(batch_size=1001).delete(
+            "bucket", ("k%d" % (i,) for i in range(1001)),
+        )
+        self.clock.advance(0)
+        self.failureResultOf(d, ValueError)
+        gc.collect()
+        self.assertEqual([], self.flushLoggedErrors())
@@ -0,0 +1,56 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for L{txaws.s3.model}.
+"""
+
+from twisted.trial.unittest import TestCase
+
+from txaws.s3.model import BucketColumns
+
+
+class BucketColumnsTestCase(TestCase):
+    """
+    Tests for L{BucketColumns}.
+    """
+    def columns(self, *items):
+        columns = BucketColumns()
+        for item in items:
+            columns.append(*item)
+        return columns
+
+    def test_append(self):
+        """
+        L{BucketColumns.append} adds the key and ETag of an item to the
+        joined buffers, and its size and modification time to the arrays.
+        """
+        columns = self.columns(
+            ("caf\N{LATIN SMALL LETTER E WITH ACUTE}", 1136116800, '"a"', 5),
+            ("neo", 1136116801, '"bc"', 4),
+        )
+        self.assertEqual(2, len(columns))
+        self.assertEqual(b"caf\xc3\xa9neo", columns.keys)
+        self.assertEqual([0, 5, 8], list(columns.key_offsets))
+        self.assertEqual(
+            "caf\N{LATIN SMALL LETTER E WITH ACUTE}", columns.key(0),
+        )
+        self.assertEqual('"bc"', columns.etag(1))
+        self.assertEqual([5, 4], list(columns.sizes))
+        self.assertEqual(
+            [1136116800, 1136116801], list(columns.modification_times),
+        )
+
+    def test_extend(self):
+        """
+        L{BucketColumns.extend} adds the items of another L{BucketColumns}
+        after those already there.
+        """
+        columns = self.columns(("a", 1, '"x"', 1))
+        columns.extend(self.columns(("bb", 2, '"yy"', 2), ("c", 3, '"z"', 3)))
+        self.assertEqual(
+            self.columns(
+                ("a", 1, '"x"', 1), ("bb", 2, '"yy"', 2), ("c", 3, '"z"', 3),
+            ),
+            columns,
+        )
+        self.assertEqual(["a", "bb", "c"], list(columns.iter_keys()))
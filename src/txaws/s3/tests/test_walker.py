@@ -0,0 +1,175 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Tests for L{txaws.s3.walker}.
+"""
+
+from twisted.internet.defer import Deferred
+from twisted.trial.unittest import TestCase
+
+from txaws.s3.exception import S3Error
+from txaws.s3.walker import BucketWalker
+from txaws.testing.integration import get_memory_service
+
+
+class RecordingClient(object):
+    """
+    An S3 client double which records the I{ListObjectsV2} requests made to
+    it and passes them on to another client, or holds them until told to go
+    on with them.
+    """
+    def __init__(self, client, hold=False):
+        self.client = client
+        self.hold = hold
+        self.requests = []
+        self.held = []
+
+    def list_objects_v2(self, bucket, **kwargs):
+        self.requests.append((kwargs["prefix"], kwargs["delimiter"]))
+        if not self.hold:
+            return self.client.list_objects_v2(bucket, **kwargs)
+        d = Deferred()
+        self.held.append((d, bucket, kwargs))
+        return d
+
+    def release(self):
+        d, bucket, kwargs = self.held.pop(0)
+        self.client.list_objects_v2(bucket, **kwargs).chainDeferred(d)
+
+
+class BucketWalkerTestCase(TestCase):
+    """
+    Tests for L{BucketWalker}.
+    """
+    keys = ["a", "b/c", "b/d/e", "b/d/f", "b/g/h", "i/j", "k/l"]
+
+    def setUp(self):
+        s3 = get_memory_service(self).get_s3_client()
+        self.successResultOf(s3.create_bucket("bucket"))
+        for key in self.keys:
+            self.successResultOf(s3.put_object("bucket", key, b"x"))
+        self.client = RecordingClient(s3)
+        self.pages = []
+
+    def visit(self, contents):
+        self.pages.append(list(item.key for item in contents))
+
+    def keys_visited(self):
+        return sorted(key for page in self.pages for key in page)
+
+    def test_walk(self):
+        """
+        L{BucketWalker.walk} visits all the objects in the bucket, listing
+        each common prefix of the bucket without a delimiter.
+        """
+        walker = BucketWalker(self.client)
+        self.assertIs(
+            None, self.successResultOf(walker.walk("bucket", self.visit)),
+        )
+        self.assertEqual(self.keys, self.keys_visited())
+        self.assertEqual(
+            [("", "/"), ("b/", None), ("i/", None), ("k/", None)],
+            self.client.requests,
+        )
+
+    def test_depth(self):
+        """
+        The bucket is split at as many levels of delimiters as the walker's
+        C{depth}, under the prefix walked.
+        """
+        walker = BucketWalker(self.client, depth=2)
+        self.successResultOf(walker.walk("bucket", self.visit, prefix="b/"))
+        self.assertEqual(self.keys[1:5], self.keys_visited())
+        self.assertEqual(
+            [("b/", "/"), ("b/d/", "/"), ("b/g/", "/")],
+            self.client.requests,
+        )
+
+    def test_pages(self):
+        """
+        Truncated listings are continued, with or without a delimiter.
+        """
+        list_objects_v2 = self.client.client.list_objects_v2
+        self.patch(
+            self.client.client, "list_objects_v2",
+            lambda bucket, **kwargs: list_objects_v2(
+                bucket, max_keys=1, **kwargs
+            ),
+        )
+        walker = BucketWalker(self.client)
+        self.successResultOf(walker.walk("bucket", self.visit))
+        self.assertEqual(self.keys, self.keys_visited())
+        self.assertEqual(
+            [("", "/")] * 4 + [("b/", None)] * 4 +
+            [("i/", None), ("k/", None)],
+            sorted(self.client.requests),
+        )
+
+    def test_many_pages(self):
+        """
+        Prefixes of many pages are walked, even though the pages of the
+        in-memory client are all available at once.
+        """
+        s3 = self.client.client
+        keys = ["p/{:04d}".format(n) for n in range(2000)]
+        for key in keys:
+            self.successResultOf(s3.put_object("bucket", key, b"x"))
+        list_objects_v2 = s3.list_objects_v2
+        self.patch(
+            s3, "list_objects_v2",
+            lambda bucket, **kwargs: list_objects_v2(
+                bucket, max_keys=1, **kwargs
+            ),
+        )
+        walker = BucketWalker(self.client, depth=0)
+        self.successResultOf(walker.walk("bucket", self.visit, prefix="p/"))
+        self.assertEqual(keys, self.keys_visited())
+        self.assertEqual(2000, len(self.client.requests))
+
+    def test_concurrency(self):
+        """
+        No more than C{concurrency} listing requests are in progress at once.
+        """
+        self.client.hold = True
+        walker = BucketWalker(self.client, concurrency=2)
+        d = walker.walk("bucket", self.visit)
+        self.client.release()
+        self.assertEqual(3, len(self.client.requests))
+        self.assertEqual(2, len(self.client.held))
+        self.client.release()
+        self.assertEqual(2, len(self.client.held))
+        self.client.release()
+        self.client.release()
+        self.assertEqual(self.keys, self.keys_visited())
+        self.assertIs(None, self.successResultOf(d))
+
+    def test_columns(self):
+        """
+        With C{columns}, the objects are listed as L{BucketColumns}.
+        """
+        walker = BucketWalker(self.client, columns=True)
+        keys = []
+        self.successResultOf(walker.walk(
+            "bucket", lambda contents: keys.extend(contents.iter_keys()),
+        ))
+        self.assertEqual(self.keys, sorted(keys))
+
+    def test_failure(self):
+        """
+        If a listing request fails, no more are made, and the walk fails
+        once those in progress are done.
+        """
+        self.client.hold = True
+        walker = BucketWalker(self.client, concurrency=2)
+        d = walker.walk("bucket", self.visit)
+        self.client.release()
+        error = S3Error("<slowdown/>", 400)
+        self.client.held.pop(0)[0].errback(error)
+        self.assertNoResult(d)
+        self.client.release()
+        self.assertEqual([], self.client.held)
+        self.assertEqual(
+            [("", "/"), ("b/", None), ("i/", None)], self.client.requests,
+        )
+        self.assertIs(error, self.failureResultOf(d, S3Error).value)
+        self.assertEqual([["a"]], self.pages)
@@ -0,0 +1,173 @@
+# Licenced under the txaws licence available at /LICENSE in the txaws source.
+
+"""
+Listing whole buckets with many concurrent requests.
+"""
+
+__all__ = [
+    "BucketWalker",
+]
+
+from collections import deque
+
+import attr
+
+from twisted.internet.defer import Deferred, maybeDeferred
+
+
+@attr.s
+class BucketWalker(object):
+    """
+    List all the objects in a bucket, or under a prefix, by splitting the
+    key space into the common prefixes found with a delimiter and listing
+    them concurrently with I{ListObjectsV2}.
+
+    The prefix being walked is listed with the delimiter, which gives the
+    keys directly under it and the common prefixes under which the other
+    keys are.  Each of these is then listed in the same way, down to
+    C{depth} levels of delimiters, past which the prefixes are listed
+    without one, a page after the other.  The pages of all the prefixes
+    are requested concurrently, no more than C{concurrency} at a time.
+
+    @ivar client: The L{txaws.s3.client.S3Client} to list the objects with.
+
+    @ivar delimiter: The delimiter to find the prefixes to list
+        concurrently with.
+    @type delimiter: L{unicode}
+
+    @ivar depth: The number of levels of delimiters to split the listing
+        at.
+    @type depth: L{int}
+
+    @ivar concurrency: The maximum number of listing requests in progress
+        at once.
+    @type concurrency: L{int}
+
+    @ivar columns: Whether to list the objects as
+        L{txaws.s3.model.BucketColumns} rather than L{list}s of
+        L{txaws.s3.model.BucketItem}.
+    @type columns: L{bool}
+    """
+    client = attr.ib()
+    delimiter = attr.ib(default="/")
+    depth = attr.ib(default=1)
+    concurrency = attr.ib(default=8)
+    columns = attr.ib(default=False)
+
+    def walk(self, bucket, visit, prefix=""):
+        """
+        List the objects in a bucket.
+
+        @param bucket: The name of the bucket.
+        @type bucket: L{unicode}
+
+        @param visit: A callable which is called with the contents of each
+            page of the listing as it's received.  Pages of different
+            prefixes are received in no particular order.
+
+        @param prefix: The prefix of the keys of the objects to list.
+        @type prefix: L{unicode}
+
+        @return: A L{Deferred} that fires with L{None} once all the objects
+            have been visited, or with the L{Failure} of the first request
+            or visit to fail, once the requests already in progress are
+            done.
+        """
+        walk = _Walk(self, bucket, visit)
+        walk.list_prefix(prefix, self.depth, None)
+        return walk.done
+
+
+@attr.s
+class _Walk(object):
+    """
+    The state of one L{BucketWalker.walk}.
+
+    The pages to list are queued and requested from a loop, rather than
+    from the callbacks of the requests before them, so that the stack
+    doesn't grow with the number of pages when the client's L{Deferred}s
+    fire synchronously.
+
+    @ivar queue: The prefix, depth and continuation token of each page
+        waiting to be listed.
+
+    @ivar active: The number of listing requests in progress.
+
+    @ivar failure: The first L{Failure} to list or visit the objects, if
+        any.
+    """
+    walker = attr.ib()
+    bucket = attr.ib()
+    visit = attr.ib()
+
+    done = attr.ib(default=attr.Factory(Deferred), init=False)
+    queue = attr.ib(default=attr.Factory(deque), init=False)
+    active = attr.ib(default=0, init=False)
+    failure = attr.ib(default=None, init=False)
+    _pumping = attr.ib(default=False, init=False)
+
+    def list_prefix(self, prefix, depth, continuation_token):
+        """
+        List a page of the objects under a prefix, and then the rest of
+        them.
+        """
+        self.queue.append((prefix, depth, continuation_token))
+        self._pump()
+
+    def _pump(self):
+        """
+        Request the queued pages, as long as fewer than C{concurrency}
+        requests are in progress, and fire C{done} once there's nothing
+        left to do.
+        """
+        if self._pumping:
+            # The loop below will pick the new work up.
+            return
+        self._pumping = True
+        try:
+            while (self.queue and self.failure is None and
+                   self.active < self.walker.concurrency):
+                self.active += 1
+                d = self._list(*self.queue.popleft())
+                d.addBoth(self._request_done)
+        finally:
+            self._pumping = False
+        if self.active == 0 and not self.done.called:
+            if self.failure is not None:
+                self.done.errback(self.failure)
+            elif not self.queue:
+                self.done.callback(None)
+
+    def _list(self, prefix, depth, continuation_token):
+        if depth > 0:
+            delimiter = self.walker.delimiter
+        else:
+            delimiter = None
+        d = maybeDeferred(
+            self.walker.client.list_objects_v2,
+            self.bucket, prefix=prefix, delimiter=delimiter,
+            continuation_token=continuation_token,
+            columns=self.walker.columns,
+        )
+        d.addCallback(self._listed, prefix, depth)
+        d.addErrback(self._failed)
+        return d
+
+    def _listed(self, listing, prefix, depth):
+        if self.failure is not None:
+            return
+        self.visit(listing.contents)
+        if listing.is_truncated == "true":
+            self.queue.append(
+                (prefix, depth, listing.next_continuation_token),
+            )
+        for common_prefix in listing.common_prefixes:
+            self.queue.append((common_prefix, depth - 1, None))
+
+    def _failed(self, reason):
+        if self.failure is None:
+            self.failure = reason
+
+    def _request_done(self, ignored):
+        self.active -= 1
+        self._pump()
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+
+class ResultCache(object):
+    """Cache the results of idempotent API L{Method}s.
+
+    Entries are keyed by tuples whose second element is the action name, so
+    that all the cached results of an action can be dropped at once when a
+    mutating action invalidates them.
+
+    @param max_size: The maximum number of entries to keep, once it's reached
+        expired entries are purged and then the oldest ones are evicted.
+    @param clock: The L{IReactorTime} provider used to expire entries,
+        defaults to the global reactor.
+    """
+
+    def __init__(self, max_size=1000, clock=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._by_action = {}
+
+    def get(self, key):
+        """Return the value cached for the given key.
+
+        @raises KeyError: If there's no entry for C{key} or it has expired.
+        """
+        expires, value = self._entries[key]
+        if expires <= self._clock.seconds():
+            self._remove(key)
+            raise KeyError(key)
+        return value
+
+    def set(self, key, value, ttl):
+        """Cache a value for the given key.
+
+        @param ttl: The number of seconds the value will be valid for.
+        """
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (self._clock.seconds() + ttl, value)
+        self._by_action.setdefault(key[1], set()).add(key)
+        if len(self._entries) > self.max_size:
+            self._evict()
+
+    def invalidate(self, action):
+        """Drop all the cached results of the given action."""
+        for key in self._by_action.pop(action, ()):
+            del self._entries[key]
+
+    def clear(self):
+        """Drop all the cached results."""
+        self._entries.clear()
+        self._by_action.clear()
+
+    def _remove(self, key):
+        del self._entries[key]
+        keys = self._by_action[key[1]]
+        keys.discard(key)
+        if not keys:
+            del self._by_action[key[1]]
+
+    def _evict(self):
+        now = self._clock.seconds()
+        for key, (expires, value) in list(self._entries.items()):
+            if expires <= now:
+                self._remove(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
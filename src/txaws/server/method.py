@@ -36,9 +36,25 @@ class Method(object):
         the class name will be used as only supported action.
     @cvar versions: List of versions that the Method can handle, if C{None}
         all versions will be supported.
+    @cvar cache_ttl: If not C{None}, the number of seconds the results of
+        this method can be served from the L{QueryAPI} result cache for,
+        without invoking it again. Only set this for read-only methods, with
+        a C{schema}, since the cache is keyed on the parsed arguments.
+    @cvar invalidates: List of actions whose cached results must be dropped
+        after this method has been successfully invoked, typically set by
+        methods mutating the state that those actions describe.
+    @cvar stateless: If C{True} the method keeps no per-request state, and
+        L{QueryAPI} can use a single instance of it for all the requests.
+    @cvar schema: If not C{None}, the L{Schema} that L{QueryAPI} parses the
+        L{Call} parameters with before invoking the method, so that
+        C{call.args} is already set in L{invoke}.
     """
     actions = None
     versions = None
+    cache_ttl = None
+    schema = None
+    invalidates = None
+    stateless = False
 
     def invoke(self, call):
         """Invoke this method for executing the given C{call}."""
@@ -6,6 +6,7 @@ class Registry(object):
 
     def __init__(self):
         self._by_action = {}
+        self._dispatch = None
 
     def add(self, method_class, action, version=None):
         """Add a method class to the regitry.
@@ -19,6 +20,33 @@ class Registry(object):
             raise RuntimeError("A method was already registered for action"
                                " %s in version %s" % (action, version))
         by_version[version] = method_class
+        self._dispatch = None
+
+    def _get_dispatch(self):
+        """Return the table mapping C{(action, version)} to method classes.
+
+        The table is built on first use after the registry changes. It maps
+        C{(action, None)} to the catch-all method of an action and every
+        version-specific key to its method class, so a lookup never needs
+        more than two dictionary accesses.
+        """
+        if self._dispatch is None:
+            self._dispatch = dict(
+                ((action, version), method_class)
+                for action, by_version in self._by_action.items()
+                for version, method_class in by_version.items())
+        return self._dispatch
+
+    def _lookup(self, action, version):
+        """
+        Return the method class handling the given action and version, or
+        C{None} if there's none.
+        """
+        dispatch = self._get_dispatch()
+        method_class = dispatch.get((action, version))
+        if method_class is None:
+            method_class = dispatch.get((action, None))
+        return method_class
 
     def check(self, action, version=None):
         """Check if the given action is supported in the given version.
@@ -26,22 +54,18 @@ class Registry(object):
         @raises APIError: If there's no method class registered for handling
             the given action or version.
         """
-        if action not in self._by_action:
-            raise APIError(400, "InvalidAction", "The action %s is not valid "
-                           "for this web service." % action)
-        by_version = self._by_action[action]
-        if None not in by_version:
-            # There's no catch-all method, let's try the version-specific one
-            if version not in by_version:
-                raise APIError(400, "InvalidVersion", "Invalid API version.")
+        if self._lookup(action, version) is None:
+            if action not in self._by_action:
+                raise APIError(400, "InvalidAction", "The action %s is not "
+                               "valid for this web service." % action)
+            raise APIError(400, "InvalidVersion", "Invalid API version.")
 
     def get(self, action, version=None):
         """Get the method class handing the given action and version."""
-        by_version = self._by_action[action]
-        if version in by_version:
-            return by_version[version]
-        else:
-            return by_version[None]
+        method_class = self._lookup(action, version)
+        if method_class is None:
+            raise KeyError((action, version))
+        return method_class
 
     def scan(self, module, onerror=None, ignore=None):
         """Scan the given module object for L{Method}s and register them."""
@@ -52,6 +76,7 @@ class Registry(object):
             # Only pass it if specified, for backward compatibility
             kwargs["ignore"] = ignore
         scanner.scan(module, **kwargs)
+        self._get_dispatch()
 
     def get_actions(self):
         """
@@ -1,22 +1,113 @@
 from datetime import datetime, timedelta
+from hashlib import sha256
+from hmac import compare_digest
 from uuid import uuid4
 from dateutil.tz import tzutc
 
+from zope.interface import implementer
+
 from twisted.python import log
 from twisted.python.reflect import safe_str
-from twisted.internet.defer import maybeDeferred
+from twisted.internet import task
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.web.iweb import IBodyProducer, UNKNOWN_LENGTH
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
+from txaws import _auth_v4
 from txaws.ec2.client import Signature
 from txaws.service import AWSServiceEndpoint
 from txaws.credentials import AWSCredentials
 from txaws.server.schema import (
-    Schema, Unicode, Integer, RawStr, Date)
+    Schema, Unicode, Integer, RawStr, Date, Arguments)
 from txaws.server.exception import APIError
 from txaws.server.call import Call
 
 
+def _get_str_header(request, name):
+    """Return the value of a request header as a native string, if set."""
+    value = request.getHeader(name)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return value
+
+
+def _freeze(value):
+    """Turn parsed L{Arguments} into a hashable value, for cache keys."""
+    if isinstance(value, Arguments):
+        return tuple(sorted((name, _freeze(item)) for name, item in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+@implementer(IBodyProducer)
+class _IteratorProducer(object):
+    """Write the chunks yielded by an iterator to a consumer.
+
+    The iteration is driven by a L{Cooperator}, so that a large response
+    doesn't monopolize the reactor, and it's paused and resumed following
+    the flow-control notifications of the consumer it's registered with.
+
+    @param iterator: An iterable yielding the chunks of the response body.
+    @param cooperator: The L{Cooperator} to schedule writes with.
+    """
+    length = UNKNOWN_LENGTH
+
+    def __init__(self, iterator, cooperator=task):
+        self._iterator = iter(iterator)
+        self._cooperate = cooperator.cooperate
+        self._task = None
+
+    def startProducing(self, consumer):
+        """
+        Start writing chunks to C{consumer}, returning a L{Deferred} firing
+        once the iterator is exhausted.
+        """
+        self._task = self._cooperate(self._writeloop(consumer))
+        deferred = self._task.whenDone()
+
+        def maybe_stopped(reason):
+            # Like IBodyProducer.startProducing, never fire if stopped.
+            reason.trap(task.TaskStopped)
+            return Deferred()
+
+        deferred.addCallbacks(lambda ignored: None, maybe_stopped)
+        return deferred
+
+    def _writeloop(self, consumer):
+        for chunk in self._iterator:
+            consumer.write(chunk)
+            yield None
+
+    def pauseProducing(self):
+        # Nothing to pause before the writes start or once they're done.
+        if self._task is not None:
+            try:
+                self._task.pause()
+            except task.TaskDone:
+                pass
+
+    def resumeProducing(self):
+        if self._task is not None:
+            try:
+                self._task.resume()
+            except (task.TaskDone, task.NotPaused):
+                pass
+
+    def stopProducing(self):
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+        if self._task is not None:
+            try:
+                self._task.stop()
+            except task.TaskDone:
+                pass
+
+
 class QueryAPI(Resource):
     """Base class for  EC2-like query APIs.
 
@@ -29,14 +120,24 @@ class QueryAPI(Resource):
         proxy, like Apache. For this works to work you have to make sure
         that 'path + path_of_the_rewritten_request' equals the resource
         path that clients are sending the request to.
+    @param cache: Optionally, a L{ResultCache} to serve the results of
+        L{Method}s with a C{cache_ttl} from.
 
     The following class variables must be defined by sub-classes:
 
     @ivar signature_versions: A list of allowed values for 'SignatureVersion'.
+        Include C{4} to accept requests carrying an C{AWS4-HMAC-SHA256}
+        'Authorization' header.
+    @cvar v4_regions: The region names that version 4 credential scopes
+        are accepted for.
+    @cvar v4_services: The service names that version 4 credential scopes
+        are accepted for.
     @cvar content_type: The content type to set the 'Content-Type' header to.
     """
     isLeaf = True
     time_format = "%Y-%m-%dT%H:%M:%SZ"
+    v4_regions = ()
+    v4_services = ()
 
     schema = Schema(
         Unicode("Action"),
@@ -49,19 +150,33 @@ class QueryAPI(Resource):
         Unicode("Signature"),
         Integer("SignatureVersion", optional=True, default=2))
 
-    def __init__(self, registry=None, path=None):
+    v4_schema = Schema(
+        Unicode("Action"),
+        RawStr("Version", optional=True))
+
+    def __init__(self, registry=None, path=None, cache=None):
         Resource.__init__(self)
         self.path = path
         self.registry = registry
+        self.cache = cache
+        self._methods = {}
 
     def get_method(self, call, *args, **kwargs):
         """Return the L{Method} instance to invoke for the given L{Call}.
 
+        Instances of L{Method}s flagged as C{stateless} are created once and
+        reused for all the calls not passing constructor arguments.
+
         @param args: Positional arguments to pass to the method constructor.
         @param kwargs: Keyword arguments to pass to the method constructor.
         """
         method_class = self.registry.get(call.action, call.version)
-        method = method_class(*args, **kwargs)
+        if method_class.stateless and not (args or kwargs):
+            method = self._methods.get(method_class)
+            if method is None:
+                method = self._methods[method_class] = method_class()
+        else:
+            method = method_class(*args, **kwargs)
         if not method.is_available():
             raise APIError(400, "InvalidAction", "The action %s is not "
                            "valid for this web service." % call.action)
@@ -92,10 +207,12 @@ class QueryAPI(Resource):
         deferred.addCallback(self.execute)
 
         def write_response(response):
-            request.setHeader("Content-Length", str(len(response)))
             request.setHeader("Content-Type", self.content_type)
             # Prevent browsers from trying to guess a different content type.
             request.setHeader("X-Content-Type-Options", "nosniff")
+            if not isinstance(response, (str, bytes)):
+                return self._stream_response(request, response)
+            request.setHeader("Content-Length", str(len(response)))
             request.write(response)
             request.finish()
             return response
@@ -129,6 +246,44 @@ class QueryAPI(Resource):
         deferred.addErrback(write_error)
         return deferred
 
+    def _stream_response(self, request, response):
+        """Stream a response body which isn't available as a single string.
+
+        No C{Content-Length} header is set unless the producer knows its
+        length, so the body is sent with chunked transfer-encoding.  The
+        producer is registered as a streaming one, and it gets paused when
+        the transport can't keep up with it.
+
+        @param request: The request to write the response to.
+        @param response: An L{IBodyProducer} provider, or an iterable of
+            chunks to write.
+        @return: A L{Deferred} firing with C{response} once it's been fully
+            written.
+        """
+        if IBodyProducer.providedBy(response):
+            producer = response
+        else:
+            producer = _IteratorProducer(response)
+        if producer.length is not UNKNOWN_LENGTH:
+            request.setHeader("Content-Length", str(producer.length))
+        request.registerProducer(producer, True)
+        deferred = producer.startProducing(request)
+
+        def done(ignored):
+            request.unregisterProducer()
+            request.finish()
+            return response
+
+        def failed(failure):
+            # The response status and some of the body are already gone, so
+            # the best we can do is dropping the connection to let the client
+            # know the response is incomplete.
+            log.err(failure)
+            request.unregisterProducer()
+            request.loseConnection()
+
+        return deferred.addCallbacks(done, failed)
+
     def dump_error(self, error, request):
         """Serialize an error generating the response to send to the client.
 
@@ -141,6 +296,9 @@ class QueryAPI(Resource):
         """Serialize the result of the method invokation.
 
         @param result: The L{Method} result to serialize.
+        @return: The response body, either as a string or, for large results
+            which are better not fully built in memory, as an iterable of
+            chunks or an L{IBodyProducer} to stream it from.
         """
         return result
 
@@ -159,8 +317,52 @@ class QueryAPI(Resource):
         """
         method = self.get_method(call)
         deferred = maybeDeferred(self.authorize, method, call)
-        deferred.addCallback(lambda _: method.invoke(call))
-        return deferred.addCallback(self.dump_result)
+        deferred.addCallback(lambda _: self._invoke(method, call))
+        return deferred
+
+    def get_cache_key(self, call):
+        """Return the key to cache the result of the given L{Call} with.
+
+        The key is made of the principal's access key, the action, the
+        version and the arguments parsed from the call parameters, so cached
+        results are never shared across principals, and parameters spelled
+        differently but parsing to the same arguments share a result.
+        """
+        return (call.principal.access_key, call.action, call.version,
+                _freeze(call.args))
+
+    def _invoke(self, method, call):
+        """Invoke a L{Method} and serialize its result, going through the
+        result cache if any.
+
+        Only results which L{dump_result} serializes to a string are cached,
+        since iterators and producers can be written out only once.
+        """
+        if method.schema is not None:
+            call.parse(method.schema)
+        cacheable = (self.cache is not None and
+                     method.cache_ttl is not None and
+                     method.schema is not None)
+        if cacheable:
+            key = self.get_cache_key(call)
+            try:
+                return self.cache.get(key)
+            except KeyError:
+                pass
+
+        deferred = maybeDeferred(method.invoke, call)
+        deferred.addCallback(self.dump_result)
+        if self.cache is None:
+            return deferred
+
+        def cache_result(response):
+            if cacheable and isinstance(response, (str, bytes)):
+                self.cache.set(key, response, method.cache_ttl)
+            for action in method.invalidates or ():
+                self.cache.invalidate(action)
+            return response
+
+        return deferred.addCallback(cache_result)
 
     def get_utc_time(self):
         """Return a C{datetime} object with the current time in UTC."""
@@ -193,8 +395,16 @@ class QueryAPI(Resource):
         signature verification. This should be the same dictionary of data that
         the client used to sign the request. Note that this data must not
         contain the signature itself.
+
+        Requests authenticated with an AWS version 4 'Authorization' header
+        get a 'signature_version' of C{4}, and the 'credential',
+        'signed_headers' and 'amz_date' needed to verify the signature.
         """
         params = dict((k, v[-1]) for k, v in list(request.args.items()))
+        authorization = _get_str_header(request, "Authorization")
+        if authorization is not None and authorization.startswith(
+                _auth_v4._SignableAWS4HMAC256Token.ALGORITHM + " "):
+            return self._get_v4_call_arguments(request, authorization, params)
         args, rest = self.schema.extract(params)
         # Get rid of Signature so it doesn't mess with signature verification
         params.pop("Signature")
@@ -213,6 +423,47 @@ class QueryAPI(Resource):
         }
         return result
 
+    def _get_v4_call_arguments(self, request, authorization, params):
+        """
+        Get call arguments from a request authenticated with an AWS version
+        4 'Authorization' header.
+        """
+        try:
+            credential, signed_headers, signature = (
+                _auth_v4._parse_authorization_header(authorization))
+        except ValueError:
+            raise APIError(400, "IncompleteSignature",
+                           "The Authorization header is malformed.")
+        amz_date = _get_str_header(request, "X-Amz-Date")
+        try:
+            timestamp = datetime.strptime(
+                amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=tzutc())
+        except (TypeError, ValueError):
+            raise APIError(400, "IncompleteSignature",
+                           "The X-Amz-Date header is missing or malformed.")
+        if amz_date[:8] != credential.credential_scope.date_stamp:
+            raise APIError(403, "SignatureDoesNotMatch",
+                           "The credential scope date does not match the "
+                           "X-Amz-Date header.")
+        args, rest = self.v4_schema.extract(params)
+        return {
+            "transport_args": {
+                "action": args.Action,
+                "access_key_id": credential.access_key,
+                "timestamp": timestamp,
+                "expires": None,
+                "version": args.Version,
+                "signature_method":
+                    _auth_v4._SignableAWS4HMAC256Token.ALGORITHM,
+                "signature": signature,
+                "signature_version": 4,
+                "credential": credential,
+                "signed_headers": signed_headers,
+                "amz_date": amz_date},
+            "handler_args": rest,
+            "raw_args": params
+        }
+
     def _validate(self, request):
         """Validate an L{HTTPRequest} before executing it.
 
@@ -298,6 +549,8 @@ class QueryAPI(Resource):
 
     def _validate_signature(self, request, principal, args, params):
         """Validate the signature."""
+        if args["signature_version"] == 4:
+            return self._validate_v4_signature(request, principal, args)
         creds = AWSCredentials(principal.access_key, principal.secret_key)
         endpoint = AWSServiceEndpoint()
         endpoint.set_method(request.method)
@@ -316,6 +569,82 @@ class QueryAPI(Resource):
                            "match the signature you provided. Check your "
                            "key and signing method.")
 
+    def _validate_v4_signature(self, request, principal, args):
+        """Validate an AWS version 4 signature.
+
+        The canonical request is rebuilt the same way the client builds it
+        for signing, and the signing key derived from the principal's secret
+        key is shared with the other requests in the same credential scope.
+
+        The credential scope must be for one of the C{v4_regions} and
+        C{v4_services}, and the signed headers must include C{host} and be
+        present in the request.
+        """
+        scope = args["credential"].credential_scope
+        if scope.region not in self.v4_regions:
+            raise APIError(403, "SignatureDoesNotMatch",
+                           "Credential should be scoped to a valid region, "
+                           "not '%s'." % (scope.region,))
+        if scope.service not in self.v4_services:
+            raise APIError(403, "SignatureDoesNotMatch",
+                           "Credential should be scoped to correct service, "
+                           "not '%s'." % (scope.service,))
+        headers_to_sign = args["signed_headers"].split(";")
+        if "host" not in headers_to_sign:
+            raise APIError(400, "IncompleteSignature",
+                           "The host header must be signed.")
+        headers = {}
+        for name in headers_to_sign:
+            value = _get_str_header(request, name)
+            if value is None:
+                raise APIError(400, "IncompleteSignature",
+                               "The signed header %s is missing from the "
+                               "request." % (name,))
+            headers[name.encode("ascii")] = value.encode("utf-8")
+
+        path = request.path
+        if self.path is not None:
+            path = "%s/%s" % (self.path.rstrip("/"), path.lstrip("/"))
+        uri = getattr(request, "uri", b"")
+        if isinstance(uri, bytes):
+            uri = uri.decode("ascii")
+        url = path + "?" + uri.partition("?")[2]
+
+        body = b""
+        content = getattr(request, "content", None)
+        if content is not None:
+            content.seek(0)
+            body = content.read()
+            content.seek(0)
+        body_hash = sha256(body).hexdigest()
+        payload_hash = _get_str_header(request, "X-Amz-Content-Sha256")
+        if payload_hash is None:
+            payload_hash = body_hash
+        elif payload_hash != body_hash and (
+                payload_hash != "UNSIGNED-PAYLOAD" or body):
+            raise APIError(400, "XAmzContentSHA256Mismatch",
+                           "The provided 'x-amz-content-sha256' header does "
+                           "not match what was computed.")
+
+        canonical_request = _auth_v4._CanonicalRequest.from_request_components(
+            method=request.method,
+            url=url,
+            headers=headers,
+            headers_to_sign=headers_to_sign,
+            payload_hash=payload_hash,
+        )
+        token = _auth_v4._SignableAWS4HMAC256Token(
+            args["amz_date"], scope, canonical_request)
+        signing_key = _auth_v4._get_cached_signature_key(
+            principal.secret_key, scope.date_stamp, scope.region,
+            scope.service)
+        if not compare_digest(token.signature(signing_key),
+                              args["signature"]):
+            raise APIError(403, "SignatureDoesNotMatch",
+                           "The request signature we calculated does not "
+                           "match the signature you provided. Check your "
+                           "key and signing method.")
+
     def get_status_text(self):
         """Get the text to return when a status check is made."""
         return "Query API Service"
@@ -466,7 +466,14 @@ class Structure(Parameter):
 
 
 class Arguments(object):
-    """Arguments parsed from a request."""
+    """Arguments parsed from a request.
+
+    Nested values are wrapped with L{Arguments}, or turned into lists for
+    C{dict}s with integer keys, only when they're first accessed, so that
+    handlers reading a few fields of a large request don't pay for
+    converting all of it.
+    """
+    __slots__ = ("_tree", "_wrapped")
 
     def __init__(self, tree):
         """Initialize a new L{Arguments} instance.
@@ -474,29 +481,42 @@ class Arguments(object):
         @param tree: The C{dict}-based structure of the L{Argument} instance
             to create.
         """
-        for key, value in tree.items():
-            self.__dict__[key] = self._wrap(value)
+        self._tree = dict(tree)
+        self._wrapped = {}
 
     def __str__(self):
-        return "Arguments(%s)" % (self.__dict__,)
+        return "Arguments(%s)" % (dict(self),)
 
     __repr__ = __str__
 
+    def __getattr__(self, name):
+        """Return the argument value with the given C{name}."""
+        if name in Arguments.__slots__:
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
     def __iter__(self):
         """Returns an iterator yielding C{(name, value)} tuples."""
-        return iter(self.__dict__.items())
+        return ((key, self[key]) for key in self._tree)
 
     def __getitem__(self, index):
         """Return the argument value with the given L{index}."""
-        return self.__dict__[index]
+        try:
+            return self._wrapped[index]
+        except KeyError:
+            value = self._wrapped[index] = self._wrap(self._tree[index])
+            return value
 
     def __len__(self):
         """Return the number of arguments."""
-        return len(self.__dict__)
+        return len(self._tree)
 
     def __contains__(self, key):
         """Return whether an argument with the given name is present."""
-        return key in self.__dict__
+        return key in self._tree
 
     def _wrap(self, value):
         """Wrap the given L{tree} with L{Arguments} as necessary.
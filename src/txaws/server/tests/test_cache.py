@@ -0,0 +1,78 @@
+from twisted.internet.task import Clock
+from twisted.trial.unittest import TestCase
+
+from txaws.server.cache import ResultCache
+
+
+class ResultCacheTestCase(TestCase):
+
+    def setUp(self):
+        super(ResultCacheTestCase, self).setUp()
+        self.clock = Clock()
+        self.cache = ResultCache(max_size=3, clock=self.clock)
+
+    def test_get(self):
+        """
+        L{ResultCache.get} returns the value set for a key.
+        """
+        self.cache.set(("access", "Describe", "1.0", ()), "data", 10)
+        self.assertEqual(
+            "data", self.cache.get(("access", "Describe", "1.0", ())))
+
+    def test_get_missing(self):
+        """
+        L{ResultCache.get} raises C{KeyError} for unknown keys.
+        """
+        self.assertRaises(
+            KeyError, self.cache.get, ("access", "Describe", "1.0", ()))
+
+    def test_get_expired(self):
+        """
+        L{ResultCache.get} raises C{KeyError} once the TTL of an entry has
+        elapsed.
+        """
+        key = ("access", "Describe", "1.0", ())
+        self.cache.set(key, "data", 10)
+        self.clock.advance(9)
+        self.assertEqual("data", self.cache.get(key))
+        self.clock.advance(1)
+        self.assertRaises(KeyError, self.cache.get, key)
+
+    def test_invalidate(self):
+        """
+        L{ResultCache.invalidate} drops all the entries of an action, leaving
+        the others alone.
+        """
+        self.cache.set(("a", "Describe", "1.0", ()), "a", 10)
+        self.cache.set(("b", "Describe", "1.0", ()), "b", 10)
+        self.cache.set(("a", "List", "1.0", ()), "list", 10)
+        self.cache.invalidate("Describe")
+        self.assertRaises(
+            KeyError, self.cache.get, ("a", "Describe", "1.0", ()))
+        self.assertRaises(
+            KeyError, self.cache.get, ("b", "Describe", "1.0", ()))
+        self.assertEqual("list", self.cache.get(("a", "List", "1.0", ())))
+
+    def test_max_size(self):
+        """
+        When more than C{max_size} entries are set, the oldest ones are
+        evicted.
+        """
+        for i in range(4):
+            self.cache.set(("a", "Describe", "1.0", i), i, 10)
+        self.assertRaises(
+            KeyError, self.cache.get, ("a", "Describe", "1.0", 0))
+        self.assertEqual(3, self.cache.get(("a", "Describe", "1.0", 3)))
+
+    def test_max_size_purges_expired(self):
+        """
+        Expired entries are purged before evicting live ones.
+        """
+        self.cache.set(("a", "Describe", "1.0", 0), 0, 10)
+        self.cache.set(("a", "Describe", "1.0", 1), 1, 1)
+        self.cache.set(("a", "Describe", "1.0", 2), 2, 10)
+        self.clock.advance(2)
+        self.cache.set(("a", "Describe", "1.0", 3), 3, 10)
+        self.assertEqual(0, self.cache.get(("a", "Describe", "1.0", 0)))
+        self.assertRaises(
+            KeyError, self.cache.get, ("a", "Describe", "1.0", 1))
@@ -90,6 +90,30 @@ class RegistryTestCase(TestCase):
         self.assertIdentical(TestMethod, self.registry.get("test", "2.0"))
         self.assertIdentical(TestMethod2, self.registry.get("test", "3.0"))
 
+    def test_get_with_catch_all(self):
+        """
+        L{MethodRegistry.get} falls back to the method registered for all
+        versions if there's none for the given version.
+        """
+
+        class TestMethod2(Method):
+            pass
+
+        self.registry.add(TestMethod, "test")
+        self.registry.add(TestMethod2, "test", "2.0")
+        self.registry.check("test", "1.0")
+        self.assertIdentical(TestMethod, self.registry.get("test", "1.0"))
+        self.assertIdentical(TestMethod2, self.registry.get("test", "2.0"))
+
+    def test_get_after_add(self):
+        """
+        Methods added after a lookup are visible to the following ones.
+        """
+        self.registry.add(TestMethod, "test", "1.0")
+        self.assertRaises(KeyError, self.registry.get, "test", "2.0")
+        self.registry.add(TestMethod, "test", "2.0")
+        self.assertIdentical(TestMethod, self.registry.get("test", "2.0"))
+
     def test_check_with_missing_action(self):
         """
         L{MethodRegistry.get} fails if the given action is not registered.
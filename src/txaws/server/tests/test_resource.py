@@ -10,15 +10,24 @@ except ImportError:
     import simplejson as json
 
 
+from zope.interface import implementer
+
+from twisted.internet.defer import succeed
+from twisted.internet.task import Clock, Cooperator
 from twisted.trial.unittest import TestCase
+from twisted.web.iweb import IBodyProducer
 from twisted.python.reflect import safe_str
 
+from txaws import _auth_v4
 from txaws.credentials import AWSCredentials
 from txaws.service import AWSServiceEndpoint
 from txaws.ec2.client import Query, Signature
 from txaws.server.method import Method
 from txaws.server.registry import Registry
-from txaws.server.resource import QueryAPI
+from txaws.server.cache import ResultCache
+from txaws.server.call import Call
+from txaws.server.resource import QueryAPI, _IteratorProducer
+from txaws.server.schema import Schema, Integer, Unicode
 from txaws.server.exception import APIError
 from txaws import version
 from txaws.util import iso8601time
@@ -31,7 +40,10 @@ class FakeRequest(object):
         self.endpoint = endpoint
         self.written = StringIO()
         self.finished = False
+        self.disconnected = False
         self.code = None
+        self.producer = None
+        self.streaming = None
         self.headers = {"Host": endpoint.get_canonical_host()}
 
     @property
@@ -58,11 +70,23 @@ class FakeRequest(object):
     def setResponseCode(self, code):
         self.code = code
 
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+        self.streaming = streaming
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def loseConnection(self):
+        self.disconnected = True
+
     def setHeader(self, key, value):
         self.headers[key] = value
 
     def getHeader(self, key):
-        return self.headers.get(key)
+        for name, value in self.headers.items():
+            if name.lower() == key.lower():
+                return value
 
     @property
     def response(self):
@@ -92,6 +116,8 @@ class TestPrincipal(object):
 class TestQueryAPI(QueryAPI):
 
     signature_versions = (1, 2)
+    v4_regions = ("us-east-1",)
+    v4_services = ("ec2",)
     content_type = "text/plain"
 
     def __init__(self, *args, **kwargs):
@@ -129,6 +155,38 @@ class AlternativeWireFormatQueryAPI(TestQueryAPI):
                 "raw_args": raw}
 
 
+def make_v4_request(creds, endpoint, params, instant=None, secret=None,
+                    region="us-east-1", service="ec2",
+                    headers_to_sign=("host", "x-amz-date")):
+    """
+    Make a L{FakeRequest} for the given parameters, signed with an AWS
+    version 4 'Authorization' header the way L{txaws.client.base} does.
+    """
+    if instant is None:
+        instant = datetime.utcnow()
+    amz_date = _auth_v4.makeAMZDate(instant)
+    query = "&".join("%s=%s" % item for item in sorted(params.items()))
+    canonical_request = _auth_v4._CanonicalRequest.from_request_components(
+        method=endpoint.method,
+        url=endpoint.path + "?" + query,
+        headers={b"host": endpoint.get_canonical_host().encode("ascii"),
+                 b"x-amz-date": amz_date.encode("ascii")},
+        headers_to_sign=headers_to_sign,
+        payload_hash=None,
+    )
+    if secret is not None:
+        creds = AWSCredentials(creds.access_key, secret)
+    request = FakeRequest(params, endpoint)
+    request.uri = endpoint.path + "?" + query
+    request.headers.update({
+        "X-Amz-Date": amz_date,
+        "X-Amz-Content-Sha256": "UNSIGNED-PAYLOAD",
+        "Authorization": _auth_v4._make_authorization_header(
+            region, service, canonical_request, creds, instant),
+    })
+    return request
+
+
 class QueryAPITestCase(TestCase):
 
     def setUp(self):
@@ -226,6 +284,272 @@ class QueryAPITestCase(TestCase):
         self.api.principal = TestPrincipal(creds)
         return self.api.handle(request).addCallback(check)
 
+    def test_handle_with_iterable_result(self):
+        """
+        If C{dump_result} returns an iterable, L{QueryAPI.handle} streams its
+        chunks using a streaming producer and no C{Content-Length} header.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        query = Query(action="SomeAction", creds=creds, endpoint=endpoint)
+        query.sign()
+        request = FakeRequest(query.params, endpoint)
+        producers = []
+
+        def registerProducer(producer, streaming):
+            producers.append((producer, streaming))
+            FakeRequest.registerProducer(request, producer, streaming)
+
+        def dump_result(result):
+            for chunk in ("<", result, ">"):
+                yield chunk
+
+        def check(ignored):
+            self.assertTrue(request.finished)
+            self.assertEqual("<data>", request.response)
+            self.assertNotIn("Content-Length", request.headers)
+            self.assertEqual("text/plain", request.headers["Content-Type"])
+            self.assertEqual(200, request.code)
+            [(producer, streaming)] = producers
+            self.assertTrue(streaming)
+            self.assertIdentical(None, request.producer)
+
+        request.registerProducer = registerProducer
+        self.api.dump_result = dump_result
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_body_producer_result(self):
+        """
+        If C{dump_result} returns an L{IBodyProducer}, L{QueryAPI.handle}
+        uses it to write the response, setting C{Content-Length} from its
+        length.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        query = Query(action="SomeAction", creds=creds, endpoint=endpoint)
+        query.sign()
+        request = FakeRequest(query.params, endpoint)
+
+        @implementer(IBodyProducer)
+        class Producer(object):
+            length = 4
+
+            def startProducing(self, consumer):
+                consumer.write("data")
+                return succeed(None)
+
+        def check(ignored):
+            self.assertTrue(request.finished)
+            self.assertEqual("data", request.response)
+            self.assertEqual("4", request.headers["Content-Length"])
+            self.assertIdentical(None, request.producer)
+
+        self.api.dump_result = lambda result: Producer()
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_failing_iterable_result(self):
+        """
+        If the iterable returned by C{dump_result} fails after the response
+        has started, the error is logged and the connection is dropped.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        query = Query(action="SomeAction", creds=creds, endpoint=endpoint)
+        query.sign()
+        request = FakeRequest(query.params, endpoint)
+
+        def dump_result(result):
+            yield result
+            1 / 0
+
+        def check(ignored):
+            errors = self.flushLoggedErrors(ZeroDivisionError)
+            self.assertEqual(1, len(errors))
+            self.assertEqual("data", request.response)
+            self.assertFalse(request.finished)
+            self.assertTrue(request.disconnected)
+
+        self.api.dump_result = dump_result
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_cached_result(self):
+        """
+        If a L{ResultCache} is set and the method has a C{cache_ttl}, the
+        result of a previous identical call is served without invoking the
+        method again.
+        """
+        invocations = []
+
+        class CachedMethod(Method):
+            cache_ttl = 60
+            schema = Schema(Unicode("Foo", optional=True))
+
+            def invoke(self, call):
+                invocations.append(call)
+                return "data%d" % len(invocations)
+
+        self.registry.add(CachedMethod, action="Describe")
+        self.api.cache = ResultCache(clock=Clock())
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        self.api.principal = TestPrincipal(creds)
+
+        def handle(ignored, other_params=None):
+            query = Query(action="Describe", creds=creds, endpoint=endpoint,
+                          other_params=other_params)
+            query.sign()
+            request = FakeRequest(query.params, endpoint)
+            return self.api.handle(request).addCallback(
+                lambda ignored: request.response)
+
+        deferred = handle(None)
+        deferred.addCallback(self.assertEqual, "data1")
+        deferred.addCallback(handle)
+        deferred.addCallback(self.assertEqual, "data1")
+        deferred.addCallback(handle, {"Foo": "bar"})
+        deferred.addCallback(self.assertEqual, "data2")
+        deferred.addCallback(lambda ignored: self.assertEqual(
+            2, len(invocations)))
+        return deferred
+
+    def test_handle_with_cached_result_normalized_arguments(self):
+        """
+        The result cache is keyed on the arguments parsed with the method's
+        C{schema}, so parameters spelled differently but parsing to the same
+        values share a cached result.
+        """
+        invocations = []
+
+        class CachedMethod(Method):
+            cache_ttl = 60
+            schema = Schema(Integer("Count"))
+
+            def invoke(self, call):
+                invocations.append(call.args.Count)
+                return "data%d" % len(invocations)
+
+        self.registry.add(CachedMethod, action="Describe")
+        self.api.cache = ResultCache(clock=Clock())
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        self.api.principal = TestPrincipal(creds)
+
+        def handle(ignored, count):
+            query = Query(action="Describe", creds=creds, endpoint=endpoint,
+                          other_params={"Count": count})
+            query.sign()
+            request = FakeRequest(query.params, endpoint)
+            return self.api.handle(request).addCallback(
+                lambda ignored: request.response)
+
+        deferred = handle(None, "5")
+        deferred.addCallback(handle, "05")
+        deferred.addCallback(self.assertEqual, "data1")
+        deferred.addCallback(lambda ignored: self.assertEqual(
+            [5], invocations))
+        return deferred
+
+    def test_handle_with_cached_method_streaming_result(self):
+        """
+        A result which L{QueryAPI.dump_result} doesn't serialize to a string
+        isn't cached, since it can only be written out once, and the method
+        is invoked again for each call.
+        """
+        invocations = []
+
+        class CachedMethod(Method):
+            cache_ttl = 60
+            schema = Schema()
+
+            def invoke(self, call):
+                invocations.append(call)
+                return iter(["chunk1", "chunk2"])
+
+        self.registry.add(CachedMethod, action="Describe")
+        self.api.cache = ResultCache(clock=Clock())
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        self.api.principal = TestPrincipal(creds)
+
+        def handle(ignored):
+            query = Query(action="Describe", creds=creds, endpoint=endpoint)
+            query.sign()
+            request = FakeRequest(query.params, endpoint)
+            return self.api.handle(request).addCallback(
+                lambda ignored: request.response)
+
+        deferred = handle(None)
+        deferred.addCallback(self.assertEqual, "chunk1chunk2")
+        deferred.addCallback(handle)
+        deferred.addCallback(self.assertEqual, "chunk1chunk2")
+        deferred.addCallback(lambda ignored: self.assertEqual(
+            2, len(invocations)))
+        return deferred
+
+    def test_handle_invalidates_cached_result(self):
+        """
+        A method listing actions in C{invalidates} drops their cached
+        results when it's invoked.
+        """
+        invocations = []
+
+        class CachedMethod(Method):
+            cache_ttl = 60
+            schema = Schema()
+
+            def invoke(self, call):
+                invocations.append(call)
+                return "data%d" % len(invocations)
+
+        class MutatingMethod(Method):
+            invalidates = ["Describe"]
+
+            def invoke(self, call):
+                return "ok"
+
+        self.registry.add(CachedMethod, action="Describe")
+        self.registry.add(MutatingMethod, action="Modify")
+        self.api.cache = ResultCache(clock=Clock())
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        self.api.principal = TestPrincipal(creds)
+
+        def handle(ignored, action):
+            query = Query(action=action, creds=creds, endpoint=endpoint)
+            query.sign()
+            request = FakeRequest(query.params, endpoint)
+            return self.api.handle(request).addCallback(
+                lambda ignored: request.response)
+
+        deferred = handle(None, "Describe")
+        deferred.addCallback(handle, "Describe")
+        deferred.addCallback(self.assertEqual, "data1")
+        deferred.addCallback(handle, "Modify")
+        deferred.addCallback(handle, "Describe")
+        deferred.addCallback(self.assertEqual, "data2")
+        return deferred
+
+    def test_get_method_stateless(self):
+        """
+        L{QueryAPI.get_method} reuses a single instance of methods flagged as
+        C{stateless}, and creates a new one for the others.
+        """
+
+        class StatelessMethod(Method):
+            stateless = True
+
+        self.registry.add(StatelessMethod, action="Stateless")
+        call = Call(action="Stateless")
+        method = self.api.get_method(call)
+        self.assertIsInstance(method, StatelessMethod)
+        self.assertIdentical(method, self.api.get_method(call))
+        call = Call(action="SomeAction")
+        self.assertNotIdentical(
+            self.api.get_method(call), self.api.get_method(call))
+
     def test_handle_with_deprecated_actions(self):
         """
         L{QueryAPI.handle} supports the legacy 'actions' attribute.
@@ -503,6 +827,183 @@ class QueryAPITestCase(TestCase):
         self.api.principal = TestPrincipal(creds)
         return self.api.handle(request).addCallback(check)
 
+    def test_handle_with_signature_version_4(self):
+        """
+        L{QueryAPI.handle} accepts requests authenticated with an AWS
+        version 4 'Authorization' header if C{4} is among the supported
+        signature versions.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(creds, endpoint, {"Action": "SomeAction"})
+
+        def check(ignored):
+            self.assertEqual("data", request.response)
+            self.assertEqual(200, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_wrong_signature(self):
+        """
+        L{QueryAPI.handle} rejects version 4 signatures made with the wrong
+        secret key.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(
+            creds, endpoint, {"Action": "SomeAction"}, secret="wrong")
+
+        def check(ignored):
+            self.assertTrue(
+                request.response.startswith("SignatureDoesNotMatch"))
+            self.assertEqual(403, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_tampered_params(self):
+        """
+        L{QueryAPI.handle} rejects version 4 signed requests whose query
+        string was altered after signing.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(
+            creds, endpoint, {"Action": "SomeAction", "Foo": "bar"})
+        request.uri = request.uri.replace("bar", "baz")
+
+        def check(ignored):
+            self.assertTrue(
+                request.response.startswith("SignatureDoesNotMatch"))
+            self.assertEqual(403, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_wrong_region(self):
+        """
+        L{QueryAPI.handle} rejects version 4 signatures whose credential
+        scope isn't for one of the C{v4_regions}.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(
+            creds, endpoint, {"Action": "SomeAction"}, region="eu-west-1")
+
+        def check(ignored):
+            self.assertEqual(
+                "SignatureDoesNotMatch - Credential should be scoped to a "
+                "valid region, not 'eu-west-1'.", request.response)
+            self.assertEqual(403, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_wrong_service(self):
+        """
+        L{QueryAPI.handle} rejects version 4 signatures whose credential
+        scope isn't for one of the C{v4_services}.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(
+            creds, endpoint, {"Action": "SomeAction"}, service="s3")
+
+        def check(ignored):
+            self.assertEqual(
+                "SignatureDoesNotMatch - Credential should be scoped to "
+                "correct service, not 's3'.", request.response)
+            self.assertEqual(403, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_unsigned_host(self):
+        """
+        L{QueryAPI.handle} rejects version 4 signatures which don't cover
+        the C{host} header.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(
+            creds, endpoint, {"Action": "SomeAction"},
+            headers_to_sign=("x-amz-date",))
+
+        def check(ignored):
+            self.assertEqual(
+                "IncompleteSignature - The host header must be signed.",
+                request.response)
+            self.assertEqual(400, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_missing_signed_header(self):
+        """
+        L{QueryAPI.handle} rejects version 4 signed requests lacking one of
+        the headers listed as signed.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(creds, endpoint, {"Action": "SomeAction"})
+        request.headers["Authorization"] = request.headers[
+            "Authorization"].replace(
+                "SignedHeaders=host;x-amz-date",
+                "SignedHeaders=host;x-amz-date;x-amz-target")
+
+        def check(ignored):
+            self.assertEqual(
+                "IncompleteSignature - The signed header x-amz-target is "
+                "missing from the request.", request.response)
+            self.assertEqual(400, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_signature_version_4_not_supported(self):
+        """
+        Version 4 signatures are rejected unless listed among the supported
+        signature versions.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(creds, endpoint, {"Action": "SomeAction"})
+
+        def check(ignored):
+            self.assertEqual("InvalidSignature - SignatureVersion '4' "
+                             "not supported", request.response)
+            self.assertEqual(403, request.code)
+
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
+    def test_handle_with_malformed_authorization(self):
+        """
+        A malformed version 4 'Authorization' header results in an
+        C{IncompleteSignature} error.
+        """
+        creds = AWSCredentials("access", "secret")
+        endpoint = AWSServiceEndpoint("http://uri")
+        request = make_v4_request(creds, endpoint, {"Action": "SomeAction"})
+        request.headers["Authorization"] = "AWS4-HMAC-SHA256 Credential=foo"
+
+        def check(ignored):
+            self.assertTrue(
+                request.response.startswith("IncompleteSignature"))
+            self.assertEqual(400, request.code)
+
+        self.api.signature_versions = (2, 4)
+        self.api.principal = TestPrincipal(creds)
+        return self.api.handle(request).addCallback(check)
+
     def test_handle_with_unsupported_action(self):
         """Only actions registered in the L{Registry} are supported."""
         creds = AWSCredentials("access", "secret")
@@ -774,3 +1275,63 @@ class QueryAPITestCase(TestCase):
         self.api.principal = TestPrincipal(creds)
         self.api.path = "/path/"
         return self.api.handle(request).addCallback(check)
+
+
+class IteratorProducerTestCase(TestCase):
+    """
+    Tests for L{_IteratorProducer}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.cooperator = Cooperator(
+            scheduler=lambda work: self.clock.callLater(0, work),
+        )
+        self.written = []
+        self.closed = []
+
+    def chunks(self):
+        try:
+            yield "chunk1"
+            yield "chunk2"
+        finally:
+            self.closed.append(True)
+
+    def write(self, data):
+        self.written.append(data)
+
+    def test_before_start(self):
+        """
+        Pausing and resuming a producer before it's started does nothing,
+        and stopping it only closes the iterator.
+        """
+        producer = _IteratorProducer(self.chunks(), self.cooperator)
+        producer.pauseProducing()
+        producer.resumeProducing()
+        d = producer.startProducing(self)
+        self.clock.advance(0)
+        self.clock.advance(0)
+        self.clock.advance(0)
+        self.assertIs(None, self.successResultOf(d))
+        self.assertEqual(["chunk1", "chunk2"], self.written)
+
+        chunks = self.chunks()
+        next(chunks)
+        producer = _IteratorProducer(chunks, self.cooperator)
+        producer.stopProducing()
+        self.assertEqual([True, True], self.closed)
+
+    def test_after_done(self):
+        """
+        Pausing, resuming and stopping a producer once all the chunks have
+        been written does nothing.
+        """
+        producer = _IteratorProducer(self.chunks(), self.cooperator)
+        d = producer.startProducing(self)
+        self.clock.advance(0)
+        self.clock.advance(0)
+        self.clock.advance(0)
+        self.assertIs(None, self.successResultOf(d))
+        producer.pauseProducing()
+        producer.resumeProducing()
+        producer.stopProducing()
+        self.assertEqual(["chunk1", "chunk2"], self.written)
@@ -15,7 +15,7 @@ class ArgumentsTestCase(TestCase):
     def test_instantiate_empty(self):
         """Creating an L{Arguments} object."""
         arguments = Arguments({})
-        self.assertEqual({}, arguments.__dict__)
+        self.assertEqual({}, dict(arguments))
 
     def test_instantiate_non_empty(self):
         """Creating an L{Arguments} object with some arguments."""
@@ -34,6 +34,11 @@ class ArgumentsTestCase(TestCase):
         self.assertEqual("b", arguments[2])
         self.assertEqual("bar", arguments["foo"])
 
+    def test_getattr_error(self):
+        """L{AttributeError} is raised when the argument is not found."""
+        arguments = Arguments({})
+        self.assertRaises(AttributeError, getattr, arguments, "foo")
+
     def test_getitem_error(self):
         """L{KeyError} is raised when the argument is not found."""
         arguments = Arguments({})
@@ -63,6 +68,29 @@ class ArgumentsTestCase(TestCase):
         arguments = Arguments({"foo": {1: "egg"}})
         self.assertEqual("egg", arguments.foo[0])
 
+    def test_nested_data_wrapped_once(self):
+        """
+        Nested values are wrapped on first access, and the same wrapped
+        value is returned afterwards.
+        """
+        arguments = Arguments({"foo": {"bar": "egg"}, "baz": {2: "b", 1: "a"}})
+        self.assertIdentical(arguments.foo, arguments["foo"])
+        self.assertEqual(["a", "b"], arguments.baz)
+        self.assertIdentical(arguments.baz, arguments.baz)
+
+    def test_nested_data_wrapped_lazily(self):
+        """
+        Nested values are only checked when accessed, so a malformed one
+        doesn't prevent reading the others.
+        """
+        arguments = Arguments({"foo": {1: "egg", "bar": "spam"}, "baz": 1})
+        self.assertEqual(1, arguments.baz)
+        self.assertRaises(RuntimeError, getattr, arguments, "foo")
+
+    def test_no_instance_dict(self):
+        """L{Arguments} instances don't carry a per-instance C{__dict__}."""
+        self.assertFalse(hasattr(Arguments({"foo": 1}), "__dict__"))
+
 
 class ParameterTestCase(TestCase):
 
@@ -5,7 +5,9 @@ An in-memory implementation of the Route53 client interface as an aid to
 unit testing.
 """
 
-from itertools import count
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import count, islice
 
 import attr
 
@@ -15,8 +17,11 @@ from twisted.internet.defer import succeed, fail
 from twisted.web.http import BAD_REQUEST, NOT_FOUND
 
 from txaws.testing.base import MemoryClient, MemoryService
-from txaws.route53.model import Name, RRSetKey, RRSet, SOA, NS, HostedZone, create_rrset
-from txaws.route53.client import Route53Error
+from txaws.route53.model import (
+    Name, RRSetKey, RRSet, SOA, NS, HostedZone, ChangeInfo, create_rrset,
+)
+from txaws.route53.client import Route53Error, RRSetStream
+from txaws.route53.zonefile import export_zone, import_zone
 
 
 class MemoryRoute53(MemoryService):
@@ -54,6 +59,14 @@ class Route53ClientState(object):
         instance and represent the rrsets belonging to the
         corresponding zone.
     @type rrsets: L{pyrsistent.PMap}
+
+    @ivar changes: A mapping from change identifiers to the L{ChangeInfo}
+        of the corresponding change batch.
+    @type changes: L{pyrsistent.PMap}
+
+    @ivar _indexes: A mapping from zone identifiers to the L{_RRSetIndex}
+        of their rrsets, built on first use.
+    @type _indexes: L{dict}
     """
     soa_records = {
         SOA(
@@ -73,9 +86,12 @@ class Route53ClientState(object):
     }
 
     _id = attr.ib(default=attr.Factory(count), init=False)
+    _change_id = attr.ib(default=attr.Factory(count), init=False)
+    _indexes = attr.ib(default=attr.Factory(dict), init=False)
 
     zones = attr.ib(default=pvector())
     rrsets = attr.ib(default=pmap())
+    changes = attr.ib(default=pmap())
     def next_id(self):
         """
         Assign and return a new, unique hosted zone identifier.
@@ -85,6 +101,22 @@ class Route53ClientState(object):
         return "/hostedzone/{:014d}".format(next(self._id))
 
 
+    def add_change(self):
+        """
+        Record a new change batch.  It is in sync right away since the
+        changes are applied immediately.
+
+        @rtype: L{ChangeInfo}
+        """
+        info = ChangeInfo(
+            identifier="C{:013d}".format(next(self._change_id)),
+            status="INSYNC",
+            submitted_at=datetime.now(timezone.utc),
+        )
+        self.changes = self.changes.set(info.identifier, info)
+        return info
+
+
     def get_rrsets(self, zone_id):
         """
         Retrieve all the rrsets that belong to the given zone.
@@ -101,7 +133,28 @@ class Route53ClientState(object):
         return None
 
 
-    def set_rrsets(self, zone_id, rrsets):
+    def get_index(self, zone_id):
+        """
+        Retrieve the rrsets that belong to the given zone in the order
+        AWS lists them.
+
+        @param zone_id: The zone to inspect.
+        @type zone_id: L{unicode}
+
+        @return: L{None} if the zone is not found.  Otherwise, an
+            L{_RRSetIndex} of the rrsets of the zone.
+        """
+        rrsets = self.get_rrsets(zone_id)
+        if rrsets is None:
+            return None
+        index = self._indexes.get(zone_id)
+        if index is None or index.rrsets is not rrsets:
+            # The rrsets were replaced without going through set_rrsets.
+            index = self._indexes[zone_id] = _RRSetIndex.build(rrsets)
+        return index
+
+
+    def set_rrsets(self, zone_id, rrsets, changed=None):
         """
         Specify all the rrsets that belong to the given zone.
 
@@ -109,11 +162,112 @@ class Route53ClientState(object):
         @type zone_id: L{unicode}
 
         @param rrsets: A L{PMap} mapping L{RRSetKey} to L{RRSet}.
+
+        @param changed: The L{RRSetKey}s which may differ between the
+            current rrsets of the zone and C{rrsets}, or L{None} if any of
+            them may.  This allows the index of the zone to be updated
+            rather than rebuilt.
+        @type changed: An iterable of L{RRSetKey} or L{None}
         """
+        index = self._indexes.pop(zone_id, None)
+        if (changed is not None and index is not None and
+                index.rrsets is self.rrsets.get(zone_id)):
+            index.update(rrsets, changed)
+            self._indexes[zone_id] = index
         self.rrsets = self.rrsets.set(zone_id, rrsets)
 
 
 
+@attr.s
+class _RRSetIndex(object):
+    """
+    The rrsets of a zone sorted according to the AWS Route53 rules, so
+    that listing them from a given name and type doesn't mean sorting or
+    scanning all of them.
+
+    @ivar rrsets: The rrsets the index is for.
+    @type rrsets: L{pyrsistent.PMap} of L{RRSetKey} to L{RRSet}
+
+    @ivar orders: The sort keys of C{keys}, as computed by L{_rrset_order},
+        in ascending order.
+    @type orders: L{list} of L{tuple}
+
+    @ivar keys: The L{RRSetKey}s of C{rrsets}, in the same order as
+        C{orders}.
+    @type keys: L{list} of L{RRSetKey}
+    """
+    rrsets = attr.ib()
+    orders = attr.ib()
+    keys = attr.ib()
+
+    @classmethod
+    def build(cls, rrsets):
+        """
+        Index some rrsets.
+
+        @type rrsets: L{pyrsistent.PMap} of L{RRSetKey} to L{RRSet}
+
+        @rtype: L{_RRSetIndex}
+        """
+        entries = sorted(
+            ((_rrset_order(key), key) for key in rrsets),
+            key=lambda entry: entry[0],
+        )
+        return cls(
+            rrsets=rrsets,
+            orders=list(order for (order, key) in entries),
+            keys=list(key for (order, key) in entries),
+        )
+
+    def update(self, rrsets, changed):
+        """
+        Bring the index up to date with new rrsets.
+
+        @type rrsets: L{pyrsistent.PMap} of L{RRSetKey} to L{RRSet}
+
+        @param changed: The keys which may differ between the rrsets the
+            index is for and C{rrsets}.
+        @type changed: An iterable of L{RRSetKey}
+        """
+        for key in set(changed):
+            indexed = key in self.rrsets
+            present = key in rrsets
+            if indexed == present:
+                continue
+            order = _rrset_order(key)
+            position = bisect_left(self.orders, order)
+            if present:
+                self.orders.insert(position, order)
+                self.keys.insert(position, key)
+            else:
+                # Distinct keys may share a sort key.
+                while self.keys[position] != key:
+                    position += 1
+                del self.orders[position]
+                del self.keys[position]
+        self.rrsets = rrsets
+
+    def items(self, name=None, type=None):
+        """
+        Generate the indexed rrsets in order, starting from the first one
+        which sorts at or after the given name and type.
+
+        @type name: L{Name} or L{None}
+        @type type: L{unicode} or L{None}
+
+        @return: A generator of two-tuples of L{RRSetKey} and L{RRSet}.
+        """
+        position = 0
+        if name is not None:
+            position = bisect_left(
+                self.orders, (_reverse_dns_labels(name), type or ""),
+            )
+        for position in range(position, len(self.keys)):
+            key = self.keys[position]
+            yield key, self.rrsets[key]
+
+
+
 def _value_transform(pv, pred, transform):
     """
     Perform a transformation on elements of a L{pyrsistent.PVector}.
@@ -206,18 +360,36 @@ class _MemoryRoute53Client(MemoryClient):
         if rrsets is None:
             return fail(_not_found)
 
+        changed = []
         for change in changes:
             try:
                 rrsets = _process_change(rrsets, change)
             except:
                 return fail()
+            changed.append(RRSetKey(change.rrset.label, change.rrset.type))
         # http://docs.aws.amazon.com/Route53/latest/APIReference/API_ChangeResourceRecordSets.html
         #
         # When using the Amazon Route 53 API to change resource record
         # sets, Amazon Route 53 either makes all or none of the
         # changes in a change batch request.
-        self._state.set_rrsets(zone_id, rrsets)
-        return succeed(None)
+        self._state.set_rrsets(zone_id, rrsets, changed)
+        return succeed(self._state.add_change())
+
+    def get_change(self, change_id):
+        """
+        @see: L{txaws.route53.client._Route53Client.get_change}
+        """
+        try:
+            return succeed(self._state.changes[change_id])
+        except KeyError:
+            return fail(_not_found)
+
+    def wait_for_change(self, change_id):
+        """
+        @see: L{txaws.route53.client._Route53Client.wait_for_change}
+        """
+        # Changes are always in sync already.
+        return self.get_change(change_id)
 
     def list_resource_record_sets(self, zone_id, maxitems=None, name=None, type=None):
         """
@@ -230,30 +402,46 @@ class _MemoryRoute53Client(MemoryClient):
             #     Amazon Route 53 returns the InvalidInput error.
             return fail(_error)
 
-        rrsets = self._state.get_rrsets(zone_id)
-        if rrsets is None:
+        index = self._state.get_index(zone_id)
+        if index is None:
             return fail(_not_found)
 
-        maxitems_limit = lambda n: not True
-        if maxitems is not None:
-            maxitems_limit = lambda n, v=maxitems: n == v
-        name_limit = lambda n: True
-        if name is not None:
-            start_value = _reverse_dns_labels(name)
-            name_limit = lambda n, v=start_value: _reverse_dns_labels(n) >= v
-        type_limit = lambda t: True
-        if type is not None:
-            type_limit = lambda t, v=type: t >= v
-
-        results = {}
-        for key, rrset in sorted(
-                rrsets.items(),
-                key=lambda x: _reverse_dns_labels(x[0].label)):
-            if name_limit(key.label) and type_limit(key.type):
-                results[key] = rrset
-                if maxitems_limit(len(results)):
-                    break
-        return succeed(pmap(results))
+        return succeed(pmap(dict(islice(index.items(name, type), maxitems))))
+
+    def iter_resource_record_sets(self, zone_id, maxitems=None, name=None, type=None):
+        """
+        @see: L{txaws.route53.client._Route53Client.iter_resource_record_sets}
+        """
+        if maxitems is None:
+            maxitems = 100
+
+        def get_page(name, type, identifier):
+            if name is None and type is not None:
+                return fail(_error)
+            index = self._state.get_index(zone_id)
+            if index is None:
+                return fail(_not_found)
+            ordered = index.items(name, type)
+            page = list(islice(ordered, maxitems))
+            marker = None
+            for (key, rrset) in ordered:
+                marker = (key.label, key.type, None)
+                break
+            return succeed((page, marker))
+
+        return RRSetStream(get_page, (name, type, None))
+
+    def export_zone(self, zone_id, output):
+        """
+        @see: L{txaws.route53.client._Route53Client.export_zone}
+        """
+        return export_zone(self, zone_id, output)
+
+    def import_zone(self, zone_id, zone_file, **kw):
+        """
+        @see: L{txaws.route53.client._Route53Client.import_zone}
+        """
+        return import_zone(self, zone_id, zone_file, **kw)
 
 
 def _reverse_dns_labels(name):
@@ -266,6 +454,16 @@ def _reverse_dns_labels(name):
     return "".join(str(name).split(".")[-2::-1]) + "."
 
 
+def _rrset_order(key):
+    """
+    Helper to sort L{RRSetKey} instances according to the AWS Route53 rules.
+
+    @type key: L{RRSetKey}
+    @rtype: L{tuple}
+    """
+    return (_reverse_dns_labels(key.label), key.type)
+
+
 def _process_change(rrsets, change):
     """
     Apply an L{IRRSetChange} to some L{RRSet}s.
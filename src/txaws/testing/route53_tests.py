@@ -5,6 +5,7 @@ Integration tests for the Route53 client(s).
 """
 
 import attr
+from io import StringIO
 from time import time
 from uuid import uuid4
 from ipaddress import IPv4Address
@@ -19,6 +20,7 @@ from txaws.route53.model import (
 from txaws.route53.client import (
     Route53Error,
 )
+from txaws.route53.zonefile import read_zone_file
 
 def route53_integration_tests(get_client):
     class Route53IntegrationTests(TestCase):
@@ -338,4 +340,143 @@ def route53_integration_tests(get_client):
             d.addCallback(listed_rrsets)
             return d
 
+
+        @inlineCallbacks
+        def test_iter_resource_record_sets(self):
+            """
+            C{iter_resource_record_sets} follows the continuation markers of
+            truncated listings to return all of the rrsets of a zone a page
+            at a time.
+            """
+            zone_name = "{}.example.invalid.".format(uuid4())
+            client = get_client(self)
+            zone = yield client.create_hosted_zone("{}".format(time()), zone_name)
+            self.addCleanup(lambda: self._cleanup(client, zone.identifier))
+            yield client.change_resource_record_sets(zone.identifier, list(
+                create_rrset(RRSet(
+                    Name("host{}.{}".format(n, zone_name)),
+                    "A",
+                    60,
+                    {A(IPv4Address("10.0.0.{}".format(n)))},
+                ))
+                for n in range(5)
+            ))
+            expected = yield client.list_resource_record_sets(zone.identifier)
+
+            stream = client.iter_resource_record_sets(
+                zone.identifier, maxitems=2,
+            )
+            pages = []
+            while True:
+                page = yield stream.next_page()
+                if not page:
+                    break
+                self.assertTrue(len(page) <= 2)
+                pages.append(page)
+            self.assertEqual(4, len(pages))
+            self.assertEqual(
+                expected,
+                dict(item for page in pages for item in page),
+            )
+
+            visited = {}
+            stream = client.iter_resource_record_sets(
+                zone.identifier, maxitems=3,
+            )
+            yield stream.consume(visited.__setitem__)
+            self.assertEqual(expected, visited)
+
+
+        @inlineCallbacks
+        def test_wait_for_change(self):
+            """
+            C{change_resource_record_sets} gives the identifier of the change
+            batch, which C{get_change} and C{wait_for_change} accept.
+            """
+            zone_name = "{}.example.invalid.".format(uuid4())
+            client = get_client(self)
+            zone = yield client.create_hosted_zone("{}".format(time()), zone_name)
+            self.addCleanup(lambda: self._cleanup(client, zone.identifier))
+            rrset = RRSet(
+                Name("www.{}".format(zone_name)), "A", 60,
+                {A(IPv4Address("10.0.0.1"))},
+            )
+            submitted = yield client.change_resource_record_sets(
+                zone.identifier, [create_rrset(rrset)],
+            )
+            self.assertIn(submitted.status, ("PENDING", "INSYNC"))
+            self.addCleanup(
+                lambda: client.change_resource_record_sets(
+                    zone.identifier, [delete_rrset(rrset)],
+                )
+            )
+
+            info = yield client.get_change(submitted.identifier)
+            self.assertEqual(submitted.identifier, info.identifier)
+
+            info = yield client.wait_for_change(submitted.identifier)
+            self.assertEqual(
+                (submitted.identifier, "INSYNC"), (info.identifier, info.status),
+            )
+
+
+        @inlineCallbacks
+        def test_import_export_zone(self):
+            """
+            C{import_zone} creates the rrsets of a zone file, except for the
+            SOA and apex NS rrsets, and C{export_zone} writes a zone file
+            with all of the rrsets of the zone.
+            """
+            zone_name = "{}.example.invalid.".format(uuid4())
+            client = get_client(self)
+            zone = yield client.create_hosted_zone("{}".format(time()), zone_name)
+            self.addCleanup(lambda: self._cleanup(client, zone.identifier))
+
+            zone_file = [
+                "$TTL 300\n",
+                "@ IN SOA ns1 hostmaster ( 1 7200 900 1209600 86400 )\n",
+                "  IN NS ns1\n",
+                "www IN A 10.0.0.1\n",
+                "    IN A 10.0.0.2\n",
+                "alias 60 IN CNAME www ; a comment\n",
+            ]
+            created = yield client.import_zone(
+                zone.identifier, zone_file, origin=Name(zone_name),
+                max_records=2,
+            )
+            self.assertEqual(2, created)
+
+            rrsets = yield client.list_resource_record_sets(zone.identifier)
+            www = Name("www.{}".format(zone_name))
+            self.assertEqual(
+                RRSet(www, "A", 300, {
+                    A(IPv4Address("10.0.0.1")), A(IPv4Address("10.0.0.2")),
+                }),
+                rrsets[RRSetKey(www, "A")],
+            )
+            alias = Name("alias.{}".format(zone_name))
+            self.assertEqual(
+                RRSet(alias, "CNAME", 60, {CNAME(www)}),
+                rrsets[RRSetKey(alias, "CNAME")],
+            )
+
+            output = StringIO()
+            exported = yield client.export_zone(zone.identifier, output)
+            self.assertEqual(len(rrsets), exported)
+            self.assertIn(
+                "{} 300 IN A 10.0.0.1\n{} 300 IN A 10.0.0.2\n".format(
+                    www, www,
+                ),
+                output.getvalue(),
+            )
+            self.assertEqual(
+                rrsets,
+                {
+                    RRSetKey(rrset.label, rrset.type): rrset
+                    for rrset in read_zone_file(
+                        output.getvalue().splitlines(True),
+                    )
+                },
+            )
+
     return Route53IntegrationTests
@@ -7,6 +7,7 @@ __all__ = [
     "MemoryS3",
 ]
 
+from calendar import timegm
 from datetime import datetime
 from itertools import islice
 
@@ -16,7 +17,9 @@ from dateutil.tz import tzutc
 
 from twisted.internet.defer import succeed, fail
 
-from txaws.s3.model import Bucket, BucketListing, BucketItem
+from txaws.s3.model import (
+    Bucket, BucketColumns, BucketListing, BucketItem, DeleteObjectsResult,
+)
 from txaws.s3.exception import S3Error
 from txaws.testing.base import MemoryClient, MemoryService
 
@@ -95,11 +98,48 @@ class _MemoryS3Client(MemoryClient):
         return succeed(None)
 
     @_rate_limited
-    def get_bucket(self, bucket, marker=None, max_keys=None, prefix=""):
+    def get_bucket(self, bucket, marker=None, max_keys=None, prefix="",
+                   columns=False, delimiter=None):
+        try:
+            listing, last = self._list_objects(
+                bucket, marker, max_keys, prefix, columns, delimiter,
+            )
+        except S3Error as e:
+            return fail(e)
+        if delimiter is None or listing.is_truncated != "true":
+            last = None
+        return succeed(attr.assoc(listing, marker=marker, next_marker=last))
+
+    @_rate_limited
+    def list_objects_v2(self, bucket, prefix=None, delimiter=None,
+                        continuation_token=None, start_after=None,
+                        max_keys=None, columns=False):
+        # The continuation token is simply the last key or common prefix
+        # of the previous page.
+        if continuation_token is not None:
+            start_after = continuation_token
+        try:
+            listing, last = self._list_objects(
+                bucket, start_after, max_keys, prefix, columns, delimiter,
+            )
+        except S3Error as e:
+            return fail(e)
+        if listing.is_truncated != "true":
+            last = None
+        return succeed(attr.assoc(listing, next_continuation_token=last))
+
+    def _list_objects(self, bucket, keys_after, max_keys, prefix, columns,
+                      delimiter):
+        """
+        List a page of the objects in a bucket.
+
+        @return: The L{BucketListing} and the last key or common prefix in
+            it.
+        """
         try:
             pieces = self._state.buckets[bucket]
         except KeyError:
-            return fail(S3Error("<nosuchbucket/>", 400))
+            raise S3Error("<nosuchbucket/>", 400)
         listing = pieces["listing"]
 
         if max_keys is None:
@@ -108,33 +148,64 @@ class _MemoryS3Client(MemoryClient):
         if prefix is None:
             prefix = ""
 
-        if marker is None:
+        if keys_after is None:
             keys_after = ""
-        else:
-            keys_after = marker
-
-        prefixed_contents = (
-            content
-            for content
-            in sorted(listing.contents, key=lambda item: item.key)
-            if content.key.startswith(prefix)
-            and content.key > keys_after
-        )
 
-        contents = list(islice(prefixed_contents, max_keys))
+        def entries():
+            # Keys and common prefixes, each of which counts towards
+            # max_keys, in order.
+            last_prefix = None
+            contents = sorted(listing.contents or (), key=lambda item: item.key)
+            for content in contents:
+                if not content.key.startswith(prefix):
+                    continue
+                common_prefix = None
+                if delimiter:
+                    index = content.key.find(delimiter, len(prefix))
+                    if index != -1:
+                        common_prefix = content.key[:index + len(delimiter)]
+                if common_prefix is None:
+                    if content.key > keys_after:
+                        yield content.key, content
+                elif (common_prefix != last_prefix and
+                      common_prefix > keys_after):
+                    last_prefix = common_prefix
+                    yield common_prefix, None
+
+        prefixed_entries = entries()
+        page = list(islice(prefixed_entries, max_keys))
         is_truncated = "false"
-        for ignored in prefixed_contents:
+        for ignored in prefixed_entries:
             is_truncated = "true"
             break
 
+        contents = list(
+            content for (name, content) in page if content is not None
+        )
+        common_prefixes = list(
+            name for (name, content) in page if content is None
+        )
+        if columns:
+            items = contents
+            contents = BucketColumns()
+            for item in items:
+                contents.append(
+                    item.key,
+                    timegm(item.modification_date.utctimetuple()),
+                    item.etag.decode("ascii"),
+                    int(item.size),
+                )
+
         listing = attr.assoc(
             listing,
             contents=contents,
+            common_prefixes=common_prefixes,
             prefix=prefix,
+            marker=None,
             is_truncated=is_truncated,
-            marker=marker,
         )
-        return succeed(listing)
+        last = page[-1][0] if page else None
+        return listing, last
 
     @_rate_limited
     def get_bucket_location(self, bucket):
@@ -199,6 +270,24 @@ class _MemoryS3Client(MemoryClient):
                 break
         return succeed(None)
 
+    @_rate_limited
+    def delete_objects(self, bucket, object_names, quiet=False):
+        if len(object_names) > 1000:
+            raise ValueError("Cannot delete more than 1000 objects at once")
+        try:
+            listing = self._state.buckets[bucket]["listing"]
+        except KeyError:
+            return fail(S3Error("<nosuchbucket/>", 400))
+        contents = listing.contents or []
+        names = set(object_names)
+        contents[:] = (item for item in contents if item.key not in names)
+        for object_name in names:
+            self._state.objects.pop((bucket, object_name), None)
+        # Like S3, report keys which don't exist as deleted.
+        return succeed(DeleteObjectsResult(
+            deleted=[] if quiet else list(object_names),
+        ))
+
 
 @attr.s
 class _MemoryConsumer(object):
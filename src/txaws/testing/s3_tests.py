@@ -12,6 +12,9 @@ from twisted.internet.defer import inlineCallbacks, gatherResults
 from twisted.internet.task import cooperate
 from twisted.web.client import FileBodyProducer
 
+from txaws.s3.exception import S3Error
+
+
 def s3_integration_tests(get_client):
     class S3IntegrationTests(TestCase):
 
@@ -145,6 +148,104 @@ def s3_integration_tests(get_client):
             objects = yield client.get_bucket(bucket_name, prefix="a")
             self.assertEqual(["a"], list(obj.key for obj in objects.contents))
 
+        @inlineCallbacks
+        def test_get_bucket_columns(self):
+            """
+            With C{columns}, C{get_bucket} gives the contents of the bucket as
+            a L{BucketColumns}.
+            """
+            bucket_name = str(uuid4())
+            client = get_client(self)
+            yield client.create_bucket(bucket_name)
+            yield client.put_object(bucket_name, "b", b"bar!")
+            yield client.put_object(bucket_name, "a", b"foo")
+
+            objects = yield client.get_bucket(bucket_name, columns=True)
+            self.assertEqual(["a", "b"], list(objects.contents.iter_keys()))
+            self.assertEqual([3, 4], list(objects.contents.sizes))
+
+        @inlineCallbacks
+        def test_get_bucket_delimiter(self):
+            """
+            With C{delimiter}, C{get_bucket} rolls the keys which contain it
+            after the prefix up into common prefixes.
+            """
+            bucket_name = str(uuid4())
+            client = get_client(self)
+            yield client.create_bucket(bucket_name)
+            for key in ["a", "b/c", "b/d/e", "f/g"]:
+                yield client.put_object(bucket_name, key, b"foo")
+
+            objects = yield client.get_bucket(bucket_name, delimiter="/")
+            self.assertEqual(["a"], list(obj.key for obj in objects.contents))
+            self.assertEqual(["b/", "f/"], objects.common_prefixes)
+
+            objects = yield client.get_bucket(
+                bucket_name, prefix="b/", delimiter="/",
+            )
+            self.assertEqual(
+                ["b/c"], list(obj.key for obj in objects.contents),
+            )
+            self.assertEqual(["b/d/"], objects.common_prefixes)
+
+        @inlineCallbacks
+        def test_delete_objects(self):
+            """
+            C{delete_objects} deletes several objects with one request.
+            """
+            bucket_name = str(uuid4())
+            client = get_client(self)
+            yield client.create_bucket(bucket_name)
+            for key in ["a", "b", "c"]:
+                yield client.put_object(bucket_name, key, b"foo")
+
+            result = yield client.delete_objects(
+                bucket_name, ["a", "c", "d"],
+            )
+            self.assertEqual(
+                (["a", "c", "d"], []),
+                (sorted(result.deleted), result.errors),
+            )
+            objects = yield client.get_bucket(bucket_name)
+            self.assertEqual(["b"], list(obj.key for obj in objects.contents))
+
+        def test_delete_objects_no_such_bucket(self):
+            """
+            C{delete_objects} returns a L{Deferred} that fails with
+            L{S3Error} if the bucket doesn't exist.
+            """
+            client = get_client(self)
+            return self.assertFailure(
+                client.delete_objects(str(uuid4()), ["a"]), S3Error,
+            )
+
+        @inlineCallbacks
+        def test_list_objects_v2(self):
+            """
+            C{list_objects_v2} gives the objects in a bucket a page at a time,
+            with a continuation token to get the next page with.
+            """
+            bucket_name = str(uuid4())
+            client = get_client(self)
+            yield client.create_bucket(bucket_name)
+            for key in ["a", "b/c", "b/d", "e"]:
+                yield client.put_object(bucket_name, key, b"foo")
+
+            keys = []
+            common_prefixes = []
+            token = None
+            while True:
+                objects = yield client.list_objects_v2(
+                    bucket_name, delimiter="/", max_keys=1,
+                    continuation_token=token,
+                )
+                keys.extend(obj.key for obj in objects.contents)
+                common_prefixes.extend(objects.common_prefixes)
+                if objects.is_truncated != "true":
+                    break
+                token = objects.next_continuation_token
+            self.assertEqual((["a", "e"], ["b/"]), (keys, common_prefixes))
+
         def test_get_bucket_location_empty(self):
             """
             When called for a bucket with no explicit location,
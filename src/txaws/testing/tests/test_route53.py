@@ -4,8 +4,18 @@
 Integration tests for ``txaws.testing.route53``.
 """
 
+from ipaddress import IPv4Address
+
+from pyrsistent import pmap
+
+from twisted.trial.unittest import TestCase
+
 from txaws.testing.integration import get_memory_service
 from txaws.testing.route53_tests import route53_integration_tests
+from txaws.testing.route53 import _rrset_order
+from txaws.route53.model import (
+    A, Name, RRSet, RRSetKey, create_rrset, delete_rrset,
+)
 
 def get_memory_client(case):
     return get_memory_service(case).get_route53_client()
@@ -15,3 +25,93 @@ class MemoryRoute53TestCase(route53_integration_tests(get_memory_client)):
     """
     Tests for the in-memory Route53 test double.
     """
+
+
+def a_rrset(label):
+    return RRSet(Name(label), "A", 60, {A(IPv4Address("10.0.0.1"))})
+
+
+class RRSetIndexTestCase(TestCase):
+    """
+    Tests for the sorted index the in-memory Route53 test double keeps of the
+    rrsets of each zone.
+    """
+    def setUp(self):
+        self.client = get_memory_client(self)
+        zone = self.successResultOf(
+            self.client.create_hosted_zone("ref", "example.invalid."))
+        self.zone_id = zone.identifier
+
+    def listed_keys(self, **kwargs):
+        rrsets = self.successResultOf(
+            self.client.list_resource_record_sets(self.zone_id, **kwargs))
+        return sorted(rrsets, key=_rrset_order)
+
+    def test_changes(self):
+        """
+        The index follows the rrsets created and deleted through
+        C{change_resource_record_sets}.
+        """
+        labels = ["{}.z.example.invalid.".format(c) for c in "dbeac"]
+        self.successResultOf(self.client.change_resource_record_sets(
+            self.zone_id, [create_rrset(a_rrset(l)) for l in labels],
+        ))
+        self.successResultOf(self.client.change_resource_record_sets(
+            self.zone_id, [delete_rrset(a_rrset(labels[2]))],
+        ))
+        index = self.client._state.get_index(self.zone_id)
+        rrsets = self.client._state.get_rrsets(self.zone_id)
+        self.assertEqual(sorted(rrsets, key=_rrset_order), index.keys)
+        self.assertEqual(
+            [RRSetKey(Name("{}.z.example.invalid.".format(c)), "A")
+             for c in "bcd"],
+            self.listed_keys(name=Name("b.z.example.invalid."), maxitems=3),
+        )
+
+    def test_start_type(self):
+        """
+        Listing from a name and type starts at that type among the rrsets
+        with that name.
+        """
+        self.assertEqual(
+            [RRSetKey(Name("example.invalid."), "SOA")],
+            self.listed_keys(name=Name("example.invalid."), type="PTR"),
+        )
+
+    def test_replaced_rrsets(self):
+        """
+        If the rrsets of a zone are replaced directly, the index is rebuilt.
+        """
+        self.successResultOf(self.client.list_resource_record_sets(
+            self.zone_id))
+        rrset = a_rrset("a.example.invalid.")
+        key = RRSetKey(rrset.label, rrset.type)
+        state = self.client._state
+        state.rrsets = state.rrsets.set(self.zone_id, pmap({key: rrset}))
+        self.assertEqual([key], self.listed_keys())
+
+
+class RRSetStreamTestCase(TestCase):
+    """
+    Tests for the L{RRSetStream} of the in-memory Route53 test double.
+    """
+    def test_many_pages(self):
+        """
+        L{RRSetStream.consume} visits zones of many pages, even though the
+        pages of the in-memory client are all available at once.
+        """
+        client = get_memory_client(self)
+        zone = self.successResultOf(
+            client.create_hosted_zone("ref", "example.invalid."))
+        labels = ["host{}.example.invalid.".format(n) for n in range(2000)]
+        self.successResultOf(client.change_resource_record_sets(
+            zone.identifier, [create_rrset(a_rrset(l)) for l in labels],
+        ))
+        visited = []
+        stream = client.iter_resource_record_sets(
+            zone.identifier, maxitems=1,
+        )
+        self.successResultOf(
+            stream.consume(lambda key, rrset: visited.append(key)))
+        # The NS and SOA rrsets of the zone come along.
+        self.assertEqual(len(labels) + 2, len(visited))
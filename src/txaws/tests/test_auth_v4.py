@@ -15,16 +15,19 @@ from txaws._auth_v4 import (
     _Credential,
     _CredentialScope,
     _SignableAWS4HMAC256Token,
+    _get_cached_signature_key,
     _make_authorization_header,
     _make_canonical_headers,
     _make_canonical_query_string,
     _make_canonical_uri,
     _make_signed_headers,
+    _parse_authorization_header,
     getSignatureKey,
     makeAMZDate,
     makeDateStamp,
     sign,
 )
+from txaws import _auth_v4
 
 from txaws.credentials import AWSCredentials
 
@@ -97,6 +100,36 @@ class AWS4FunctionTestCase(unittest.SynchronousTestCase):
                          b'\x85,P\x1e=\xba\xa4;\x13\xc6\r\xa6\x0f\xcd\xa1\xac*'
                          b'\xd31I\xbbpX\x95x\x08\xb0mM\x85\xeft')
 
+    def test_get_cached_signature_key(self):
+        """
+        L{_get_cached_signature_key} returns the same signature key as
+        L{getSignatureKey}, memoized without keeping the secret key itself.
+        """
+        expected = getSignatureKey("key", "dateStamp", "region", "service")
+        self.assertEqual(
+            expected, _get_cached_signature_key(
+                "key", "dateStamp", "region", "service"))
+        self.assertEqual(
+            expected, _get_cached_signature_key(
+                "key", "dateStamp", "region", "service"))
+        self.assertNotIn(
+            "key", [item for cache_key in _auth_v4._signature_keys
+                    for item in cache_key])
+
+    def test_get_cached_signature_key_size(self):
+        """
+        L{_get_cached_signature_key} drops the least recently used signature
+        keys once it holds C{_SIGNATURE_KEY_CACHE_SIZE} of them.
+        """
+        self.patch(_auth_v4, "_SIGNATURE_KEY_CACHE_SIZE", 2)
+        self.patch(_auth_v4, "_signature_keys", _auth_v4.OrderedDict())
+        for secret in ["first", "second", "first", "third"]:
+            _get_cached_signature_key(secret, "dateStamp", "region", "service")
+        self.assertEqual(
+            [getSignatureKey(secret, "dateStamp", "region", "service")
+             for secret in ["first", "third"]],
+            list(_auth_v4._signature_keys.values()))
+
     def test_makeAMZDate(self):
         """
         A L{datetime.datetime} instance is formatted according to the
@@ -636,3 +669,53 @@ class MakeAuthorizationHeaderTestCase(unittest.TestCase):
         )
 
         self.assertEqual(header_value, expected)
+
+
+class ParseAuthorizationHeaderTestCase(unittest.SynchronousTestCase):
+    """
+    Tests for L{_parse_authorization_header}.
+    """
+
+    def test_round_trip(self):
+        """
+        The credential, signed headers and signature of a value made by
+        L{_make_authorization_header} are parsed back.
+        """
+        request = _create_canonical_request_fixture()
+        credentials = AWSCredentials(access_key="access key",
+                                     secret_key="secret key")
+        instant = datetime.datetime(2016, 11, 11, 2, 45, 50)
+        value = _make_authorization_header(
+            REGION_US_EAST_1, "dynamodb", request, credentials, instant)
+        credential, signed_headers, signature = (
+            _parse_authorization_header(value))
+        self.assertEqual(
+            _Credential(
+                access_key="access key",
+                credential_scope=_CredentialScope(
+                    date_stamp="20161111",
+                    region=REGION_US_EAST_1,
+                    service="dynamodb")),
+            credential)
+        self.assertEqual("signed headers", signed_headers)
+        self.assertEqual(value.rsplit("=", 1)[1], signature)
+
+    def test_unsupported_algorithm(self):
+        """
+        A value for another algorithm raises L{ValueError}.
+        """
+        self.assertRaises(
+            ValueError, _parse_authorization_header, "AWS access:signature")
+
+    def test_malformed(self):
+        """
+        A value missing some of the fields raises L{ValueError}.
+        """
+        self.assertRaises(
+            ValueError, _parse_authorization_header,
+            "AWS4-HMAC-SHA256 Credential=access/20161111/us-east-1/ec2/"
+            "aws4_request, Signature=abc")
+        self.assertRaises(
+            ValueError, _parse_authorization_header,
+            "AWS4-HMAC-SHA256 Credential=access/20161111, "
+            "SignedHeaders=host, Signature=abc")
@@ -113,3 +113,51 @@ class AWSErrorTestCase(TestCase):
         error._set_500_error(XML(xml))
         self.assertEquals(error.errors[0]["Code"], "500")
         self.assertEquals(error.errors[0]["Message"], "Oops")
+
+    def test_lazy_parse(self):
+        """
+        A response with a I{Code} element is only parsed once its errors
+        are needed.
+        """
+        parsed = []
+
+        class CountingError(AWSError):
+            def parse(self, xml_bytes=""):
+                parsed.append(xml_bytes)
+                return AWSError.parse(self, xml_bytes)
+
+            def _set_400_error(self, tree):
+                self.errors.append(self._node_to_dict(tree.find("Error")))
+
+        xml = (b"<Response><Error><Code>SlowDown</Code>"
+               b"<Message>Please reduce your request rate.</Message></Error>"
+               b"<RequestID>%s</RequestID></Response>" % REQUEST_ID.encode())
+        error = CountingError(xml, 400)
+        self.assertEqual([], parsed)
+        self.assertEqual(REQUEST_ID, error.request_id)
+        self.assertEqual("SlowDown", error.get_error_codes())
+        self.assertEqual(1, len(parsed))
+
+    def test_has_error_without_parse(self):
+        """
+        L{AWSError.has_error} doesn't parse the response to find that an
+        error isn't there.
+        """
+        xml = "<Error><Code>NoSuchKey</Code><Message>Gone</Message></Error>"
+        error = AWSError(xml, 404)
+        self.assertFalse(error.has_error("SlowDown"))
+        self.assertIs(None, error._errors)
+        self.assertFalse(error.has_error("NoSuchKey"))
+        self.assertEqual([], error.errors)
+
+    def test_malformed_with_code(self):
+        """
+        A response with a I{Code} element which isn't XML after all is made
+        of its I{Code} and I{Message}.
+        """
+        xml = b"<Error><Code>InternalError</Code><Message>Oops</Message>"
+        error = AWSError(xml, 500)
+        self.assertEqual(
+            [{"Code": "InternalError", "Message": "Oops"}], error.errors,
+        )
+        self.assertTrue(error.has_error("InternalError"))
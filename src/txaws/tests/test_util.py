@@ -1,9 +1,12 @@
 import binascii
+from datetime import datetime
 from urllib.parse import urlparse
 
+from dateutil.tz import tzutc
+
 from twisted.trial.unittest import TestCase
 
-from txaws.util import hmac_sha1, iso8601time, parse
+from txaws.util import hmac_sha1, iso8601time, parse, parse_iso8601, XML
 
 
 class MiscellaneousTestCase(TestCase):
@@ -26,6 +29,50 @@ class MiscellaneousTestCase(TestCase):
                          iso8601time((2006, 7, 7, 15, 4, 56, 0, 0, 0)))
 
 
+class ParseISO8601TestCase(TestCase):
+    """
+    Tests for L{parse_iso8601}.
+    """
+    def test_utc(self):
+        """
+        The timestamps in AWS responses are parsed to L{datetime}s in UTC,
+        with the fraction of a second if there is one.
+        """
+        self.assertEqual(
+            datetime(2006, 1, 1, 12, 0, 5, tzinfo=tzutc()),
+            parse_iso8601("2006-01-01T12:00:05.000Z"),
+        )
+        self.assertEqual(
+            datetime(2006, 1, 1, 12, 0, 5, 250000, tzinfo=tzutc()),
+            parse_iso8601("2006-01-01T12:00:05.25Z"),
+        )
+        self.assertEqual(
+            datetime(2006, 1, 1, 12, 0, 5, tzinfo=tzutc()),
+            parse_iso8601("2006-01-01T12:00:05Z"),
+        )
+
+    def test_naive(self):
+        """
+        With C{naive}, the result is a naive L{datetime} in UTC.
+        """
+        parsed = parse_iso8601("2008-05-07T11:51:50.000Z", naive=True)
+        self.assertEqual(datetime(2008, 5, 7, 11, 51, 50), parsed)
+        self.assertIs(None, parsed.tzinfo)
+
+    def test_other_formats(self):
+        """
+        Timestamps in other formats are converted to UTC.
+        """
+        self.assertEqual(
+            datetime(2006, 1, 1, 11, 0, 5, tzinfo=tzutc()),
+            parse_iso8601("2006-01-01T12:00:05+01:00"),
+        )
+        self.assertEqual(
+            datetime(2006, 1, 1, 11, 0, 5),
+            parse_iso8601("2006-01-01T12:00:05+01:00", naive=True),
+        )
+
+
 class ParseUrlTestCase(TestCase):
     """
     Test URL parsing facility and defaults values.
@@ -58,3 +105,55 @@ class ParseUrlTestCase(TestCase):
         self.assertEqual(
             parse("http://foo "),
             ("http", "foo", 80, "/"))
+
+
+class XMLTestCase(TestCase):
+
+    def test_default_namespace(self):
+        """
+        The default namespace of the root element is dropped from the tags
+        of all the elements.
+        """
+        root = XML(b'<?xml version="1.0"?>\n'
+                   b'<Response a="1" xmlns="http://example.com/doc/">'
+                   b"<Item><Name>foo</Name></Item></Response>")
+        self.assertEqual("Response", root.tag)
+        self.assertEqual({"a": "1"}, root.attrib)
+        self.assertEqual("foo", root.findtext("Item/Name"))
+
+    def test_text(self):
+        """
+        Documents can be given as L{str} too.
+        """
+        root = XML("<Response xmlns='http://example.com/doc/'>"
+                   "<Name>f\N{LATIN SMALL LETTER O WITH DIAERESIS}o</Name>"
+                   "</Response>")
+        self.assertEqual("f\N{LATIN SMALL LETTER O WITH DIAERESIS}o",
+                         root.findtext("Name"))
+
+    def test_other_namespaces(self):
+        """
+        Elements in other namespaces, whether default or prefixed, lose
+        their namespace too, while attributes keep theirs.
+        """
+        root = XML(b'<a:Response xmlns:a="http://example.com/a/" '
+                   b'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+                   b'<Grantee xsi:type="User" xmlns="http://example.com/b/">'
+                   b"<ID>id</ID></Grantee></a:Response>")
+        self.assertEqual("Response", root.tag)
+        [grantee] = root
+        self.assertEqual("Grantee", grantee.tag)
+        self.assertEqual(
+            {"{http://www.w3.org/2001/XMLSchema-instance}type": "User"},
+            grantee.attrib,
+        )
+        self.assertEqual("id", root.findtext("Grantee/ID"))
+
+    def test_namespace_in_attribute_value(self):
+        """
+        Only the namespace declaration of the root element is dropped.
+        """
+        root = XML(b'<Response note="no xmlns here" xmlns="urn:x">'
+                   b"<Name>xmlns</Name></Response>")
+        self.assertEqual("no xmlns here", root.attrib["note"])
+        self.assertEqual("xmlns", root.findtext("Name"))
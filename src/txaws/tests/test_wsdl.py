@@ -2,13 +2,15 @@
 # Licenced under the txaws licence available at /LICENSE in the txaws source.
 
 import os
+from io import BytesIO
 
 from twisted.python.modules import getModule
 from twisted.trial.unittest import TestCase
 
 from txaws.wsdl import (
     WSDLParseError, LeafSchema, NodeSchema, NodeItem, SequenceSchema,
-    SequenceItem, WSDLParser, etree)
+    SequenceItem, WSDLParser, WSDLSchemas, DEFAULT_WSDL, load_schemas,
+    iter_items, iterparse_items, etree)
 
 
 class WsdlBaseTestCase(TestCase):
@@ -282,6 +284,48 @@ class NodeItemTestCase(WsdlBaseTestCase):
         self.assertEqual("Missing tag 'bar'", error.args[0])
         self.assertTrue(hasattr(foo, "bar"))
 
+    def test_get_nested_is_kept(self):
+        """
+        The same item is returned each time a non-leaf child is accessed.
+        """
+        schema = NodeSchema("foo", [NodeSchema("bar", [LeafSchema("egg")])])
+        root = etree.fromstring("<foo><bar><egg>spam</egg></bar></foo>")
+        foo = schema.create(root)
+        self.assertIs(foo.bar, foo.bar)
+
+    def test_set_and_get(self):
+        """
+        Children created or removed by setting a leaf are found, or not, by
+        later lookups.
+        """
+        schema = NodeSchema("foo")
+        schema.add(LeafSchema("bar"), min_occurs=0)
+        schema.add(LeafSchema("egg"))
+        root = etree.fromstring("<foo><egg>spam</egg></foo>")
+        foo = schema.create(root)
+        self.assertEqual("spam", foo.egg)
+        foo.bar = "ham"
+        self.assertEqual("ham", foo.bar)
+        foo.bar = None
+        self.assertIs(None, foo.bar)
+        foo.bar = "eggs"
+        self.assertEqual(b"<foo><egg>spam</egg><bar>eggs</bar></foo>",
+                         etree.tostring(schema.dump(foo)))
+
+    def test_set_with_removed_node_tag(self):
+        """
+        Once an optional node tag is set to C{None}, accessing it creates a
+        new empty node.
+        """
+        schema = NodeSchema("foo")
+        schema.add(NodeSchema("bar", [LeafSchema("egg")]), min_occurs=0)
+        root = etree.fromstring("<foo><bar><egg>spam</egg></bar></foo>")
+        foo = schema.create(root)
+        bar = foo.bar
+        foo.bar = None
+        self.assertIsNot(bar, foo.bar)
+        self.assertEqual(b"<foo><bar/></foo>", etree.tostring(schema.dump(foo)))
+
 
 class SequenceSchemaTestCase(WsdlBaseTestCase):
 
@@ -508,6 +552,42 @@ class SequenceItemTestCase(WsdlBaseTestCase):
         self.assertEqual("egg0", item0.bar)
         self.assertEqual("egg1", item1.bar)
 
+    def test_items_are_kept(self):
+        """
+        The same item is returned each time an index is accessed, and
+        indexes follow the items appended and removed.
+        """
+        schema = SequenceSchema("foo", NodeSchema("item", [LeafSchema("bar")]))
+        root = etree.fromstring("<foo>"
+                                "<item><bar>egg0</bar></item>"
+                                "<item><bar>egg1</bar></item>"
+                                "</foo>")
+        foo = schema.create(root)
+        item0, item1 = foo[0], foo[1]
+        self.assertIs(item0, foo[0])
+        item2 = foo.append()
+        self.assertIs(item2, foo[2])
+        del foo[0]
+        self.assertEqual([item1, item2], list(foo))
+        self.assertEqual(2, len(foo))
+
+    def test_set_to_none_clears_items(self):
+        """
+        Setting a sequence tag to C{None} empties the sequence item.
+        """
+        schema = NodeSchema("foo")
+        schema.add(SequenceSchema("bar",
+                                  NodeSchema("item", [LeafSchema("egg")])))
+        root = etree.fromstring("<foo>"
+                                "<bar><item><egg>spam</egg></item></bar><"
+                                "/foo>")
+        foo = schema.create(root)
+        bar = foo.bar
+        self.assertEqual(1, len(bar))
+        foo.bar = None
+        self.assertEqual(0, len(bar))
+        self.assertIs(bar, foo.bar)
+
 
 class WDSLParserTestCase(WsdlBaseTestCase):
 
@@ -798,3 +878,247 @@ class WDSLParserTestCase(WsdlBaseTestCase):
                "</securityGroupInfo>"
                "</DescribeSecurityGroupsResponse>" % xmlns)
         self.assertEqual(xml.encode(), etree.tostring(schema.dump(response)))
+
+
+class LoadSchemasTestCase(WsdlBaseTestCase):
+
+    def setUp(self):
+        super(LoadSchemasTestCase, self).setUp()
+        self.cache_dir = self.mktemp()
+
+    def test_load(self):
+        """
+        L{load_schemas} returns the schemas of all the response types of
+        the given WSDL definition.
+        """
+        schemas = load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        self.assertIsInstance(schemas, WSDLSchemas)
+        with open(DEFAULT_WSDL, "rb") as wsdl_file:
+            parsed = WSDLParser().parse(wsdl_file.read())
+        self.assertEqual(sorted(parsed), sorted(schemas))
+        schema = schemas["DescribeKeyPairsResponse"]
+        self.assertEqual(parsed["DescribeKeyPairsResponse"].namespace,
+                         schema.namespace)
+        self.assertIs(schema, schemas["DescribeKeyPairsResponse"])
+
+    def test_cached(self):
+        """
+        The WSDL definition is only parsed the first time it's loaded.
+        """
+        load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+
+        def parse(parser, wsdl):
+            self.fail("Parsed a cached WSDL definition")
+        self.patch(WSDLParser, "parse", parse)
+        schemas = load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        xml = ("<DeleteKeyPairResponse>"
+               "<requestId>acc41b73-4c47-4f80</requestId>"
+               "<return>true</return>"
+               "</DeleteKeyPairResponse>")
+        response = schemas["DeleteKeyPairResponse"].create(
+            etree.fromstring(xml))
+        self.assertEqual("true", response.return_)
+
+    def test_changed_definition(self):
+        """
+        A WSDL definition whose content changed is parsed again.
+        """
+        path = self.mktemp()
+        with open(DEFAULT_WSDL, "rb") as wsdl_file:
+            wsdl = wsdl_file.read()
+        with open(path, "wb") as wsdl_file:
+            wsdl_file.write(wsdl)
+        load_schemas(path, cache_dir=self.cache_dir)
+        with open(path, "wb") as wsdl_file:
+            wsdl_file.write(wsdl.replace(b"DeleteKeyPairResponse",
+                                         b"RemoveKeyPairResponse"))
+        schemas = load_schemas(path, cache_dir=self.cache_dir)
+        self.assertIn("RemoveKeyPairResponse", schemas)
+        self.assertNotIn("DeleteKeyPairResponse", schemas)
+
+    def test_broken_cache(self):
+        """
+        A cache that can't be read is ignored and replaced.
+        """
+        load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        [name] = os.listdir(self.cache_dir)
+        with open(os.path.join(self.cache_dir, name), "wb") as cache_file:
+            cache_file.write(b"garbage")
+        schemas = load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        self.assertIn("DescribeKeyPairsResponse", schemas)
+        self.assertEqual([name], os.listdir(self.cache_dir))
+        schemas = load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        self.assertIn("DescribeKeyPairsResponse", schemas)
+
+    def share(self, path):
+        """Make C{path} writable by other users."""
+        os.chmod(path, os.stat(path).st_mode | 0o022)
+
+    def assert_parsed(self):
+        """
+        L{load_schemas} parses the WSDL definition again rather than using
+        the cache.
+        """
+        parsed = []
+        parse = WSDLParser.parse
+
+        def record_parse(parser, wsdl):
+            parsed.append(wsdl)
+            return parse(parser, wsdl)
+        self.patch(WSDLParser, "parse", record_parse)
+        schemas = load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        self.assertIn("DescribeKeyPairsResponse", schemas)
+        self.assertEqual(1, len(parsed))
+
+    def test_shared_cache_file(self):
+        """
+        A cache file that other users can write to isn't unpickled.
+        """
+        load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        [name] = os.listdir(self.cache_dir)
+        self.share(os.path.join(self.cache_dir, name))
+        self.assert_parsed()
+
+    def test_shared_cache_dir(self):
+        """
+        A cache file in a directory that other users can write to isn't
+        unpickled.
+        """
+        load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        self.share(self.cache_dir)
+        self.assert_parsed()
+
+    def test_unwritable_cache(self):
+        """
+        The schemas are still loaded when the cache can't be written.
+        """
+        with open(self.cache_dir, "w"):
+            pass
+        schemas = load_schemas(DEFAULT_WSDL, cache_dir=self.cache_dir)
+        self.assertIn("DescribeKeyPairsResponse", schemas)
+
+
+class IterItemsTestCase(WsdlBaseTestCase):
+
+    xmlns = "http://ec2.amazonaws.com/doc/2008-12-01/"
+
+    def setUp(self):
+        super(IterItemsTestCase, self).setUp()
+        self.schema = load_schemas(DEFAULT_WSDL, cache_dir=self.mktemp())[
+            "DescribeKeyPairsResponse"]
+
+    def get_xml(self, *items):
+        return ("<DescribeKeyPairsResponse xmlns=\"%s\">"
+                "<requestId>3ef0aa1d-57dd-4272</requestId>"
+                "<keySet>%s</keySet>"
+                "</DescribeKeyPairsResponse>" % (
+                    self.xmlns, "".join(items))).encode("utf-8")
+
+    def get_item(self, name, fingerprint="94:88:29:60:cf"):
+        return ("<item>"
+                "<keyName>%s</keyName>"
+                "<keyFingerprint>%s</keyFingerprint>"
+                "</item>" % (name, fingerprint))
+
+    def test_iterparse_items(self):
+        """
+        L{iterparse_items} generates an item for each element of the
+        sequence at the given path.
+        """
+        xml = self.get_xml(self.get_item("foo"), self.get_item("bar"))
+        items = iterparse_items(self.schema, BytesIO(xml), ("keySet",))
+        self.assertEqual(["foo", "bar"], [item.keyName for item in items])
+
+    def test_items_as_parsed(self):
+        """
+        Each item is generated as soon as its element is complete, detached
+        from the rest of the document.
+        """
+        parser = etree.XMLPullParser(events=("start", "end"))
+        head, tail = self.get_xml(self.get_item("foo")).split(b"</keySet>")
+
+        def events():
+            for chunk in [head, self.get_item("bar").encode("utf-8"),
+                          b"</keySet>" + tail]:
+                parser.feed(chunk)
+                for event in parser.read_events():
+                    yield event
+        items = iter_items(self.schema, events(), ("keySet",))
+        foo = next(items)
+        self.assertEqual("foo", foo.keyName)
+        self.assertIs(None, foo._root.getparent())
+        self.assertEqual(["bar"], [item.keyName for item in items])
+
+    def test_empty_sequence(self):
+        """
+        No item is generated for an empty sequence.
+        """
+        items = iterparse_items(
+            self.schema, BytesIO(self.get_xml()), ("keySet",))
+        self.assertEqual([], list(items))
+
+    def test_wrong_root(self):
+        """
+        A response with another root tag is rejected.
+        """
+        xml = b"<DeleteKeyPairResponse />"
+        items = iterparse_items(self.schema, BytesIO(xml), ("keySet",))
+        error = self.assertRaises(WSDLParseError, list, items)
+        self.assertEqual("Expected response with tag "
+                         "'DescribeKeyPairsResponse', but got "
+                         "'DeleteKeyPairResponse' instead", error.args[0])
+
+    def test_unknown_tag(self):
+        """
+        An element which isn't in the schema is rejected.
+        """
+        xml = self.get_xml(self.get_item("foo"),
+                           "<item><keyName>bar</keyName><egg /></item>")
+        items = iterparse_items(self.schema, BytesIO(xml), ("keySet",))
+        self.assertEqual("foo", next(items).keyName)
+        error = self.assertRaises(WSDLParseError, list, items)
+        self.assertEqual("Unknown tag 'egg'", error.args[0])
+
+    def test_missing_tag(self):
+        """
+        An element missing a required child is rejected.
+        """
+        xml = self.get_xml("<item><keyName>foo</keyName></item>")
+        items = iterparse_items(self.schema, BytesIO(xml), ("keySet",))
+        error = self.assertRaises(WSDLParseError, list, items)
+        self.assertEqual("Missing tag 'keyFingerprint'", error.args[0])
+
+    def test_duplicate_tag(self):
+        """
+        A repeated element which isn't a sequence item is rejected.
+        """
+        xml = self.get_xml(
+            "<item><keyName>foo</keyName><keyName>bar</keyName></item>")
+        items = iterparse_items(self.schema, BytesIO(xml), ("keySet",))
+        error = self.assertRaises(WSDLParseError, list, items)
+        self.assertEqual("Duplicate tag 'keyName'", error.args[0])
+
+    def test_leaf_with_children(self):
+        """
+        A leaf element with children is rejected.
+        """
+        xml = self.get_xml(
+            "<item><keyName><keyName /></keyName></item>")
+        items = iterparse_items(self.schema, BytesIO(xml), ("keySet",))
+        error = self.assertRaises(WSDLParseError, list, items)
+        self.assertEqual("Unexpected child 'keyName' in leaf tag 'keyName'",
+                         error.args[0])
+
+    def test_bad_path(self):
+        """
+        A path which doesn't lead to a sequence is rejected.
+        """
+        xml = BytesIO(self.get_xml())
+        error = self.assertRaises(
+            WSDLParseError, list,
+            iterparse_items(self.schema, xml, ("requestId",)))
+        self.assertEqual("Tag 'requestId' is not a sequence", error.args[0])
+        error = self.assertRaises(
+            WSDLParseError, list,
+            iterparse_items(self.schema, xml, ("foo",)))
+        self.assertEqual("Unknown tag 'foo'", error.args[0])
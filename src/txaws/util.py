@@ -5,15 +5,22 @@ services.
 """
 
 from base64 import b64encode
+from datetime import datetime
+from functools import lru_cache
 from hashlib import sha1, md5, sha256
 import hmac
 from urllib.parse import urlparse, urlunparse
+import re
 import time
 
 from xml.etree.ElementTree import TreeBuilder as XMLTreeBuilder, XMLParser
 
+from dateutil.parser import parse as parseTime
+from dateutil.tz import tzutc
 
-__all__ = ["hmac_sha1", "hmac_sha256", "iso8601time", "calculate_md5", "XML"]
+
+__all__ = ["hmac_sha1", "hmac_sha256", "iso8601time", "parse_iso8601",
+           "calculate_md5", "XML"]
 
 
 def calculate_md5(data):
@@ -44,6 +51,58 @@ def iso8601time(time_tuple):
         return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
+# The format of the timestamps in AWS responses.
+_ISO8601 = re.compile(
+    r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.(\d{1,6}))?Z\Z"
+)
+
+_UTC = tzutc()
+
+
+@lru_cache(maxsize=4096)
+def _parse_seconds(text, naive):
+    """
+    Make a L{datetime} of the C{YYYY-MM-DDTHH:MM:SS} prefix of a UTC
+    timestamp.
+
+    Listings have many timestamps in the same second, so these are cached.
+    """
+    return datetime(
+        int(text[0:4]), int(text[5:7]), int(text[8:10]),
+        int(text[11:13]), int(text[14:16]), int(text[17:19]),
+        tzinfo=None if naive else _UTC,
+    )
+
+
+def parse_iso8601(text, naive=False):
+    """
+    Parse an ISO 8601 timestamp such as the C{YYYY-MM-DDTHH:MM:SS.sssZ} ones
+    in AWS responses.
+
+    Timestamps in that format are parsed without going through
+    L{dateutil.parser}, which is only used for anything else.
+
+    @param text: The timestamp.
+    @type text: L{unicode}
+
+    @param naive: If true, give a naive L{datetime} in UTC rather than one
+        in the UTC time zone.
+
+    @rtype: L{datetime}
+    """
+    match = _ISO8601.match(text)
+    if match is None:
+        parsed = parseTime(text)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(_UTC)
+        return parsed.replace(tzinfo=None if naive else _UTC)
+    parsed = _parse_seconds(text[:19], naive)
+    fraction = match.group(1)
+    if fraction and fraction.strip("0"):
+        return parsed.replace(microsecond=int(fraction.ljust(6, "0")))
+    return parsed
+
+
 class NamespaceFixXmlTreeBuilder(XMLTreeBuilder):
 
     def start(self, tag, attrs):
@@ -57,10 +116,40 @@ class NamespaceFixXmlTreeBuilder(XMLTreeBuilder):
         return key
 
 
+# The default namespace declaration of the root element of a document,
+# which is all the namespace most AWS responses have.
+_ROOT_XMLNS = re.compile(
+    r"""\A(\s*(?:<\?[^>]*\?>\s*)?<[^\s/>!?]+[^>]*?)"""
+    r"""\s+xmlns\s*=\s*(?:"[^"]*"|'[^']*')""")
+_ROOT_XMLNS_BYTES = re.compile(_ROOT_XMLNS.pattern.encode("ascii"))
+
+
 def XML(text):
-    parser = XMLParser(target=NamespaceFixXmlTreeBuilder())
+    """Parse an XML document, dropping the namespaces of its elements.
+
+    The default namespace of the root element is removed from the text
+    before it's handed to the C parser, so that most documents need no
+    further work.  The tags of any element still in a namespace after that
+    are fixed up afterwards.
+
+    @param text: The document, as L{bytes} or L{str}.
+    @return: The root C{Element}.
+    """
+    if isinstance(text, bytes):
+        text = _ROOT_XMLNS_BYTES.sub(br"\1", text, 1)
+        namespaced = b"xmlns" in text
+    else:
+        text = _ROOT_XMLNS.sub(r"\1", text, 1)
+        namespaced = "xmlns" in text
+    parser = XMLParser()
     parser.feed(text)
-    return parser.close()
+    root = parser.close()
+    if namespaced:
+        for element in root.iter():
+            tag = element.tag
+            if tag[:1] == "{":
+                element.tag = tag.split("}", 1)[1]
+    return root
 
 
 def parse(url, defaultPort=True):
@@ -78,12 +78,37 @@ the response elements one actually accesses are consistent with the
 WDSL definition and that all modifications of those items are consistent
 as well.
 """
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+from collections.abc import Mapping
+from functools import lru_cache
+
 try:
     from lxml import etree
 except ImportError:
     etree = None
 
 
+# The WSDL definition of the EC2 API bundled with txaws.
+DEFAULT_WSDL = os.path.join(os.path.dirname(__file__), "wsdl",
+                            "2009-11-30.ec2.wsdl")
+
+# Part of the key of cached schemas, to be changed along with the layout of
+# the schema classes so that stale caches are ignored.
+_CACHE_FORMAT = b"1"
+
+
+@lru_cache(maxsize=4096)
+def _qualify(namespace, tag):
+    """Return the given C{tag} in the given C{namespace}, if any."""
+    if namespace is not None:
+        tag = "{%s}%s" % (namespace, tag)
+    return tag
+
+
 class WSDLParseError(Exception):
     """Raised when a response doesn't comply with its schema."""
 
@@ -122,10 +147,11 @@ class NodeSchema(object):
         """Create an inner node element.
 
         @param root: The inner C{etree.Element} the item will be rooted at.
+        @param namespace: The namespace the item is expected to be in.
         @result: A L{NodeItem} with the given root, or a new one if none.
         @raises L{ECResponseError}: If the given C{root} has a bad tag.
         """
-        if root is not None:
+        if root is not None and root.tag != _qualify(namespace, self.tag):
             tag = root.tag
             if root.nsmap:
                 namespace = root.nsmap[None]
@@ -159,6 +185,11 @@ class NodeSchema(object):
 class NodeItem(object):
     """An inner node item in a tree of response elements.
 
+    The children of the root element are indexed by tag the first time one
+    of them is looked up, and the items for inner children are kept, so
+    walking a large response costs one pass over each node.  The index only
+    follows the changes made through the items.
+
     @param schema: The L{NodeSchema} this item must comply to.
     @param root: The C{etree.Element} this item is rooted at, if C{None}
         a new one will be created.
@@ -174,6 +205,8 @@ class NodeItem(object):
                 nsmap = {None: namespace}
             root = etree.Element(tag, nsmap=nsmap)
         object.__setattr__(self, "_root", root)
+        object.__setattr__(self, "_index", None)
+        object.__setattr__(self, "_items", {})
 
     def __getattr__(self, name):
         """Get the child item with the given C{name}.
@@ -188,15 +221,20 @@ class NodeItem(object):
         tag = self._get_tag(name)
         schema = self._get_schema(tag)
 
-        child = self._find_child(tag)
-        if child is None:
-            if isinstance(schema, LeafSchema):
-                return self._check_value(tag, None)
-            child = self._create_child(tag)
-
         if isinstance(schema, LeafSchema):
+            child = self._find_child(tag)
+            if child is None:
+                return self._check_value(tag, None)
             return self._check_value(tag, child.text)
-        return schema.create(child)
+
+        item = self._items.get(tag)
+        if item is None:
+            child = self._find_child(tag)
+            if child is None:
+                child = self._create_child(tag)
+            item = schema.create(child, self._namespace)
+            self._items[tag] = item
+        return item
 
     def __setattr__(self, name, value):
         """Set the child item with the given C{name} to the given C{value}.
@@ -224,25 +262,46 @@ class NodeItem(object):
                 # Setting a node child item to None means removing it.
                 self._check_value(tag, None)
                 if child is not None:
-                    self._root.remove(child)
+                    self._remove_child(child)
             if isinstance(schema, SequenceSchema):
                 # Setting a sequence child item to None means removing all
                 # its children.
-                if child is None:
-                    child = self._create_child(tag)
-                for item in child.getchildren():
-                    child.remove(item)
+                getattr(self, name)._clear()
             return
 
         if child is None:
             child = self._create_child(tag)
         child.text = self._check_value(tag, value)
         if child.text is None:
-            self._root.remove(child)
+            self._remove_child(child)
+
+    def _get_index(self):
+        """Return the children of the root element, grouped by tag."""
+        index = self._index
+        if index is None:
+            index = {}
+            for child in self._root:
+                index.setdefault(child.tag, []).append(child)
+            object.__setattr__(self, "_index", index)
+        return index
 
     def _create_child(self, tag):
         """Create a new child element with the given tag."""
-        return etree.SubElement(self._root, self._get_namespace_tag(tag))
+        child = etree.SubElement(self._root, self._get_namespace_tag(tag))
+        self._get_index().setdefault(child.tag, []).append(child)
+        return child
+
+    def _remove_child(self, child):
+        """Remove the given child element."""
+        self._root.remove(child)
+        index = self._get_index()
+        children = index[child.tag]
+        children.remove(child)
+        if not children:
+            del index[child.tag]
+        for tag, item in list(self._items.items()):
+            if item._root is child:
+                del self._items[tag]
 
     def _find_child(self, tag):
         """Find the child C{etree.Element} with the matching C{tag}.
@@ -250,11 +309,11 @@ class NodeItem(object):
         @raises L{WSDLParseError}: If more than one such elements are found.
         """
         tag = self._get_namespace_tag(tag)
-        children = self._root.findall(tag)
+        children = self._get_index().get(tag)
+        if not children:
+            return None
         if len(children) > 1:
             raise WSDLParseError("Duplicate tag '%s'" % tag)
-        if len(children) == 0:
-            return None
         return children[0]
 
     def _check_value(self, tag, value):
@@ -280,9 +339,7 @@ class NodeItem(object):
 
     def _get_namespace_tag(self, tag):
         """Return the given C{tag} with the namespace prefix added, if any."""
-        if self._namespace is not None:
-            tag = "{%s}%s" % (self._namespace, tag)
-        return tag
+        return _qualify(self._namespace, tag)
 
     def _get_schema(self, tag):
         """Return the child schema for the given C{tag}.
@@ -318,10 +375,11 @@ class SequenceSchema(object):
 
         @param root: The C{etree.Element} to root the sequence at, if C{None} a
             new one will be created..
+        @param namespace: The namespace the item is expected to be in.
         @result: A L{SequenceItem} with the given root.
         @raises L{ECResponseError}: If the given C{root} has a bad tag.
         """
-        if root is not None:
+        if root is not None and root.tag != _qualify(namespace, self.tag):
             tag = root.tag
             if root.nsmap:
                 namespace = root.nsmap[None]
@@ -367,6 +425,10 @@ class SequenceSchema(object):
 class SequenceItem(object):
     """A sequence node item in a tree of response elements.
 
+    The children of the root element are listed the first time one of them
+    is looked up, and the items for them are kept.  The list only follows
+    the changes made through the items.
+
     @param schema: The L{SequenceSchema} this item must comply to.
     @param root: The C{etree.Element} this item is rooted at, if C{None}
         a new one will be created.
@@ -378,6 +440,8 @@ class SequenceItem(object):
         object.__setattr__(self, "_schema", schema)
         object.__setattr__(self, "_root", root)
         object.__setattr__(self, "_namespace", namespace)
+        object.__setattr__(self, "_children", None)
+        object.__setattr__(self, "_items", None)
 
     def __getitem__(self, index):
         """Get the item with the given C{index} in the sequence.
@@ -386,13 +450,16 @@ class SequenceItem(object):
             - If there is no child element with the given C{index}.
             - The given C{index} is higher than the allowed max.
         """
-        schema = self._schema.child
         tag = self._schema.tag
         if (self._schema.max_occurs != "unbounded" and
             index > self._schema.max_occurs - 1):
             raise WSDLParseError("Out of range item in tag '%s'" % tag)
-        child = self._get_child(self._root.getchildren(), index)
-        return schema.create(child)
+        child = self._get_child(self._get_children(), index)
+        item = self._items[index]
+        if item is None:
+            item = self._items[index] = self._schema.child.create(
+                child, self._namespace)
+        return item
 
     def append(self):
         """Append a new item to the sequence, appending it to the end.
@@ -402,18 +469,18 @@ class SequenceItem(object):
              more child elements than the allowed max.
         """
         tag = self._schema.tag
-        children = self._root.getchildren()
+        children = self._get_children()
 
         if (self._schema.max_occurs != "unbounded" and
             len(children) >= self._schema.max_occurs):
             raise WSDLParseError("Too many items in tag '%s'" % tag)
 
         schema = self._schema.child
-        tag = "item"
-        if self._namespace is not None:
-            tag = "{%s}%s" % (self._namespace, tag)
-        child = etree.SubElement(self._root, tag)
-        return schema.create(child)
+        child = etree.SubElement(self._root, _qualify(self._namespace, "item"))
+        item = schema.create(child, self._namespace)
+        children.append(child)
+        self._items.append(item)
+        return item
 
     def __delitem__(self, index):
         """Remove the item with the given C{index} from the sequence.
@@ -423,10 +490,12 @@ class SequenceItem(object):
              index is found.
         """
         tag = self._schema.tag
-        children = self._root.getchildren()
+        children = self._get_children()
         if len(children) <= self._schema.min_occurs:
             raise WSDLParseError("Not enough items in tag '%s'" % tag)
         self._root.remove(self._get_child(children, index))
+        del children[index]
+        del self._items[index]
 
     def remove(self, item):
         """Remove the given C{item} from the sequence.
@@ -435,7 +504,7 @@ class SequenceItem(object):
              less child elements than the required min_occurs, or if no such
              index is found.
         """
-        for index, child in enumerate(self._root.getchildren()):
+        for index, child in enumerate(self._get_children()):
             if child is item._root:
                 del self[index]
                 return item
@@ -444,13 +513,28 @@ class SequenceItem(object):
 
     def __iter__(self):
         """Iter all the sequence items in order."""
-        schema = self._schema.child
-        for child in self._root.iterchildren():
-            yield schema.create(child)
+        for index in range(len(self._get_children())):
+            yield self[index]
 
     def __len__(self):
         """Return the length of the sequence."""
-        return len(self._root.getchildren())
+        return len(self._get_children())
+
+    def _get_children(self):
+        """Return the list of the children of the root element."""
+        children = self._children
+        if children is None:
+            children = list(self._root)
+            object.__setattr__(self, "_children", children)
+            object.__setattr__(self, "_items", [None] * len(children))
+        return children
+
+    def _clear(self):
+        """Remove all the items of the sequence."""
+        for child in list(self._root):
+            self._root.remove(child)
+        object.__setattr__(self, "_children", [])
+        object.__setattr__(self, "_items", [])
 
     def _get_child(self, children, index):
         """Return the child with the given index."""
@@ -461,6 +545,119 @@ class SequenceItem(object):
                                    self._schema.tag)
 
 
+def iter_items(schema, events, path):
+    """Validate a stream of parse events against a schema, generating the
+    items of one of its sequences as soon as each of them is complete.
+
+    Each element is checked to be in the schema, not to be repeated unless
+    it's a sequence item, and to have all its required children.  The
+    elements of the generated items are detached from the document, so
+    only the items still referenced by the caller are kept in memory.
+
+    @param schema: The L{NodeSchema} of the whole response.
+    @param events: An iterable of C{("start", element)} and
+        C{("end", element)} events, as generated by C{etree.iterparse} or
+        C{etree.XMLPullParser} with C{events=("start", "end")}.
+    @param path: The sequence of tags leading from the root of the response
+        to the sequence to generate the items of, for example
+        C{("reservationSet",)}.
+    @return: A generator of the L{NodeItem}s of the sequence.
+    @raises L{WSDLParseError}: When the generator reaches an element which
+        doesn't comply with the schema.
+    """
+    target = schema
+    for tag in path:
+        if not isinstance(target, NodeSchema) or tag not in target.children:
+            raise WSDLParseError("Unknown tag '%s'" % tag)
+        target = target.children[tag]
+    if not isinstance(target, SequenceSchema):
+        raise WSDLParseError("Tag '%s' is not a sequence" % target.tag)
+    depth = len(path) + 1
+
+    namespace = None
+    # The schema, element and counts of child tags of each open element.
+    stack = []
+    for event, element in events:
+        if event == "start":
+            qname = etree.QName(element)
+            tag = qname.localname
+            if not stack:
+                namespace = qname.namespace
+                if tag != schema.tag:
+                    raise WSDLParseError("Expected response with tag '%s', "
+                                         "but got '%s' instead"
+                                         % (schema.tag, tag))
+                child_schema = schema
+            else:
+                if qname.namespace != namespace:
+                    raise WSDLParseError("Unexpected namespace for tag '%s'"
+                                         % tag)
+                child_schema = _get_child_schema(stack[-1], tag)
+            stack.append((child_schema, element, {}))
+        elif event == "end":
+            child_schema, element, seen = stack.pop()
+            _check_children(child_schema, seen)
+            if len(stack) == depth and stack[-1][0] is target:
+                element.getparent().remove(element)
+                yield target.child.create(element, namespace)
+    if stack:
+        raise WSDLParseError("Unexpected end of response")
+
+
+def iterparse_items(schema, source, path):
+    """Parse a response from a file with C{etree.iterparse}, generating
+    the items of one of its sequences as they are parsed.
+
+    @param source: A file name or a file-like object opened in binary mode.
+    @see: L{iter_items}
+    """
+    events = etree.iterparse(source, events=("start", "end"),
+                             remove_blank_text=True)
+    return iter_items(schema, events, path)
+
+
+def _get_child_schema(parent, tag):
+    """Return the schema of a new child of an open element.
+
+    @param parent: The schema, element and counts of child tags of the open
+        element, updated with the new child.
+    @raises L{WSDLParseError}: If the child doesn't belong there.
+    """
+    schema, element, seen = parent
+    if isinstance(schema, NodeSchema):
+        child_schema = schema.children.get(tag)
+        if child_schema is None:
+            raise WSDLParseError("Unknown tag '%s'" % tag)
+        if tag in seen:
+            raise WSDLParseError("Duplicate tag '%s'" % tag)
+    elif isinstance(schema, SequenceSchema):
+        if tag != "item":
+            raise WSDLParseError("Unknown tag '%s'" % tag)
+        if (schema.max_occurs != "unbounded" and
+            seen.get(tag, 0) >= schema.max_occurs):
+            raise WSDLParseError("Too many items in tag '%s'" % schema.tag)
+        child_schema = schema.child
+    else:
+        raise WSDLParseError("Unexpected child '%s' in leaf tag '%s'"
+                             % (tag, schema.tag))
+    seen[tag] = seen.get(tag, 0) + 1
+    return child_schema
+
+
+def _check_children(schema, seen):
+    """Check that a complete element has all its required children.
+
+    @raises L{WSDLParseError}: If it doesn't.
+    """
+    if isinstance(schema, NodeSchema):
+        for tag, min_occurs in schema.children_min_occurs.items():
+            if min_occurs and tag not in seen:
+                raise WSDLParseError("Missing tag '%s'" % tag)
+    elif isinstance(schema, SequenceSchema):
+        if seen.get("item", 0) < schema.min_occurs:
+            raise WSDLParseError("Not enough items in tag '%s'" % schema.tag)
+
+
 class WSDLParser(object):
     """Build response schemas out of WSDL definitions"""
 
@@ -585,3 +782,104 @@ class WSDLParser(object):
         if max_occurs != "unbounded":
             max_occurs = int(max_occurs)
         return name, type, min_occurs, max_occurs
+
+
+class WSDLSchemas(Mapping):
+    """A read-only mapping of response type names to their schemas.
+
+    Each schema is kept pickled until it's first looked up, so that only
+    the response types actually used are ever built.
+
+    @param pickled: A C{dict} mapping response type names to their pickled
+        schemas.
+    """
+
+    def __init__(self, pickled):
+        self._pickled = pickled
+        self._schemas = {}
+
+    def __getitem__(self, name):
+        schema = self._schemas.get(name)
+        if schema is None:
+            schema = self._schemas[name] = pickle.loads(self._pickled[name])
+        return schema
+
+    def __iter__(self):
+        return iter(self._pickled)
+
+    def __len__(self):
+        return len(self._pickled)
+
+
+def _default_cache_dir():
+    """Return the directory schemas are cached in by default."""
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "txaws")
+
+
+def load_schemas(path=DEFAULT_WSDL, cache_dir=None):
+    """Load the response schemas of a WSDL definition, parsing it only if
+    it hasn't been parsed before.
+
+    The schemas are cached in C{cache_dir} under the hash of the WSDL
+    definition, so that a changed definition is parsed again.  A cache that
+    can't be read or written is ignored, and so is one that other users
+    could have written to, since unpickling it could run any code.
+
+    @param path: The path of the WSDL definition to load.
+    @param cache_dir: The directory to cache the schemas in, by default
+        C{$XDG_CACHE_HOME/txaws}.
+    @return: A L{WSDLSchemas} mapping response type names to their schemas.
+    """
+    with open(path, "rb") as wsdl_file:
+        wsdl = wsdl_file.read()
+    if cache_dir is None:
+        cache_dir = _default_cache_dir()
+    digest = hashlib.sha256(_CACHE_FORMAT + b"\0" + wsdl).hexdigest()
+    cache_path = os.path.join(cache_dir, digest + ".pickle")
+
+    try:
+        with open(cache_path, "rb") as cache_file:
+            if (_is_private(os.stat(cache_dir)) and
+                    _is_private(os.fstat(cache_file.fileno()))):
+                pickled = pickle.load(cache_file)
+            else:
+                pickled = None
+    except Exception:
+        pickled = None
+    if not isinstance(pickled, dict):
+        schemas = WSDLParser().parse(wsdl)
+        pickled = dict(
+            (name, pickle.dumps(schema, pickle.HIGHEST_PROTOCOL))
+            for name, schema in schemas.items())
+        _write_cache(cache_dir, cache_path, pickled)
+    return WSDLSchemas(pickled)
+
+
+def _is_private(status):
+    """Return whether a file, given its C{stat} result, is owned by the
+    current user and can't be written by anyone else.
+
+    Files are never considered private where users don't have IDs.
+    """
+    getuid = getattr(os, "getuid", None)
+    return (getuid is not None and status.st_uid == getuid() and
+            not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
+def _write_cache(cache_dir, cache_path, pickled):
+    """Atomically write pickled schemas to the cache, if possible."""
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                pickle.dump(pickled, temp_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError:
+        pass